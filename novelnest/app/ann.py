@@ -0,0 +1,91 @@
+import os
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+
+from retrieval import top_k
+
+# 近似最近邻：TruncatedSVD 降维 + IVF 倒排聚类
+# 候选集用降维向量粗排，再用原始 TF-IDF 行精排，返回的分数仍是余弦相似度
+
+FILES = ('components', 'centroids', 'list_offsets', 'list_ids', 'vectors')
+DEFAULT_NPROBE = 8
+RERANK_FACTOR = 4
+
+
+def _normalize(Z):
+    norms = np.linalg.norm(Z, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return Z / norms
+
+
+class IVFIndex:
+    def __init__(self, components, centroids, list_offsets, list_ids, vectors):
+        self.components = components      # (dim, vocab) 投影矩阵
+        self.centroids = centroids        # (n_lists, dim)
+        self.list_offsets = list_offsets  # (n_lists + 1,) 每个桶在 list_ids 中的区间
+        self.list_ids = list_ids          # 按桶排列的原始行号
+        self.vectors = vectors            # 按桶排列的降维向量，与 list_ids 对齐
+
+    @classmethod
+    def build(cls, X, dim=128, n_lists=None, seed=0):
+        n_rows, n_feats = X.shape
+        dim = max(1, min(dim, n_feats - 1, n_rows - 1))
+        svd = TruncatedSVD(n_components=dim, random_state=seed)
+        Z = _normalize(svd.fit_transform(X)).astype(np.float32)
+        if n_lists is None:
+            n_lists = int(np.sqrt(n_rows))
+        n_lists = max(1, min(n_lists, n_rows))
+        km = MiniBatchKMeans(n_clusters=n_lists, random_state=seed, n_init=3,
+                             batch_size=max(1024, n_lists * 4))
+        labels = km.fit_predict(Z)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        return cls(
+            svd.components_.astype(np.float32),
+            _normalize(km.cluster_centers_).astype(np.float32),
+            offsets,
+            order.astype(np.int64),
+            Z[order],
+        )
+
+    def save(self, models_dir):
+        for name in FILES:
+            np.save(os.path.join(models_dir, f'ann_{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, models_dir, mmap_mode=None):
+        """目录下没有 ANN 文件时返回 None"""
+        paths = [os.path.join(models_dir, f'ann_{name}.npy') for name in FILES]
+        if not all(os.path.exists(p) for p in paths):
+            return None
+        return cls(*(np.load(p, mmap_mode=mmap_mode) for p in paths))
+
+    def candidates(self, q_vec, n, nprobe=DEFAULT_NPROBE):
+        """粗排：探查最近的 nprobe 个桶，返回降维分数最高的 n 个原始行号"""
+        z = _normalize(np.asarray(q_vec @ self.components.T).ravel())
+        probe = top_k(self.centroids @ z, nprobe)
+        spans = [np.arange(self.list_offsets[p], self.list_offsets[p + 1]) for p in probe]
+        pos = np.concatenate(spans)
+        best = pos[top_k(self.vectors[pos] @ z, n)]
+        return self.list_ids[best]
+
+    def search(self, q_vec, tfidf_matrix, k, exclude=None, nprobe=DEFAULT_NPROBE, mask=None):
+        """返回 (top_idx, scores)，接口与 retrieval.search 一致"""
+        cand = self.candidates(q_vec, k * RERANK_FACTOR + 1, nprobe)
+        return rerank(q_vec, tfidf_matrix, cand, k, exclude, mask)
+
+
+def rerank(q_vec, tfidf_matrix, cand, k, exclude=None, mask=None):
+    """候选行用原始 TF-IDF 精排，返回 (top_idx, scores)；mask 给出时只保留满足过滤条件的候选"""
+    if exclude is not None:
+        cand = cand[cand != exclude]
+    if mask is not None:
+        cand = cand[mask[cand]]
+    # 按行号排序，使同分次序与精确检索一致
+    cand = np.sort(cand)
+    q = q_vec.toarray().ravel() if hasattr(q_vec, 'toarray') else np.asarray(q_vec).ravel()
+    sims = tfidf_matrix[cand] @ q
+    best = top_k(sims, k)
+    return cand[best], sims[best]
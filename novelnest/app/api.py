@@ -1,39 +1,254 @@
-from flask import Flask, request, jsonify
-import os, pickle
+from flask import Flask, request, jsonify, g
+import os, json, time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
+
+from retrieval import score_all, select, search_batch
+from explain import QUERY_TOP_N, query_terms, explain
+from ranking import OVERSAMPLE, blend, parse_weights
+from reloader import IndexManager
+from profiles import ACTIONS, ProfileStore, read_mask
+from serialize import results_json, batch_json
+from cache import QueryCache
+from embedding import REPRS, hybrid
+from shards import ShardedMatrix
+from metrics import Registry, RequestTimer, mapped_rss, matrix_arrays, process_rss
+from sampler import Sampler
+import tokenizer
 
 APP_DIR = os.path.dirname(__file__)
 ROOT = os.path.abspath(os.path.join(APP_DIR, '..'))
-DATA_PATH = os.path.join(ROOT, 'data', 'books_sample.csv')
-VEC_PATH = os.path.join(ROOT, 'models', 'vectorizer.pkl')
-MAT_PATH = os.path.join(ROOT, 'models', 'tfidf_matrix.pkl')
+INDEX_DIR = os.environ.get('INDEX_DIR', os.path.join(ROOT, 'models', 'index'))
+MAX_BATCH = 1000
+# 单次反馈请求的事件数上限
+MAX_EVENTS = 1000
+# 查询缓存配置；CACHE_DB 指向一个 SQLite 文件时，多个 worker 共享缓存
+CACHE_SIZE = int(os.environ.get('CACHE_SIZE', 1024))
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 300))
+CACHE_DB = os.environ.get('CACHE_DB')
+# 轮询 models/index/CURRENT 的间隔（秒），0 表示不热切换
+INDEX_POLL_INTERVAL = float(os.environ.get('INDEX_POLL_INTERVAL', 2))
+# 融合排序的默认权重，可用 RANK_WEIGHTS='{"popularity": 0.3}' 覆盖部分键
+RANK_WEIGHTS = parse_weights(json.loads(os.environ.get('RANK_WEIGHTS') or '{}'))
+# 用户画像库，默认与 jinjiang_novels.db 放在一起
+PROFILE_DB = os.environ.get('PROFILE_DB', os.path.join(ROOT, 'data', 'user_profiles.db'))
+# 为 1 时每个响应都带 X-Timing；否则只有请求头带 X-Timing: 1 或 ?timing=1 的请求才带
+TIMING_HEADER = os.environ.get('TIMING_HEADER') == '1'
+# 为 1 时允许非本机地址开关采样剖析器
+PROFILER_REMOTE = os.environ.get('PROFILER_REMOTE') == '1'
+# 分片检索：TF-IDF 矩阵按行切成 SHARDS 片，由 SHARD_THREADS 个线程并行打分（默认与分片数相同，1 为不分片）
+SHARDS = int(os.environ.get('SHARDS', 1))
+SHARD_THREADS = int(os.environ.get('SHARD_THREADS') or SHARDS)
 
 app = Flask(__name__)
 
-def _load_assets():
-    with open(VEC_PATH, 'rb') as f:
-        vectorizer = pickle.load(f)
-    with open(MAT_PATH, 'rb') as f:
-        tfidf_matrix = pickle.load(f)
-    books = pd.read_csv(DATA_PATH)
-    return vectorizer, tfidf_matrix, books
+metrics = Registry()
+metrics.describe('novelnest_requests_total', 'counter', 'Requests by endpoint and HTTP status')
+metrics.describe('novelnest_title_not_found_total', 'counter', 'similar_by_title lookups with no matching title')
+metrics.describe('novelnest_request_seconds', 'histogram', 'Request latency by endpoint')
+metrics.describe('novelnest_stage_seconds', 'histogram', 'Hot-path stage latency by endpoint and stage')
+sampler = Sampler()
+
+# 所有索引版本共用一个线程池
+shard_pool = ThreadPoolExecutor(SHARD_THREADS, thread_name_prefix='shard') if SHARDS > 1 else None
+
+def _shard(index):
+    if shard_pool is not None:
+        index.tfidf_matrix = ShardedMatrix(index.tfidf_matrix, SHARDS, shard_pool)
+
+def _on_swap(index):
+    # 新版本生效后，两个缓存都换到新版本号（共享层清理旧版本条目）
+    result_cache.set_version(index.meta['version'])
+    vector_cache.set_version(index.meta['version'])
+
+# 各数组以只读内存映射加载，多个 worker 共享同一份 page cache；新版本在后台加载后原子切换
+indexes = IndexManager(INDEX_DIR, INDEX_POLL_INTERVAL, on_swap=_on_swap, prepare=_shard)
+tokenizer.init()
+index_version = indexes.active.version
+result_cache = QueryCache(index_version, CACHE_SIZE, CACHE_TTL, CACHE_DB)
+vector_cache = QueryCache(index_version, CACHE_SIZE, CACHE_TTL)
+profiles = ProfileStore(PROFILE_DB).start()
+indexes.start()
+
+@app.before_request
+def _pin_index():
+    g.timer = RequestTimer(metrics, request.endpoint or 'unknown')
+    sampler.enter()
+    # 整个请求都用开始时的索引快照，切换期间处理中的请求在旧版本上算完
+    g.snapshot = indexes.pin()
+    g.index = g.snapshot.index
+    g.version = g.snapshot.version
+
+@app.after_request
+def _version_header(response):
+    if 'snapshot' in g:
+        response.headers['X-Index-Version'] = g.version
+    timer = g.get('timer')
+    if timer is not None:
+        metrics.observe('novelnest_request_seconds', timer.elapsed(), endpoint=timer.endpoint)
+        metrics.inc('novelnest_requests_total', endpoint=timer.endpoint, status=response.status_code)
+        if TIMING_HEADER or request.headers.get('X-Timing') == '1' or request.args.get('timing') == '1':
+            response.headers['X-Timing'] = timer.header()
+    return response
+
+@app.teardown_request
+def _release_index(exc):
+    sampler.exit()
+    snap = g.pop('snapshot', None)
+    if snap is not None:
+        indexes.release(snap)
+
+@metrics.collector
+def _collect():
+    """抓取时现算：缓存命中、索引规模与热切换、TF-IDF 矩阵的映射/常驻内存、画像写回"""
+    caches = {'results': result_cache.stats(), 'vectors': vector_cache.stats()}
+    yield ('novelnest_cache_lookups_total', 'counter', 'Query cache lookups by cache and outcome',
+           [({'cache': name, 'outcome': outcome}, st[outcome])
+            for name, st in caches.items() for outcome in ('hits', 'shared_hits', 'misses')])
+    yield ('novelnest_cache_entries', 'gauge', 'In-process query cache entries',
+           [({'cache': name}, st['entries']) for name, st in caches.items()])
+    snap = indexes.active
+    yield ('novelnest_index_rows', 'gauge', 'Rows in the active index (main + delta)',
+           [({'version': snap.version}, snap.index.meta['rows'])])
+    yield ('novelnest_index_swaps_total', 'counter', 'Index hot swaps since start', [({}, indexes.swaps)])
+    arrays = matrix_arrays(snap.index.tfidf_matrix)
+    memory = [({'kind': 'mapped'}, sum(a.nbytes for a in arrays))]
+    resident = mapped_rss(snap.index.path, ('tfidf.',)) if snap.index.path else None
+    if resident is not None:
+        memory.append(({'kind': 'resident'}, resident))
+    yield ('novelnest_tfidf_matrix_bytes', 'gauge',
+           'TF-IDF matrix size in this process: mapped (array bytes) and resident (page cache pages touched)', memory)
+    if snap.index.embedding is not None:
+        yield ('novelnest_embedding_bytes', 'gauge', 'Quantized book embeddings (main + delta)',
+               [({'dtype': str(snap.index.embedding.dtype)}, snap.index.embedding.nbytes)])
+    rss = process_rss()
+    if rss is not None:
+        yield ('novelnest_process_resident_bytes', 'gauge', 'Resident set size of this worker', [({}, rss)])
+    st = profiles.stats()
+    yield ('novelnest_profile_events_total', 'counter', 'User feedback events applied', [({}, st['events'])])
+    yield ('novelnest_profiles_dirty', 'gauge', 'User profiles not yet written back', [({}, st['dirty'])])
 
-vectorizer, tfidf_matrix, books = _load_assets()
+def _parse_mode(payload):
+    mode = (payload or {}).get('mode', 'exact')
+    if mode not in ('exact', 'ann'):
+        return None, (jsonify({'error': 'mode must be exact or ann'}), 400)
+    if mode == 'ann' and g.index.ann is None:
+        return None, (jsonify({'error': 'ann index not built, run scripts/build_index.py'}), 400)
+    return mode, None
 
-def _explain(idx_top, q_vec):
+def _parse_repr(payload, mode):
+    """tfidf / embedding（句向量）/ hybrid（两者加权）；句向量只支持精确检索"""
+    rep = (payload or {}).get('repr', 'tfidf')
+    if rep not in REPRS:
+        return None, (jsonify({'error': 'repr must be tfidf, embedding or hybrid'}), 400)
+    if rep != 'tfidf' and g.index.embedding is None:
+        return None, (jsonify({'error': 'embeddings not built, run scripts/build_index.py --embedding lsa'}), 400)
+    if rep != 'tfidf' and mode == 'ann':
+        return None, (jsonify({'error': 'mode ann only supports repr tfidf'}), 400)
+    return rep, None
+
+def _parse_rank(payload):
+    """返回 (权重或 None, 缓存键片段, 错误)；默认按相似度排序，融合排序需显式 rank=blend"""
+    payload = payload or {}
+    rank = payload.get('rank', 'similarity')
+    if rank not in ('similarity', 'blend'):
+        return None, None, (jsonify({'error': 'rank must be similarity or blend'}), 400)
+    if rank == 'similarity':
+        return None, rank, None
+    if g.index.rank_features is None:
+        return None, None, (jsonify({'error': 'rank features not built, run scripts/build_index.py --source db'}), 400)
+    overrides = payload.get('weights')
+    if overrides is not None and not isinstance(overrides, dict):
+        return None, None, (jsonify({'error': 'weights must be an object'}), 400)
+    try:
+        weights = parse_weights(overrides, RANK_WEIGHTS)
+    except ValueError as e:
+        return None, None, (jsonify({'error': str(e)}), 400)
+    return weights, 'blend:' + json.dumps(weights, sort_keys=True), None
+
+def _parse_filters(payload):
+    """返回 (行掩码或 None, 缓存键片段, 错误)"""
+    filters = (payload or {}).get('filters')
+    if not filters:
+        return None, '', None
+    if not isinstance(filters, dict):
+        return None, None, (jsonify({'error': 'filters must be an object'}), 400)
+    if g.index.filters is None:
+        return None, None, (jsonify({'error': 'filter index not built, run scripts/build_index.py --source db'}), 400)
+    try:
+        mask = g.index.filters.mask(filters)
+    except ValueError as e:
+        return None, None, (jsonify({'error': str(e)}), 400)
+    return mask, json.dumps(filters, sort_keys=True, ensure_ascii=False), None
+
+def _rerank(top_idx, sims, k, weights):
+    # 新鲜度按请求时刻换算；同一缓存条目的 TTL 内误差可以忽略
+    return blend(top_idx, sims, g.index.rank_features, weights, k, time.time() / 86400)
+
+def _similarities(q_vec, e_vec, rep):
+    if rep == 'tfidf':
+        return score_all(q_vec, g.index.tfidf_matrix)
+    if rep == 'embedding':
+        return g.index.embedding.score(e_vec)
+    return hybrid(score_all(q_vec, g.index.tfidf_matrix), g.index.embedding.score(e_vec))
+
+def _search(q_vec, k, mode, weights=None, exclude=None, mask=None, e_vec=None, rep='tfidf'):
+    # 融合排序时先按相似度多召回 OVERSAMPLE 倍候选，再在候选上重排
+    n = k * OVERSAMPLE if weights is not None else k
+    top_idx = None
+    if mode == 'ann':
+        with g.timer.stage('ann'):
+            top_idx, sims = g.index.ann.search(q_vec, g.index.tfidf_matrix, n, exclude=exclude, mask=mask)
+        if mask is not None and len(top_idx) < n:
+            # 过滤条件太严，IVF 候选里满足条件的不够，退回精确检索
+            top_idx = None
+    if top_idx is None and rep == 'tfidf' and isinstance(g.index.tfidf_matrix, ShardedMatrix):
+        # 各分片并行打分并取局部 Top-K，再堆归并
+        with g.timer.stage('shards'):
+            top_idx, sims = g.index.tfidf_matrix.search(q_vec, n, exclude, mask)
+    if top_idx is None:
+        with g.timer.stage('similarity'):
+            sims = _similarities(q_vec, e_vec, rep)
+        with g.timer.stage('topk'):
+            top_idx, sims = select(sims, n, exclude, mask)
+    if weights is None:
+        return top_idx, sims
+    with g.timer.stage('rerank'):
+        return _rerank(top_idx, sims, k, weights)
+
+def _explain(idx_top, q_terms):
     # 取关键词：查询文本与候选文本 TF-IDF 权重较高的交集
-    feature_names = np.array(vectorizer.get_feature_names_out())
-    q_weights = q_vec.toarray().ravel()
-    top_term_ids = q_weights.argsort()[-8:][::-1]
-    q_terms = set(feature_names[top_term_ids])
-    doc_vec = tfidf_matrix[idx_top]
-    doc_weights = doc_vec.toarray().ravel()
-    doc_term_ids = doc_weights.argsort()[-12:][::-1]
-    doc_terms = set(feature_names[doc_term_ids])
-    common = [w for w in feature_names if w in q_terms and w in doc_terms]
-    return common[:5]
+    return explain(q_terms, g.index.doc_terms[idx_top], g.index.feature_names)
+
+def _results_body(top_idx, scores, q_terms):
+    with g.timer.stage('explain'):
+        whys = [_explain(i, q_terms) for i in top_idx]
+    with g.timer.stage('serialize'):
+        return results_json(g.index.books, top_idx, scores, whys)
+
+def _json_response(body):
+    return app.response_class(body, mimetype='application/json')
+
+def _normalize_text(text):
+    # 向量化器本身会转小写、按空白切分，这样规范化不改变查询结果
+    return ' '.join(text.lower().split())
+
+def _vectorize(text):
+    q_vec = vector_cache.get(text, version=g.version)
+    if q_vec is None:
+        # 查询文本先用与建索引相同的 jieba 分词，再向量化
+        with g.timer.stage('vectorize'):
+            q_vec = g.index.vectorizer.transform([tokenizer.tokenize_query(text)])
+        vector_cache.set(q_vec, text, version=g.version)
+    return q_vec
+
+def _embed(text):
+    e_vec = vector_cache.get('embedding', text, version=g.version)
+    if e_vec is None:
+        with g.timer.stage('embed'):
+            e_vec = g.index.encoder.encode_query(text)
+        vector_cache.set(e_vec, 'embedding', text, version=g.version)
+    return e_vec
 
 @app.post('/api/similar_by_title')
 def similar_by_title():
@@ -42,28 +257,37 @@ def similar_by_title():
     k = int((payload or {}).get('k', 5))
     if not title:
         return jsonify({'error': 'title required'}), 400
+    mode, err = _parse_mode(payload)
+    if err:
+        return err
+    rep, err = _parse_repr(payload, mode)
+    if err:
+        return err
+    weights, rank_key, err = _parse_rank(payload)
+    if err:
+        return err
+    mask, filter_key, err = _parse_filters(payload)
+    if err:
+        return err
 
     # 找到该书
-    match = books[books['title'].str.contains(title, case=False, na=False)]
-    if match.empty:
+    with g.timer.stage('lookup'):
+        idx = g.index.titles.resolve(title)
+    if idx is None:
+        metrics.inc('novelnest_title_not_found_total')
         return jsonify({'error': 'title not found in dataset'}), 404
 
-    idx = match.index[0]
-    q_vec = tfidf_matrix[idx]
-    sims = cosine_similarity(q_vec, tfidf_matrix).ravel()
-    # 排除自身
-    sims[idx] = -1
-    top_idx = sims.argsort()[::-1][:k]
-    results = []
-    for i in top_idx:
-        results.append({
-            'book_id': int(books.iloc[i]['id']),
-            'title': books.iloc[i]['title'],
-            'author': books.iloc[i]['author'],
-            'score': float(sims[i]),
-            'why': _explain(i, q_vec),
-        })
-    return jsonify(results)
+    with g.timer.stage('cache'):
+        body = result_cache.get('title', idx, k, mode, rep, rank_key, filter_key, version=g.version)
+    if body is None:
+        q_vec = g.index.tfidf_matrix[idx]
+        e_vec = g.index.embedding.rows([idx])[0] if rep != 'tfidf' else None
+        # 排除自身
+        top_idx, scores = _search(q_vec, k, mode, weights, exclude=idx, mask=mask, e_vec=e_vec, rep=rep)
+        # 推荐理由仍按 TF-IDF 关键词给出
+        body = _results_body(top_idx, scores, query_terms(q_vec))
+        result_cache.set(body, 'title', idx, k, mode, rep, rank_key, filter_key, version=g.version)
+    return _json_response(body)
 
 @app.post('/api/similar_by_text')
 def similar_by_text():
@@ -72,20 +296,218 @@ def similar_by_text():
     k = int((payload or {}).get('k', 5))
     if not text:
         return jsonify({'error': 'text required'}), 400
-    q_vec = vectorizer.transform([text])
-    from sklearn.metrics.pairwise import cosine_similarity
-    sims = cosine_similarity(q_vec, tfidf_matrix).ravel()
-    top_idx = sims.argsort()[::-1][:k]
-    results = []
-    for i in top_idx:
-        results.append({
-            'book_id': int(books.iloc[i]['id']),
-            'title': books.iloc[i]['title'],
-            'author': books.iloc[i]['author'],
-            'score': float(sims[i]),
-            'why': _explain(i, q_vec),
-        })
-    return jsonify(results)
+    mode, err = _parse_mode(payload)
+    if err:
+        return err
+    rep, err = _parse_repr(payload, mode)
+    if err:
+        return err
+    if rep != 'tfidf' and g.index.encoder is None:
+        return jsonify({'error': 'embedding encoder unavailable, install sentence-transformers or use repr tfidf'}), 400
+    weights, rank_key, err = _parse_rank(payload)
+    if err:
+        return err
+    mask, filter_key, err = _parse_filters(payload)
+    if err:
+        return err
+    text = _normalize_text(text)
+    with g.timer.stage('cache'):
+        body = result_cache.get('text', text, k, mode, rep, rank_key, filter_key, version=g.version)
+    if body is None:
+        q_vec = _vectorize(text)
+        e_vec = _embed(text) if rep != 'tfidf' else None
+        top_idx, scores = _search(q_vec, k, mode, weights, mask=mask, e_vec=e_vec, rep=rep)
+        body = _results_body(top_idx, scores, query_terms(q_vec))
+        result_cache.set(body, 'text', text, k, mode, rep, rank_key, filter_key, version=g.version)
+    return _json_response(body)
+
+@app.post('/api/similar_batch')
+def similar_batch():
+    payload = request.get_json(force=True) or {}
+    k = int(payload.get('k', 5))
+    kinds = [key for key in ('titles', 'book_ids', 'texts') if key in payload]
+    if len(kinds) != 1:
+        return jsonify({'error': 'exactly one of titles, book_ids, texts required'}), 400
+    queries = payload[kinds[0]]
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': f'{kinds[0]} must be a non-empty list'}), 400
+    if len(queries) > MAX_BATCH:
+        return jsonify({'error': f'at most {MAX_BATCH} queries per batch'}), 400
+    weights, _, err = _parse_rank(payload)
+    if err:
+        return err
+    mask, _, err = _parse_filters(payload)
+    if err:
+        return err
+
+    index = g.index
+    if kinds[0] == 'texts':
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        found = np.ones(len(queries), dtype=bool)
+        with g.timer.stage('vectorize'):
+            Q = index.vectorizer.transform([tokenizer.tokenize_query(_normalize_text(str(t))) for t in queries])
+    else:
+        if kinds[0] == 'titles':
+            with g.timer.stage('lookup'):
+                rows = np.array([-1 if r is None else r for r in (index.titles.resolve(str(t)) for t in queries)],
+                                dtype=np.int64)
+        else:
+            try:
+                rows = index.books.rows_for_ids([int(b) for b in queries])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'book_ids must be integers'}), 400
+        found = rows >= 0
+        Q = index.tfidf_matrix[rows[found]]
+
+    # 整批查询分块做一次稀疏矩阵乘，按查询书本身排除
+    n = k * OVERSAMPLE if weights is not None else k
+    with g.timer.stage('similarity'):
+        hits = search_batch(Q, index.tfidf_matrix, n, exclude=rows[found], mask=mask)
+    bodies, pos = [], 0
+    for is_found in found:
+        if not is_found:
+            bodies.append(None)
+            continue
+        top_idx, scores = hits[pos]
+        if weights is not None:
+            with g.timer.stage('rerank'):
+                top_idx, scores = _rerank(top_idx, scores, k, weights)
+        q_terms = query_terms(Q[pos])
+        pos += 1
+        bodies.append(_results_body(top_idx, scores, q_terms))
+    return _json_response(batch_json(queries, bodies))
+
+def _user_id(payload):
+    user_id = (payload or {}).get('user_id')
+    return str(user_id).strip() if user_id is not None else ''
+
+def _parse_events(events):
+    """反馈事件 -> ([(action, book_id, 行向量)], 索引里没有的 book_id, 错误)"""
+    index = g.index
+    book_ids = []
+    for ev in events:
+        if not isinstance(ev, dict) or ev.get('action') not in ACTIONS:
+            return None, None, (jsonify({'error': f'each event needs an action in {sorted(ACTIONS)}'}), 400)
+        if ev['action'] == 'questionnaire':
+            if not str(ev.get('text') or '').strip():
+                return None, None, (jsonify({'error': 'questionnaire events need text'}), 400)
+        else:
+            try:
+                book_ids.append(int(ev.get('book_id')))
+            except (TypeError, ValueError):
+                return None, None, (jsonify({'error': 'book_id must be an integer'}), 400)
+    rows = iter(index.books.rows_for_ids(book_ids).tolist())
+    parsed, unknown = [], []
+    for ev in events:
+        if ev['action'] == 'questionnaire':
+            parsed.append(('questionnaire', None, _vectorize(_normalize_text(str(ev['text'])))))
+            continue
+        row = next(rows)
+        if row < 0:
+            unknown.append(int(ev['book_id']))
+        else:
+            parsed.append((ev['action'], int(ev['book_id']), index.tfidf_matrix[row]))
+    return parsed, unknown, None
+
+@app.post('/api/feedback')
+def feedback():
+    payload = request.get_json(force=True) or {}
+    user_id = _user_id(payload)
+    if not user_id:
+        return jsonify({'error': 'user_id required'}), 400
+    # 单条事件可以直接写在请求体里，多条放在 events 列表里
+    events = payload['events'] if 'events' in payload else [payload]
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'events must be a non-empty list'}), 400
+    if len(events) > MAX_EVENTS:
+        return jsonify({'error': f'at most {MAX_EVENTS} events per request'}), 400
+    parsed, unknown, err = _parse_events(events)
+    if err:
+        return err
+    profile = profiles.feedback(user_id, parsed, g.index)
+    return jsonify({'user_id': user_id, 'applied': len(parsed), 'unknown_book_ids': unknown,
+                    'events': profile.events, 'read': len(profile.read)})
+
+@app.post('/api/recommend_for_user')
+def recommend_for_user():
+    payload = request.get_json(force=True) or {}
+    user_id = _user_id(payload)
+    k = int(payload.get('k', 10))
+    if not user_id:
+        return jsonify({'error': 'user_id required'}), 400
+    mode, err = _parse_mode(payload)
+    if err:
+        return err
+    weights, _, err = _parse_rank(payload)
+    if err:
+        return err
+    mask, _, err = _parse_filters(payload)
+    if err:
+        return err
+    snap = profiles.query(user_id, g.index, QUERY_TOP_N)
+    if snap is None:
+        return jsonify({'error': 'user not found, send /api/feedback first'}), 404
+    q_vec, read_ids, q_terms = snap
+    if q_vec is None:
+        return jsonify({'error': 'user profile is empty'}), 404
+    # 已读位图在 Top-K 之前排除，与属性过滤取交集；画像随每条反馈变化，不走结果缓存
+    unread = read_mask(g.index.books, read_ids)
+    top_idx, scores = _search(q_vec, k, mode, weights, mask=unread if mask is None else unread & mask)
+    return _json_response(_results_body(top_idx, scores, q_terms))
+
+@app.get('/api/profile')
+def profile():
+    user_id = request.args.get('user_id', '').strip()
+    if not user_id:
+        return jsonify({'error': 'user_id required'}), 400
+    summary = profiles.summary(user_id, g.index, QUERY_TOP_N)
+    if summary is None:
+        return jsonify({'error': 'user not found'}), 404
+    return jsonify(summary)
+
+@app.get('/api/title_suggest')
+def title_suggest():
+    q = request.args.get('q', '').strip()
+    limit = min(int(request.args.get('limit', 10)), 50)
+    if not q:
+        return jsonify([])
+    return jsonify(g.index.books.records(g.index.titles.suggest(q, limit)))
+
+@app.get('/api/cache_stats')
+def cache_stats():
+    return jsonify({'results': result_cache.stats(), 'vectors': vector_cache.stats(), 'profiles': profiles.stats()})
+
+@app.get('/api/health')
+def health():
+    return jsonify(dict(indexes.status(), status='ok'))
+
+@app.get('/metrics')
+def prometheus_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/profiler', methods=['GET', 'POST'])
+def profiler():
+    """
+    采样剖析器：POST {"enabled": true, "interval_ms": 5, "reset": true} 开关，
+    GET 返回折叠栈文本（?limit=N 只取前 N 行），可直接喂给 flamegraph.pl / speedscope
+    """
+    if not PROFILER_REMOTE and request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'profiler is only available from localhost'}), 403
+    if request.method == 'GET':
+        limit = request.args.get('limit', type=int)
+        return app.response_class(sampler.collapsed(limit), mimetype='text/plain')
+    payload = request.get_json(force=True) or {}
+    if payload.get('reset'):
+        sampler.reset()
+    if 'enabled' in payload:
+        if payload['enabled']:
+            interval = float(payload.get('interval_ms', 5))
+            if not 0.1 <= interval <= 1000:
+                return jsonify({'error': 'interval_ms must be between 0.1 and 1000'}), 400
+            sampler.start(interval / 1000)
+        else:
+            sampler.stop()
+    return jsonify(sampler.status())
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True)
\ No newline at end of file
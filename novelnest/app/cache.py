@@ -0,0 +1,172 @@
+import time, sqlite3, threading
+from collections import OrderedDict
+
+# 查询缓存：进程内 LRU + TTL，可选 SQLite 共享层（多个 gunicorn worker 共用，代替 Redis）
+# 键中带索引版本号，build_index.py 发布新索引后旧条目自然失效，并在切换版本时清理
+# 版本号以构建时刻 YYYYmmddHHMMSS 开头（store._new_version），按这个前缀比较新旧
+
+VERSION_STAMP = 14
+
+
+class SharedStore:
+    """SQLite 共享缓存层；WAL 模式下多进程并发读写不互相阻塞"""
+
+    def __init__(self, path, max_entries=100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache (
+                key      TEXT PRIMARY KEY,
+                version  TEXT,
+                value    BLOB,
+                expires  REAL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires)')
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 连接不能跨线程共享，每个线程一个
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        try:
+            return self._conn().execute(
+                'SELECT value, expires FROM cache WHERE key = ? AND expires > ?', (key, now)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # 共享层忙或不可用时当作未命中，不影响请求
+            return None
+
+    def set(self, key, version, value, expires):
+        conn = self._conn()
+        try:
+            conn.execute('INSERT OR REPLACE INTO cache (key, version, value, expires) VALUES (?,?,?,?)',
+                         (key, version, value, expires))
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+
+    def purge(self, version, now):
+        """
+        删除过期条目和比 version 旧的版本的条目，并把条目数控制在上限内。
+        热切换期间各 worker 的版本不一致，只删更旧的版本，还在旧版本上的 worker 不会删掉新版本的条目
+        """
+        conn = self._conn()
+        try:
+            conn.execute('DELETE FROM cache WHERE expires <= ? OR substr(version, 1, ?) < substr(?, 1, ?)',
+                         (now, VERSION_STAMP, version, VERSION_STAMP))
+            conn.execute('''
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+
+
+# 共享层每写入这么多次清理一次过期条目
+PURGE_EVERY = 1000
+
+
+class QueryCache:
+    """
+    LRU + TTL 缓存。shared_path 为空时只用进程内缓存，值可以是任意对象；
+    启用共享层时值必须是 bytes。
+    """
+
+    def __init__(self, version, max_entries=1024, ttl=300.0, shared_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version
+        self._items = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+        self.shared = SharedStore(shared_path) if shared_path else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        if self.shared is not None:
+            self.shared.purge(version, time.time())
+
+    def _key(self, parts, version=None):
+        return '\x1f'.join([version or self.version] + [str(p) for p in parts])
+
+    def set_version(self, version):
+        """索引版本变化时清空进程内条目并清理共享层旧版本条目"""
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            self._items.clear()
+        if self.shared is not None:
+            self.shared.purge(version, time.time())
+
+    def get(self, *parts, version=None):
+        """version 为请求所用的索引版本；与缓存当前版本不同（热切换前后）时按未命中处理"""
+        if version is not None and version != self.version:
+            return None
+        key, now = self._key(parts, version), time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                del self._items[key]
+        if self.shared is not None:
+            row = self.shared.get(key, now)
+            if row is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._put(key, row[0], row[1])
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, value, *parts, version=None):
+        key = self._key(parts, version)
+        expires = time.time() + self.ttl
+        with self._lock:
+            # 旧版本上算出的结果不写入新版本的缓存
+            if version is not None and version != self.version:
+                return
+            self._put(key, value, expires)
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 0
+        if self.shared is not None:
+            self.shared.set(key, version or self.version, value, expires)
+            if purge:
+                self.shared.purge(self.version, time.time())
+
+    def _put(self, key, value, expires):
+        self._items[key] = (expires, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self._items),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,88 @@
+import json
+import numpy as np
+
+
+def _clean(v):
+    return '' if v is None or v != v else str(v)
+
+
+class StringColumn:
+    """字符串列：所有值的 UTF-8 字节拼接在一起，offsets[i]:offsets[i+1] 为第 i 个值"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        self._view = None
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [_clean(v).encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    @classmethod
+    def from_json_strings(cls, values):
+        """每个值预先编码为 JSON 字符串字面量（含引号），响应时直接拼接"""
+        return cls.from_strings(json.dumps(_clean(v), ensure_ascii=False) for v in values)
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def take_bytes(self, rows):
+        """一次取出多行的原始字节（memoryview 切片，不复制）"""
+        if self._view is None:
+            self._view = memoryview(self.data)
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows].tolist()
+        ends = self.offsets[rows + 1].tolist()
+        return [self._view[a:b] for a, b in zip(starts, ends)]
+
+    def take(self, rows):
+        return [bytes(b).decode('utf-8') for b in self.take_bytes(rows)]
+
+    def tolist(self):
+        raw = self.data.tobytes()
+        bounds = self.offsets.tolist()
+        return [raw[a:b].decode('utf-8') for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def save(self, prefix):
+        np.save(f'{prefix}.data.npy', self.data)
+        np.save(f'{prefix}.offsets.npy', self.offsets)
+
+    @classmethod
+    def load(cls, prefix, mmap_mode='r'):
+        return cls(np.load(f'{prefix}.data.npy', mmap_mode=mmap_mode),
+                   np.load(f'{prefix}.offsets.npy', mmap_mode=mmap_mode))
+
+
+class ConcatColumn:
+    """两个字符串列按行拼接的只读视图：主段保持 mmap，不复制"""
+
+    def __init__(self, main, delta):
+        self.main = main
+        self.delta = delta
+        self.offset = len(main)
+
+    def __len__(self):
+        return self.offset + len(self.delta)
+
+    def __getitem__(self, i):
+        return self.main[i] if i < self.offset else self.delta[i - self.offset]
+
+    def take_bytes(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        in_main = rows < self.offset
+        main = iter(self.main.take_bytes(rows[in_main]))
+        delta = iter(self.delta.take_bytes(rows[~in_main] - self.offset))
+        return [next(main) if m else next(delta) for m in in_main.tolist()]
+
+    def take(self, rows):
+        return [bytes(b).decode('utf-8') for b in self.take_bytes(rows)]
+
+    def tolist(self):
+        return self.main.tolist() + self.delta.tolist()
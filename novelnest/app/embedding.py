@@ -0,0 +1,303 @@
+import os, json, hashlib, sqlite3
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import tokenizer
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # 未安装时只能用内置的 LSA 编码器
+    SentenceTransformer = None
+
+# 句向量表示（路线图第二阶段）：intro / tags / first_300_text 分字段编码，按 FIELD_WEIGHTS 加权求和后归一化为书向量
+# 编码器两种，都只用 CPU：
+#   sentence-transformers 模型（可选依赖，如 BAAI/bge-small-zh-v1.5），按名字加载
+#   lsa：内置的潜在语义模型，jieba 分词 -> 冻结词表/IDF 的 TF-IDF -> SVD 投影，不需要额外依赖
+# 编码按文本长度分桶成批（同批长度相近，transformer 的 padding 最少）；每段文本的向量按 (模型, 内容摘要) 存进 SQLite 缓存，
+# 内容没变的字段不会被重新编码
+# 书向量量化后存成 .npy，随索引版本一起 mmap 加载：
+#   int8     每行一个 float32 缩放系数，约为 float32 的 1/4
+#   float16  约为 float32 的 1/2
+# 打分按 SCORE_ROWS 行一块反量化成 float32 再做矩阵×向量，临时内存有上界
+
+FIELDS = ('intro', 'tags', 'first_300_text')
+FIELD_WEIGHTS = (1.0, 0.6, 0.4)
+DTYPES = ('int8', 'float16')
+REPRS = ('tfidf', 'embedding', 'hybrid')
+# hybrid 模式里句向量相似度的权重，其余为 TF-IDF 余弦
+HYBRID_WEIGHT = 0.5
+BATCH_SIZE = 64
+SCORE_ROWS = 1 << 14
+LSA_DIM = 256
+# LSA 拟合最多用的行数
+LSA_FIT_ROWS = 200_000
+# SQLite 单条语句的参数个数上限以内
+ID_BATCH = 900
+
+
+def _normalize(Z):
+    Z = np.asarray(Z, dtype=np.float32)
+    norms = np.linalg.norm(Z, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return Z / norms
+
+
+def content_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class LSAEncoder:
+    kind = 'lsa'
+
+    def __init__(self, vocab, idf, components):
+        self.vocab = vocab
+        self.idf = idf
+        self.components = components        # (dim, 词表大小) float32
+        self.dim = components.shape[0]
+        self.model_id = 'lsa-' + hashlib.sha1(np.ascontiguousarray(components).tobytes()).hexdigest()[:12]
+        self._vectorizer = TfidfVectorizer(vocabulary={t: i for i, t in enumerate(vocab.tolist())})
+        self._vectorizer.idf_ = np.asarray(idf)
+
+    @classmethod
+    def fit(cls, X, vectorizer, dim=LSA_DIM, seed=0):
+        """在索引的 TF-IDF 矩阵（最多 LSA_FIT_ROWS 行）上拟合 SVD，词表与 IDF 沿用 vectorizer"""
+        rows = X.shape[0]
+        if rows > LSA_FIT_ROWS:
+            X = X[np.sort(np.random.default_rng(seed).choice(rows, LSA_FIT_ROWS, replace=False))]
+        dim = max(1, min(dim, X.shape[1] - 1, X.shape[0] - 1))
+        svd = TruncatedSVD(n_components=dim, random_state=seed).fit(X)
+        return cls(vectorizer.get_feature_names_out().astype(str), vectorizer.idf_, svd.components_.astype(np.float32))
+
+    def matches(self, vectorizer):
+        """词表与 IDF 是否与 vectorizer 一致"""
+        return (np.array_equal(self.vocab, vectorizer.get_feature_names_out().astype(str))
+                and np.allclose(self.idf, vectorizer.idf_))
+
+    def _project(self, docs):
+        return _normalize(self._vectorizer.transform(docs) @ self.components.T)
+
+    def encode(self, texts):
+        return self._project(tokenizer.tokenize_corpus(texts))
+
+    def encode_query(self, text):
+        # 与 TF-IDF 查询共用带缓存的分词
+        return self._project([tokenizer.tokenize_query(text)])[0]
+
+    def save(self, out_dir):
+        np.save(os.path.join(out_dir, 'encoder.vocab.npy'), self.vocab)
+        np.save(os.path.join(out_dir, 'encoder.idf.npy'), self.idf)
+        np.save(os.path.join(out_dir, 'encoder.components.npy'), self.components)
+        _write_encoder_meta(out_dir, self, {})
+
+    @classmethod
+    def load(cls, model_dir, meta):
+        path = lambda name: os.path.join(model_dir, name)
+        return cls(np.load(path('encoder.vocab.npy')), np.load(path('encoder.idf.npy')),
+                   np.load(path('encoder.components.npy')))
+
+
+class SentenceEncoder:
+    kind = 'sentence-transformers'
+
+    def __init__(self, name):
+        if SentenceTransformer is None:
+            raise RuntimeError(f'编码器 {name} 需要安装 sentence-transformers（或改用 lsa）')
+        self.name = name
+        self.model = SentenceTransformer(name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.model_id = name
+
+    def encode(self, texts):
+        return self.model.encode(list(texts), batch_size=max(1, len(texts)), normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+    def encode_query(self, text):
+        return self.encode([text])[0]
+
+    def save(self, out_dir):
+        # 模型权重由 sentence-transformers 自己缓存，这里只记名字
+        _write_encoder_meta(out_dir, self, {'name': self.name})
+
+    @classmethod
+    def load(cls, model_dir, meta):
+        return cls(meta['name'])
+
+
+ENCODERS = {cls.kind: cls for cls in (LSAEncoder, SentenceEncoder)}
+
+
+def _write_encoder_meta(out_dir, encoder, extra):
+    meta = {'kind': encoder.kind, 'model_id': encoder.model_id, 'dim': encoder.dim, **extra}
+    with open(os.path.join(out_dir, 'encoder.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def load_encoder(model_dir):
+    """目录下没有 encoder.json 时返回 None"""
+    path = os.path.join(model_dir, 'encoder.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        meta = json.load(f)
+    return ENCODERS[meta['kind']].load(model_dir, meta)
+
+
+def length_batches(texts, batch_size=BATCH_SIZE):
+    """按长度排序后切批，返回原下标的批次"""
+    order = np.argsort(np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts)), kind='stable')
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+class EmbeddingCache:
+    """(模型, 文本摘要) -> float16 向量，SQLite 存储；只在构建脚本的单线程里用"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                model   TEXT,
+                digest  BLOB,
+                vec     BLOB,
+                PRIMARY KEY (model, digest)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    def get_many(self, model_id, digests):
+        found = {}
+        for i in range(0, len(digests), ID_BATCH):
+            batch = digests[i:i + ID_BATCH]
+            rows = self.conn.execute(
+                f"SELECT digest, vec FROM embedding_cache WHERE model = ? AND digest IN ({','.join('?' * len(batch))})",
+                [model_id, *batch]).fetchall()
+            found.update((d, np.frombuffer(v, dtype=np.float16)) for d, v in rows)
+        return found
+
+    def put_many(self, model_id, items):
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO embedding_cache (model, digest, vec) VALUES (?,?,?)',
+                                  [(model_id, d, v.tobytes()) for d, v in items])
+
+    def close(self):
+        self.conn.close()
+
+
+def encode_books(encoder, frame, cache=None, batch_size=BATCH_SIZE):
+    """
+    frame 中 FIELDS 各列分别编码（缺的列、空文本跳过），按 FIELD_WEIGHTS 加权求和后归一化。
+    向量统一按 float16 精度参与求和，缓存命中与否结果都一样。
+    返回 ((行数, dim) float32, {'encoded': 新编码的文本数, 'cached': 缓存命中的文本数})
+    """
+    out = np.zeros((len(frame), encoder.dim), dtype=np.float32)
+    stats = {'encoded': 0, 'cached': 0}
+    for field, weight in zip(FIELDS, FIELD_WEIGHTS):
+        if field not in frame:
+            continue
+        texts = [t.strip() if isinstance(t, str) else '' for t in frame[field].tolist()]
+        digests = [content_digest(t) if t else None for t in texts]
+        unique = {d: t for d, t in zip(digests, texts) if d is not None}
+        found = cache.get_many(encoder.model_id, list(unique)) if cache is not None else {}
+        missing = [d for d in unique if d not in found]
+        if missing:
+            miss_texts = [unique[d] for d in missing]
+            vecs = np.empty((len(missing), encoder.dim), dtype=np.float16)
+            for batch in length_batches(miss_texts, batch_size):
+                vecs[batch] = encoder.encode([miss_texts[i] for i in batch])
+            new = list(zip(missing, vecs))
+            if cache is not None:
+                cache.put_many(encoder.model_id, new)
+            found.update(new)
+        stats['encoded'] += len(missing)
+        stats['cached'] += len(unique) - len(missing)
+        rows = [i for i, d in enumerate(digests) if d is not None]
+        if rows:
+            keys = list(found)
+            pos = {d: j for j, d in enumerate(keys)}
+            table = np.stack([found[d] for d in keys])
+            out[rows] += weight * table[[pos[digests[i]] for i in rows]].astype(np.float32)
+    return _normalize(out), stats
+
+
+def quantize(E, dtype='int8'):
+    """float32 书向量 -> VectorStore；int8 为逐行对称量化"""
+    E = np.asarray(E, dtype=np.float32)
+    if dtype == 'float16':
+        return VectorStore(E.astype(np.float16))
+    if dtype != 'int8':
+        raise ValueError(f'unknown dtype {dtype!r}, expected one of {DTYPES}')
+    scale = np.abs(E).max(axis=1) / 127 if len(E) else np.zeros(0, dtype=np.float32)
+    scale[scale == 0] = 1
+    return VectorStore(np.rint(E / scale[:, None]).astype(np.int8), scale.astype(np.float32))
+
+
+class VectorStore:
+    """量化的书向量，行与 TF-IDF 矩阵对齐"""
+
+    def __init__(self, vectors, scale=None):
+        self.vectors = vectors
+        self.scale = scale          # int8 时每行的缩放系数，float16 时为 None
+        self.shape = vectors.shape
+        self.dtype = vectors.dtype
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def rows(self, rows):
+        """按行号取出反量化后的 float32 向量"""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = self.vectors[rows].astype(np.float32)
+        if self.scale is not None:
+            out *= self.scale[rows][..., None]
+        return out
+
+    def score(self, q):
+        """q 与全部行的点积（书向量已归一化，即余弦相似度），float32"""
+        q = np.asarray(q, dtype=np.float32).ravel()
+        n = self.shape[0]
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SCORE_ROWS):
+            stop = min(start + SCORE_ROWS, n)
+            np.matmul(self.vectors[start:stop].astype(np.float32), q, out=out[start:stop])
+        if self.scale is not None:
+            out *= self.scale
+        return out
+
+    @classmethod
+    def concat(cls, stores):
+        scale = np.concatenate([s.scale for s in stores]) if stores[0].scale is not None else None
+        return cls(np.concatenate([s.vectors for s in stores]), scale)
+
+    def save(self, out_dir):
+        np.save(os.path.join(out_dir, 'embedding.vectors.npy'), self.vectors)
+        if self.scale is not None:
+            np.save(os.path.join(out_dir, 'embedding.scale.npy'), self.scale)
+
+    @classmethod
+    def load(cls, out_dir, mmap_mode=None):
+        """目录下没有句向量时返回 None"""
+        path = lambda name: os.path.join(out_dir, name)
+        if not os.path.exists(path('embedding.vectors.npy')):
+            return None
+        scale = np.load(path('embedding.scale.npy'), mmap_mode=mmap_mode) if os.path.exists(path('embedding.scale.npy')) else None
+        return cls(np.load(path('embedding.vectors.npy'), mmap_mode=mmap_mode), scale)
+
+
+def take(store, rows, dtype):
+    """按 rows 取出反量化后的行重新量化（增量段保留旧行、压缩时合并两段），按块处理"""
+    rows = np.asarray(rows, dtype=np.int64)
+    return VectorStore.concat([quantize(store.rows(rows[i:i + SCORE_ROWS]), dtype)
+                               for i in range(0, max(len(rows), 1), SCORE_ROWS)])
+
+
+def hybrid(tfidf_sims, emb_sims, weight=HYBRID_WEIGHT):
+    """两种相似度的加权和；已排除的行（两边都是 -1）仍为 -1"""
+    out = np.asarray(tfidf_sims, dtype=np.float32) * (1 - weight)
+    out += weight * emb_sims
+    return out
@@ -0,0 +1,35 @@
+import numpy as np
+
+# 推荐理由：查询 Top-8 关键词与候选书 Top-12 关键词的交集
+# 候选书的 Top-12 词由 build_index.py 预先算好，查询侧只看稀疏非零项
+
+QUERY_TOP_N = 8
+DOC_TOP_N = 12
+
+
+def doc_top_terms(X, n=DOC_TOP_N):
+    """每行权重最高的 n 个词 id，形状 (rows, n)，不足补 -1"""
+    X = X.tocsr()
+    lengths = np.diff(X.indptr)
+    rows = np.repeat(np.arange(X.shape[0]), lengths)
+    # 行内按权重降序，同权重按词 id 升序；权重先取整到 1e-12，
+    # 避免浮点求和顺序不同（如流式构建）导致同分词的取舍不一致
+    order = np.lexsort((X.indices, -np.round(X.data, 12), rows))
+    ranks = np.arange(X.nnz) - np.repeat(X.indptr[:-1], lengths)
+    keep = ranks < n
+    out = np.full((X.shape[0], n), -1, dtype=np.int32)
+    out[rows[keep], ranks[keep]] = X.indices[order][keep]
+    return out
+
+
+def query_terms(q_vec, n=QUERY_TOP_N):
+    """查询向量权重最高的 n 个词 id（只遍历非零项）"""
+    q_vec = q_vec.tocsr()
+    data, indices = q_vec.data, q_vec.indices
+    return indices[np.argsort(-data, kind='stable')[:n]]
+
+
+def explain(q_terms, doc_terms, feature_names, limit=5):
+    """交集按词表顺序返回前 limit 个词"""
+    common = np.intersect1d(q_terms, doc_terms[doc_terms >= 0])
+    return feature_names[common[:limit]].tolist()
@@ -0,0 +1,140 @@
+import os
+import numpy as np
+
+from columns import StringColumn
+
+# 属性过滤：建索引时为每个 (属性, 取值) 预先算好按位打包的位图，word_count 建排序后的范围索引
+# 查询时在位图上做与/或得到行掩码，在 Top-K 之前把不满足的行分数置为 -1，代价与不过滤的查询相同
+#   filters.keys.*.npy        "属性=取值" 字符串，排好序，与 filters.bits 的行对齐
+#   filters.bits.npy          (键数, ceil(行数/8)) uint8，np.packbits 打包的位图
+#   filters.<属性>.values.npy / .rows.npy   范围属性：非空值升序及其行号
+#
+# 过滤条件：{"status": "完结", "category": "古色古香", "perspective": ["主受", "女主"],
+#            "word_count": {"min": 100000, "max": 500000}}
+#   不同属性之间取交集，同一属性给列表时取并集；category 既可写完整分类，也可写其中一段（如 "古色古香"）
+
+CATEGORICAL = ('category', 'status', 'perspective', 'sign_status')
+RANGES = ('word_count',)
+_SEP = '='
+
+
+def _keys(attr, value):
+    if value is None or value != value or str(value).strip() == '':
+        return []
+    value = str(value).strip()
+    keys = [attr + _SEP + value]
+    if attr == 'category':
+        # 原创-纯爱-架空历史-仙侠：每一段都可以单独过滤
+        keys += [attr + _SEP + part for part in value.split('-') if part and part != value]
+    return keys
+
+
+class FilterIndex:
+    def __init__(self, n_rows, keys, bits, ranges):
+        self.n_rows = n_rows
+        self.keys = keys                # StringColumn，已排序
+        self.bits = bits                # (len(keys), ceil(n_rows/8)) uint8
+        self.ranges = ranges            # 属性 -> (升序的值, 对应行号)
+        self._slots = {k: i for i, k in enumerate(keys.tolist())}
+
+    @classmethod
+    def build(cls, books_df):
+        """books_df 中缺少的属性列不建索引；一列都没有时返回 None"""
+        attrs = [a for a in CATEGORICAL if a in books_df]
+        range_attrs = [a for a in RANGES if a in books_df]
+        if not attrs and not range_attrs:
+            return None
+        n = len(books_df)
+        postings = {}
+        for attr in attrs:
+            for row, value in enumerate(books_df[attr].tolist()):
+                for key in _keys(attr, value):
+                    postings.setdefault(key, []).append(row)
+        keys = sorted(postings)
+        bits = np.zeros((len(keys), (n + 7) // 8), dtype=np.uint8)
+        for i, key in enumerate(keys):
+            mask = np.zeros(n, dtype=bool)
+            mask[postings[key]] = True
+            bits[i] = np.packbits(mask)
+        ranges = {}
+        for attr in range_attrs:
+            values = books_df[attr].to_numpy(dtype=np.float64)
+            rows = np.flatnonzero(~np.isnan(values))
+            order = rows[np.argsort(values[rows], kind='stable')]
+            ranges[attr] = (values[order], order.astype(np.int64))
+        return cls(n, StringColumn.from_strings(keys), bits, ranges)
+
+    def save(self, index_dir):
+        path = lambda name: os.path.join(index_dir, name)
+        self.keys.save(path('filters.keys'))
+        np.save(path('filters.bits.npy'), self.bits)
+        for attr, (values, rows) in self.ranges.items():
+            np.save(path(f'filters.{attr}.values.npy'), values)
+            np.save(path(f'filters.{attr}.rows.npy'), rows)
+
+    @classmethod
+    def load(cls, index_dir, n_rows, mmap_mode='r'):
+        """目录下没有过滤索引时返回 None"""
+        path = lambda name: os.path.join(index_dir, name)
+        if not os.path.exists(path('filters.bits.npy')):
+            return None
+        ranges = {}
+        for attr in RANGES:
+            if os.path.exists(path(f'filters.{attr}.values.npy')):
+                ranges[attr] = (np.load(path(f'filters.{attr}.values.npy'), mmap_mode=mmap_mode),
+                                np.load(path(f'filters.{attr}.rows.npy'), mmap_mode=mmap_mode))
+        return cls(n_rows, StringColumn.load(path('filters.keys'), mmap_mode),
+                   np.load(path('filters.bits.npy'), mmap_mode=mmap_mode), ranges)
+
+    def _bits(self, attr, values):
+        # 同一属性的多个取值：打包位图按字节或
+        out = np.zeros(self.bits.shape[1], dtype=np.uint8)
+        for value in values:
+            slot = self._slots.get(attr + _SEP + str(value).strip())
+            if slot is not None:
+                out |= self.bits[slot]
+        return out
+
+    def _range(self, attr, bounds):
+        values, rows = self.ranges[attr]
+        lo = np.searchsorted(values, bounds.get('min', -np.inf), side='left')
+        hi = np.searchsorted(values, bounds.get('max', np.inf), side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows[lo:hi]] = True
+        return mask
+
+    def mask(self, filters):
+        """过滤条件 -> 长度为行数的布尔掩码；不支持的属性或格式抛 ValueError"""
+        packed = None
+        mask = None
+        for attr, cond in filters.items():
+            if attr in CATEGORICAL:
+                values = cond if isinstance(cond, list) else [cond]
+                if not values or not all(isinstance(v, (str, int)) for v in values):
+                    raise ValueError(f'{attr} must be a string or a list of strings')
+                bits = self._bits(attr, values)
+                packed = bits if packed is None else packed & bits
+            elif attr in self.ranges:
+                if not isinstance(cond, dict) or not cond or set(cond) - {'min', 'max'} or not all(
+                        isinstance(v, (int, float)) and not isinstance(v, bool) for v in cond.values()):
+                    raise ValueError(f'{attr} must be an object with numeric min and/or max')
+                m = self._range(attr, cond)
+                mask = m if mask is None else mask & m
+            else:
+                raise ValueError(f'unknown filter {attr!r}, expected one of {sorted(CATEGORICAL + tuple(self.ranges))}')
+        if packed is not None:
+            m = np.unpackbits(packed, count=self.n_rows).view(bool)
+            mask = m if mask is None else mask & m
+        return mask if mask is not None else np.ones(self.n_rows, dtype=bool)
+
+
+class ConcatFilters:
+    """主段与增量段的过滤索引按行拼接"""
+
+    def __init__(self, main, delta):
+        self.main = main
+        self.delta = delta
+        self.n_rows = main.n_rows + delta.n_rows
+
+    def mask(self, filters):
+        return np.concatenate([self.main.mask(filters), self.delta.mask(filters)])
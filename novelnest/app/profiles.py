@@ -0,0 +1,274 @@
+import time, sqlite3, logging, threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 用户画像：每个用户一个词表空间的偏好向量，由问卷文本和 喜欢/不喜欢/已读 反馈累加而成
+#   - 向量稀疏存储（按词 id 排序的 id 数组 + float32 权重），只在查询时展开成稠密向量
+#   - 每条反馈只更新该书 TF-IDF 行的非零项（O(nnz)），不回放历史；范数随更新增量维护
+#   - 旧反馈按 DECAY 逐条衰减：向量存成 scale * vec，衰减只改 scale，新反馈按 1/scale 放大后累加
+#   - 查询时用归一化后的稠密向量直接走 retrieval.search / ANN，与按书查询同一条路径
+#   - 反馈过的书记入已读集合，推荐时转成行位图，在 Top-K 之前排除（与属性过滤的掩码取交集）
+# 持久化：SQLite（默认 data/user_profiles.db），非零项按词（而不是词 id）存成 UTF-8 + float32 两个 BLOB，
+# 全量重建换了词表也能按词映射回来。更新先落在进程内，后台线程每 FLUSH_INTERVAL 秒批量写回；
+# 多个 worker 时同一用户的反馈应路由到同一个 worker，其它 worker 读到的是最近一次写回的画像
+
+ACTIONS = {'like': 1.0, 'read': 0.3, 'dislike': -0.5, 'questionnaire': 1.0}
+DECAY = 0.99            # 每条反馈后旧偏好乘上的系数（半衰期约 69 条）
+MIN_SCALE = 1e-6        # scale 小于它时把 scale 乘回向量，避免 float32 溢出
+FLUSH_INTERVAL = 1.0
+MAX_CACHED = 10_000     # 进程内缓存的用户数（稀疏存储，每个非零词 8 字节，几千个词的画像约几十 KB）
+
+log = logging.getLogger(__name__)
+
+
+def _vocab_key(index):
+    # 增量段沿用主段词表，只有主段版本变化（全量构建、压缩）才可能换词表
+    return index.meta.get('main_version', index.meta['version'])
+
+
+class Profile:
+    def __init__(self, dims, vocab_key, feature_names):
+        self.dims = dims
+        self.ids = np.empty(0, dtype=np.int32)          # 非零项的词 id，升序
+        self.weights = np.empty(0, dtype=np.float32)    # 对应权重（不含 scale）
+        self.scale = 1.0
+        self.sq_norm = 0.0          # weights（不含 scale）的平方范数
+        self.read = set()           # 反馈过的 book_id
+        self.events = 0
+        self.updated_at = None
+        self.dirty = False
+        self.vocab_key = vocab_key
+        self.feature_names = feature_names
+
+    def add(self, indices, data, weight):
+        """累加一行稀疏向量（indices/data），只触及它的非零项"""
+        self.scale *= DECAY
+        indices = np.asarray(indices, dtype=np.int32)
+        order = np.argsort(indices, kind='stable')
+        indices, data = indices[order], np.asarray(data, dtype=np.float64)[order]
+        pos = np.searchsorted(self.ids, indices)
+        hit = pos < len(self.ids)
+        hit[hit] = self.ids[pos[hit]] == indices[hit]
+        old = np.zeros(len(indices))
+        old[hit] = self.weights[pos[hit]]
+        new = old + (weight / self.scale) * data
+        self.weights[pos[hit]] = new[hit]
+        if not hit.all():
+            miss = ~hit
+            self.ids = np.insert(self.ids, pos[miss], indices[miss])
+            self.weights = np.insert(self.weights, pos[miss], new[miss].astype(np.float32))
+        self.sq_norm += float(new @ new - old @ old)
+        if self.scale < MIN_SCALE:
+            self.weights *= self.scale
+            self.sq_norm = float(self.weights.astype(np.float64) @ self.weights)
+            self.scale = 1.0
+        self.events += 1
+        self.updated_at = time.time()
+        self.dirty = True
+
+    def query(self):
+        """L2 归一化的稠密查询向量；还没有任何偏好时返回 None"""
+        norm = np.sqrt(max(self.sq_norm, 0.0))
+        if norm <= 0:
+            return None
+        vec = np.zeros(self.dims, dtype=np.float32)
+        vec[self.ids] = self.weights / np.float32(norm)
+        return vec
+
+    def top_terms(self, n):
+        """正向权重最高的 n 个词 id（推荐理由用）"""
+        pos = np.flatnonzero(self.weights > 0)
+        return self.ids[pos[np.argsort(-self.weights[pos], kind='stable')[:n]]].astype(np.intp)
+
+    def dump(self):
+        nz = np.flatnonzero(self.weights)
+        weights = (self.weights[nz].astype(np.float64) * self.scale).astype(np.float32)
+        terms = '\n'.join(self.feature_names[self.ids[nz]].tolist()).encode('utf-8')
+        read = np.array(sorted(self.read), dtype=np.int64)
+        return terms, weights.tobytes(), read.tobytes(), self.events, self.updated_at
+
+    @classmethod
+    def restore(cls, row, index):
+        terms, weights, read, events, updated_at = row
+        profile = cls(index.tfidf_matrix.shape[1], _vocab_key(index), index.feature_names)
+        if terms:
+            vocab = index.vectorizer.vocabulary
+            ids = np.array([vocab.get(t, -1) for t in terms.decode('utf-8').split('\n')], dtype=np.int64)
+            weights = np.frombuffer(weights, dtype=np.float32)
+            # 新词表里没有的词丢弃
+            keep = ids >= 0
+            order = np.argsort(ids[keep], kind='stable')
+            profile.ids = ids[keep][order].astype(np.int32)
+            profile.weights = weights[keep][order].copy()
+            profile.sq_norm = float(profile.weights.astype(np.float64) @ profile.weights)
+        profile.read = set(np.frombuffer(read, dtype=np.int64).tolist()) if read else set()
+        profile.events = events
+        profile.updated_at = updated_at
+        return profile
+
+
+def read_mask(books, read_ids):
+    """已读书的行位图取反：可推荐的行为 True"""
+    mask = np.ones(len(books), dtype=bool)
+    if len(read_ids):
+        rows = books.rows_for_ids(read_ids)
+        mask[rows[rows >= 0]] = False
+    return mask
+
+
+class ProfileStore:
+    def __init__(self, path, max_cached=MAX_CACHED, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_cached = max_cached
+        self.flush_interval = flush_interval
+        self._profiles = OrderedDict()      # user_id -> Profile，LRU
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        self.events = 0
+        self.flushes = 0
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_profile (
+                user_id     TEXT PRIMARY KEY,
+                terms       BLOB,
+                weights     BLOB,
+                read_ids    BLOB,
+                events      INTEGER,
+                updated_at  REAL
+            ) WITHOUT ROWID
+        ''')
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 连接不能跨线程共享，每个线程一个
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _get(self, user_id, index, create):
+        # 调用方持有 self._lock
+        profile = self._profiles.get(user_id)
+        if profile is not None and profile.vocab_key != _vocab_key(index):
+            # 换了词表：按词映射到新词表，再按新词表继续更新
+            row = profile.dump()
+            dirty = profile.dirty
+            profile = Profile.restore(row, index)
+            profile.dirty = dirty
+            self._profiles[user_id] = profile
+        if profile is None:
+            row = self._conn().execute(
+                'SELECT terms, weights, read_ids, events, updated_at FROM user_profile WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            if row is None and not create:
+                return None
+            profile = Profile.restore(row, index) if row else Profile(
+                index.tfidf_matrix.shape[1], _vocab_key(index), index.feature_names)
+            self._profiles[user_id] = profile
+            self._evict()
+        self._profiles.move_to_end(user_id)
+        return profile
+
+    def _evict(self):
+        # 只淘汰已写回的画像，未写回的等下一次 flush
+        for user_id in list(self._profiles):
+            if len(self._profiles) <= self.max_cached:
+                break
+            if not self._profiles[user_id].dirty:
+                del self._profiles[user_id]
+
+    def query(self, user_id, index, n_terms):
+        """
+        推荐用的快照：(归一化查询向量, 已读 book_id 数组, 正向权重最高的 n_terms 个词 id)。
+        用户不存在时返回 None，没有任何偏好时查询向量为 None。
+        """
+        with self._lock:
+            profile = self._get(user_id, index, create=False)
+            if profile is None:
+                return None
+            read = np.fromiter(profile.read, dtype=np.int64, count=len(profile.read))
+            return profile.query(), read, profile.top_terms(n_terms)
+
+    def summary(self, user_id, index, n_terms):
+        with self._lock:
+            profile = self._get(user_id, index, create=False)
+            if profile is None:
+                return None
+            return {
+                'user_id': user_id,
+                'events': profile.events,
+                'read': len(profile.read),
+                'terms': index.feature_names[profile.top_terms(n_terms)].tolist(),
+                'updated_at': profile.updated_at,
+            }
+
+    def feedback(self, user_id, events, index):
+        """
+        events: [(action, book_id 或 None, 1 行稀疏向量)]，已由调用方解析好（问卷文本的 book_id 为 None）。
+        在同一把锁内依次累加，返回更新后的 Profile。
+        """
+        with self._lock:
+            profile = self._get(user_id, index, create=True)
+            for action, book_id, row in events:
+                row = row.tocsr()
+                profile.add(row.indices, row.data, ACTIONS[action])
+                if book_id is not None:
+                    profile.read.add(int(book_id))
+            self.events += len(events)
+            return profile
+
+    def flush(self):
+        """把未写回的画像批量写入 SQLite（单事务）"""
+        with self._lock:
+            dirty = [(user_id, p) for user_id, p in self._profiles.items() if p.dirty]
+            rows = [(user_id,) + p.dump() for user_id, p in dirty]
+        if not rows:
+            return 0
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO user_profile (user_id, terms, weights, read_ids, events, updated_at) '
+                'VALUES (?,?,?,?,?,?)', rows)
+        with self._lock:
+            # 写回期间又有新反馈的画像保持 dirty
+            for (_, profile), row in zip(dirty, rows):
+                if profile.events == row[4]:
+                    profile.dirty = False
+            self.flushes += 1
+            self._evict()
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.warning('profile flush failed: %r', e)
+
+    def start(self):
+        if self.flush_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='profile-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cached': len(self._profiles),
+                'dirty': sum(p.dirty for p in self._profiles.values()),
+                'events': self.events,
+                'flushes': self.flushes,
+            }
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from retrieval import top_k
+from timeseries import first_valid, last_valid
+
+# 热度融合排序：相似度召回 OVERSAMPLE 倍候选，再按 相似度 + 热度 + 增长 + 新鲜度 + 完结 的加权和重排
+# 特征在 build_index.py 里由 stats 时间序列（timeseries.py 对齐成矩阵）预先算好，存成与 TF-IDF 行对齐的 rank_features.npy（float32）
+#   popularity  收藏/积分/点击/评论最新值取 log 后的百分位均值，[0, 1]
+#   growth      库里最新日期之前 GROWTH_DAYS 天内收藏与章节数的日均增量百分位均值，[0, 1]
+#   updated     最新更新时间（距 1970-01-01 的天数，未知为 NaN），新鲜度在查询时按半衰期换算
+#   completed   文章进度为“完结”时为 1
+
+FEATURES = ('popularity', 'growth', 'updated', 'completed')
+POPULARITY_METRICS = ('favorite_count', 'score', 'total_click_count', 'review_count')
+GROWTH_METRICS = ('favorite_count', 'chapter_count')
+GROWTH_DAYS = 30
+FRESH_HALF_LIFE = 30.0
+OVERSAMPLE = 5
+WEIGHTS = {'similarity': 1.0, 'popularity': 0.15, 'growth': 0.05, 'freshness': 0.05, 'completion': 0.02}
+
+
+def _pct(values):
+    # 百分位归一化，对长尾分布比 min-max 稳；只在正值之间排名，0 仍为 0，缺失值保持 NaN
+    out = np.where(values > 0, np.nan, values)
+    positive = values > 0
+    out[positive] = pd.Series(values[positive]).rank(pct=True).to_numpy()
+    return out
+
+
+def _mean(cols, n):
+    if not cols:
+        return np.zeros(n, dtype=np.float32)
+    with np.errstate(invalid='ignore'):
+        stacked = np.vstack(cols)
+        counts = (~np.isnan(stacked)).sum(axis=0)
+        out = np.where(counts > 0, np.nansum(stacked, axis=0) / np.maximum(counts, 1), 0)
+    return out.astype(np.float32)
+
+
+def compute_features(book_ids, latest, series, books):
+    """
+    book_ids: 索引行对应的 book_id；latest: 与 book_ids 对齐的最新快照（timeseries.latest_snapshot）；
+    series: 与 book_ids 对齐、最近 GROWTH_DAYS 天、未向前填充的 timeseries.Series；
+    books: book 表的 book_id/status/last_update_time。
+    返回 (len(book_ids), len(FEATURES)) 的 float32 数组。
+    """
+    ids = pd.Index(np.asarray(book_ids, dtype=np.int64))
+    n = len(ids)
+    popularity = [_pct(np.log1p(latest[m].to_numpy(dtype=np.float64)))
+                  for m in POPULARITY_METRICS if m in latest and latest[m].notna().any()]
+    growth = []
+    for m in GROWTH_METRICS:
+        if m in series.values:
+            # 窗口内第一次与最后一次快照之间的日均增量；只有一次快照的书没有增长可言
+            first_col, first = first_valid(series[m])
+            last_col, last = last_valid(series[m])
+            days = (series.dates.values[last_col] - series.dates.values[first_col]) / np.timedelta64(1, 'D')
+            days[first_col < 0] = 0
+            with np.errstate(invalid='ignore'):
+                per_day = (last.astype(np.float64) - first) / np.maximum(days, 1)
+            per_day[days <= 0] = np.nan
+            if not np.isnan(per_day).all():
+                growth.append(_pct(np.log1p(np.clip(per_day, 0, None))))
+
+    books = books.set_index('book_id').reindex(ids)
+    updated = pd.to_datetime(books['last_update_time'], errors='coerce')
+    updated_days = ((updated - pd.Timestamp('1970-01-01')).dt.total_seconds() / 86400).to_numpy(dtype=np.float64)
+    completed = (books['status'] == '完结').to_numpy(dtype=np.float32)
+
+    out = np.empty((n, len(FEATURES)), dtype=np.float32)
+    out[:, 0] = _mean(popularity, n)
+    out[:, 1] = _mean(growth, n)
+    out[:, 2] = updated_days
+    out[:, 3] = completed
+    return out
+
+
+def parse_weights(overrides=None, base=WEIGHTS):
+    """在 base 上覆盖部分权重；未知的键或非数字抛 ValueError"""
+    weights = dict(base)
+    for key, value in (overrides or {}).items():
+        if key not in weights:
+            raise ValueError(f'unknown weight {key!r}, expected one of {sorted(weights)}')
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f'weight {key!r} must be a number')
+        weights[key] = float(value)
+    return weights
+
+
+def blend(cand, sims, features, weights, k, today):
+    """
+    对候选 (cand, sims) 按加权和重排，返回 (top_idx, scores)，scores 为融合后的分数。
+    全部是候选长度上的向量运算；sims 为 -1 的行（被排除的查询书、失效行）直接丢弃。
+    """
+    keep = sims > -1
+    cand, sims = cand[keep], sims[keep]
+    f = np.asarray(features[cand], dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        fresh = np.nan_to_num(np.exp2(-np.maximum(today - f[:, 2], 0) / FRESH_HALF_LIFE))
+    scores = (weights['similarity'] * sims
+              + weights['popularity'] * f[:, 0]
+              + weights['growth'] * f[:, 1]
+              + weights['freshness'] * fresh
+              + weights['completion'] * f[:, 3])
+    best = top_k(scores, k)
+    return cand[best], scores[best]
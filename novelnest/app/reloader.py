@@ -0,0 +1,131 @@
+import time, logging, threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from store import current_version, load_index
+
+# 索引热切换：后台线程轮询 CURRENT 指针（及增量段），发现新版本就在后台加载、预热，
+# 然后在锁内一次性替换当前快照。每个请求开始时 pin 住当时的快照、结束时释放，
+# 旧快照在最后一个请求结束后才被丢弃，处理中的请求始终用同一个版本算完
+
+log = logging.getLogger(__name__)
+
+
+class Snapshot:
+    def __init__(self, index):
+        self.index = index
+        self.version = index.meta['version']
+        self.loaded_at = time.time()
+        self.refs = 0
+
+
+def _warm(index):
+    """切换前先把 mmap 的矩阵和书目 id 读进 page cache，避免切换后第一批查询变慢"""
+    index.tfidf_matrix @ np.zeros(index.tfidf_matrix.shape[1])
+    index.books.rows_for_ids([])
+
+
+class IndexManager:
+    def __init__(self, index_dir, interval=2.0, on_swap=None, prepare=None):
+        self.index_dir = index_dir
+        self.interval = interval
+        self.on_swap = on_swap      # 切换后回调，参数为新的 Index（如让缓存换版本）
+        self.prepare = prepare      # 加载后、预热前对 Index 的处理（如按行分片），在后台线程里完成
+        self._lock = threading.Lock()
+        self._active = self._load()
+        self._draining = []         # 已被替换、仍有请求在用的旧快照
+        self._thread = None
+        self._stop = threading.Event()
+        self.swaps = 0
+        self.last_check = None
+        self.last_error = None
+
+    def _load(self):
+        index = load_index(self.index_dir)
+        if self.prepare is not None:
+            self.prepare(index)
+        _warm(index)
+        return Snapshot(index)
+
+    @property
+    def active(self):
+        return self._active
+
+    def pin(self):
+        with self._lock:
+            snap = self._active
+            snap.refs += 1
+            return snap
+
+    def release(self, snap):
+        with self._lock:
+            snap.refs -= 1
+            if snap.refs == 0 and snap in self._draining:
+                # 旧版本的最后一个请求已结束，丢掉引用，mmap 随之释放
+                self._draining.remove(snap)
+
+    @contextmanager
+    def acquire(self):
+        snap = self.pin()
+        try:
+            yield snap.index
+        finally:
+            self.release(snap)
+
+    def check(self):
+        """指针指向新版本时加载并切换；返回是否发生了切换"""
+        self.last_check = time.time()
+        version = current_version(self.index_dir)
+        if version is None or version == self._active.version:
+            return False
+        # 加载与预热都不持锁，期间请求继续使用旧快照
+        snap = self._load()
+        with self._lock:
+            old, self._active = self._active, snap
+            if old.refs:
+                self._draining.append(old)
+            self.swaps += 1
+        if self.on_swap is not None:
+            self.on_swap(snap.index)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                # 新版本写到一半或损坏时保留旧版本，下次轮询再试
+                self.last_error = repr(e)
+                log.warning('index reload failed: %r', e)
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='index-reloader', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def status(self):
+        with self._lock:
+            snap = self._active
+            meta = snap.index.meta
+            return {
+                'version': snap.version,
+                'main_version': meta.get('main_version', snap.version),
+                'created_at': meta['created_at'],
+                'rows': meta['rows'],
+                'delta_rows': meta.get('delta_rows', 0),
+                'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snap.loaded_at)),
+                'in_flight': snap.refs,
+                'draining': [{'version': s.version, 'in_flight': s.refs} for s in self._draining],
+                'swaps': self.swaps,
+                'watching': self._thread is not None,
+                'last_error': self.last_error,
+            }
@@ -0,0 +1,97 @@
+import numpy as np
+
+# 共享检索逻辑：api.py 与 ui.py 共用
+# TF-IDF 行向量已做 L2 归一化，因此余弦相似度等价于稀疏点积
+
+
+def score_all(q_vec, tfidf_matrix):
+    """查询向量与全部书目的相似度（1 维 float 数组）"""
+    # 查询只有一行，转成稠密向量后走 CSR×向量，比稀疏×稀疏快得多
+    if hasattr(q_vec, 'toarray'):
+        q_vec = q_vec.toarray()
+    return tfidf_matrix @ np.asarray(q_vec).ravel()
+
+
+def top_k(sims, k):
+    """
+    局部 Top-K：argpartition 选出候选，只对 K 个元素排序。
+    排序结果与 sims.argsort(kind='stable')[::-1][:k] 一致：
+    分数降序，分数相同时下标大的在前。
+    """
+    n = sims.shape[0]
+    k = min(int(k), n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        kth = sims[np.argpartition(sims, n - k)[n - k]]
+    else:
+        kth = sims.min()
+    above = np.flatnonzero(sims > kth)
+    above = above[np.lexsort((above, sims[above]))[::-1]]
+    # 与第 K 名同分的元素按下标从大到小补齐
+    ties = np.flatnonzero(sims == kth)[::-1][: k - above.shape[0]]
+    return np.concatenate([above, ties])
+
+
+def masked_top_k(sims, k, rows):
+    """
+    只在 rows（升序的满足过滤条件的行号）里取 Top-K，同分次序与 top_k 一致；
+    不满足条件的行不参与 argpartition（大量同为 -1 的元素会让选择退化）。
+    被排除的行（分数 -1）不返回。
+    """
+    sub = sims[rows]
+    best = top_k(sub, k)
+    best = best[sub[best] > -1]
+    return rows[best], sub[best]
+
+
+def select(sims, k, exclude=None, mask=None):
+    """在 score_all 的结果上排除、过滤并取 Top-K，返回 (top_idx, scores)；会改写 sims"""
+    if exclude is not None:
+        sims[exclude] = -1
+    if mask is not None:
+        return masked_top_k(sims, k, np.flatnonzero(mask))
+    top_idx = top_k(sims, k)
+    return top_idx, sims[top_idx]
+
+
+def search(q_vec, tfidf_matrix, k, exclude=None, mask=None):
+    """
+    返回 (top_idx, scores)；exclude 为需排除的行（如查询书本身）。
+    mask 为行过滤掩码（filters.FilterIndex.mask），在 Top-K 之前生效，满足条件的不足 k 行时返回更少。
+    """
+    return select(score_all(q_vec, tfidf_matrix), k, exclude, mask)
+
+
+# 批量检索时每个分块的相似度矩阵元素上限（float64 约 128MB）
+BATCH_CELLS = 1 << 24
+
+
+def iter_score_blocks(Q, tfidf_matrix, max_cells=BATCH_CELLS):
+    """按查询行分块计算 Q @ tfidf_matrix.T，逐块产出 (起始行, 相似度矩阵)，内存占用有上界"""
+    n = tfidf_matrix.shape[0]
+    step = max(1, max_cells // max(n, Q.shape[1]))
+    for start in range(0, Q.shape[0], step):
+        block = Q[start:start + step]
+        # 稀疏矩阵 × 稠密块：一次 CSR 遍历算出整块查询的分数
+        sims = tfidf_matrix @ block.T.toarray()
+        yield start, np.ascontiguousarray(sims.T)
+
+
+def search_batch(Q, tfidf_matrix, k, exclude=None, max_cells=BATCH_CELLS, mask=None):
+    """
+    多条查询一次算完，返回与 Q 行对齐的 [(top_idx, scores), ...]。
+    exclude[j] 为第 j 条查询要排除的行，-1 表示不排除；mask 为整批共用的行过滤掩码。
+    """
+    out = []
+    rows = np.flatnonzero(mask) if mask is not None else None
+    for start, sims in iter_score_blocks(Q, tfidf_matrix, max_cells):
+        for j, row in enumerate(sims):
+            if exclude is not None and exclude[start + j] >= 0:
+                row[exclude[start + j]] = -1
+            if rows is not None:
+                out.append(masked_top_k(row, k, rows))
+                continue
+            top_idx = top_k(row, k)
+            out.append((top_idx, row[top_idx]))
+    return out
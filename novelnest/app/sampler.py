@@ -0,0 +1,95 @@
+import sys, time, threading
+from collections import Counter
+
+# 采样式性能剖析：后台线程每隔 interval 秒抓一次正在处理请求的线程的调用栈，按“折叠栈”计数，
+# 输出与 flamegraph.pl / speedscope 兼容（每行 "外层;...;内层 次数"）。运行中随时开关，不用重启；
+# 关闭时没有任何开销，开启时只在采样线程里读 sys._current_frames，不影响请求线程
+
+MAX_DEPTH = 64
+
+
+def _collapse(frame, max_depth=MAX_DEPTH):
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = set()       # 正在处理请求的线程 id，只采这些线程
+        self._stop = threading.Event()
+        self._thread = None
+        self.interval = None
+        self.started_at = None
+        self.samples = 0
+        self.stacks = Counter()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def enter(self):
+        if self._thread is not None:
+            with self._lock:
+                self._threads.add(threading.get_ident())
+
+    def exit(self):
+        if self._threads:
+            with self._lock:
+                self._threads.discard(threading.get_ident())
+
+    def start(self, interval=0.005):
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.interval = interval
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._threads.clear()
+        if thread is None:
+            return False
+        self._stop.set()
+        thread.join()
+        return True
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = list(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            stacks = [_collapse(frames[t]) for t in threads if t in frames]
+            with self._lock:
+                self.stacks.update(stacks)
+                self.samples += len(stacks)
+
+    def collapsed(self, limit=None):
+        with self._lock:
+            return ''.join(f'{stack} {n}\n' for stack, n in self.stacks.most_common(limit))
+
+    def status(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'interval_ms': self.interval * 1000 if self.interval else None,
+                'started_at': self.started_at,
+                'samples': self.samples,
+                'stacks': len(self.stacks),
+            }
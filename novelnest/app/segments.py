@@ -0,0 +1,120 @@
+import numpy as np
+import scipy.sparse as sp
+
+from ann import DEFAULT_NPROBE, RERANK_FACTOR, rerank
+
+# 主段 + 增量段的合并视图，供 store.load_index 在存在增量段时使用
+# 全局行号 = [主段各行..., 增量段各行...]；主段数组保持 mmap，不做拷贝
+# 被增量段替换掉的主段行（dead）打分恒为 -1，不会进入 Top-K
+
+
+def _split(rows, offset):
+    rows = np.asarray(rows, dtype=np.int64)
+    in_main = rows < offset
+    return rows, in_main
+
+
+class SegmentedMatrix:
+    """按行拼接的只读 CSR 视图，支持 @ 稠密向量/矩阵与按行取子矩阵"""
+
+    def __init__(self, main, delta, dead):
+        self.main = main
+        self.delta = delta
+        self.dead = dead
+        self.offset = main.shape[0]
+        self.shape = (main.shape[0] + delta.shape[0], main.shape[1])
+        self.nnz = main.nnz + delta.nnz
+
+    def __matmul__(self, other):
+        out = np.concatenate([np.asarray(self.main @ other), np.asarray(self.delta @ other)])
+        out[self.dead] = -1
+        return out
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(self.shape[0]))
+        rows, in_main = _split(np.atleast_1d(rows), self.offset)
+        if in_main.all():
+            return self.main[rows]
+        if not in_main.any():
+            return self.delta[rows - self.offset]
+        parts = sp.vstack([self.main[rows[in_main]], self.delta[rows[~in_main] - self.offset]], format='csr')
+        # 还原成调用方给出的行顺序
+        perm = np.concatenate([np.flatnonzero(in_main), np.flatnonzero(~in_main)])
+        return parts[np.argsort(perm)]
+
+    def tocsr(self):
+        return sp.vstack([self.main, self.delta], format='csr')
+
+
+class SegmentedArray:
+    """按第 0 维拼接的只读数组视图（如 doc_top_terms）"""
+
+    def __init__(self, main, delta):
+        self.main = main
+        self.delta = delta
+        self.offset = main.shape[0]
+        self.shape = (main.shape[0] + delta.shape[0],) + main.shape[1:]
+        self.dtype = main.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        if np.ndim(rows) == 0:
+            return self.main[rows] if rows < self.offset else self.delta[rows - self.offset]
+        rows, in_main = _split(rows, self.offset)
+        out = np.empty(rows.shape + self.shape[1:], dtype=self.dtype)
+        out[in_main] = self.main[rows[in_main]]
+        out[~in_main] = self.delta[rows[~in_main] - self.offset]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        out = np.concatenate([self.main, self.delta])
+        return out if dtype is None else out.astype(dtype)
+
+
+class SegmentedANN:
+    """主段的 IVF 候选去掉已失效的行，再并上全部增量段行，一起精排"""
+
+    def __init__(self, ann, offset, n_delta, dead_mask):
+        self.ann = ann
+        self.offset = offset
+        self.n_delta = n_delta
+        self.dead_mask = dead_mask
+
+    def search(self, q_vec, tfidf_matrix, k, exclude=None, nprobe=DEFAULT_NPROBE, mask=None):
+        cand = self.ann.candidates(q_vec, k * RERANK_FACTOR + 1, nprobe)
+        cand = np.concatenate([cand[~self.dead_mask[cand]], np.arange(self.offset, self.offset + self.n_delta)])
+        return rerank(q_vec, tfidf_matrix, cand, k, exclude, mask)
+
+
+class SegmentedVectors:
+    """主段与增量段的量化书向量（embedding.VectorStore）合并视图；被替换的主段行打分为 -1"""
+
+    def __init__(self, main, delta, dead):
+        self.main = main
+        self.delta = delta
+        self.dead = dead
+        self.offset = len(main)
+        self.shape = (len(main) + len(delta),) + main.shape[1:]
+        self.dtype = main.dtype
+
+    @property
+    def nbytes(self):
+        return self.main.nbytes + self.delta.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def rows(self, rows):
+        rows, in_main = _split(np.atleast_1d(rows), self.offset)
+        out = np.empty(rows.shape + self.shape[1:], dtype=np.float32)
+        out[in_main] = self.main.rows(rows[in_main])
+        out[~in_main] = self.delta.rows(rows[~in_main] - self.offset)
+        return out
+
+    def score(self, q):
+        out = np.concatenate([self.main.score(q), self.delta.score(q)])
+        out[self.dead] = -1
+        return out
@@ -0,0 +1,42 @@
+import json
+import numpy as np
+
+# 批量序列化检索结果：书目字段在建索引时已编码为 JSON 字面量，
+# 这里只做一次 gather 再拼接字节，不经过逐行 dict + jsonify
+# 字段顺序与 jsonify 的 sort_keys 输出一致
+
+
+def results_json(books, top_idx, scores, whys):
+    top_idx = np.asarray(top_idx, dtype=np.int64)
+    ids = books.ids[top_idx].tolist()
+    titles = books.title_json.take_bytes(top_idx)
+    authors = books.author_json.take_bytes(top_idx)
+    parts = [b'[']
+    for j, (book_id, score, title, author, why) in enumerate(zip(ids, np.asarray(scores).tolist(), titles, authors, whys)):
+        if j:
+            parts.append(b',')
+        parts += [
+            b'{"author":', author,
+            b',"book_id":', str(book_id).encode(),
+            b',"score":', repr(float(score)).encode(),
+            b',"title":', title,
+            b',"why":', json.dumps(why, ensure_ascii=False).encode('utf-8'),
+            b'}',
+        ]
+    parts.append(b']')
+    return b''.join(parts)
+
+
+def batch_json(queries, bodies):
+    """批量接口：bodies[j] 为第 j 条查询的 results_json 输出，None 表示未找到"""
+    parts = [b'[']
+    for j, (query, body) in enumerate(zip(queries, bodies)):
+        if j:
+            parts.append(b',')
+        parts += [b'{"query":', json.dumps(query, ensure_ascii=False).encode('utf-8')]
+        if body is None:
+            parts.append(b',"error":"not found"}')
+        else:
+            parts += [b',"results":', body, b'}']
+    parts.append(b']')
+    return b''.join(parts)
@@ -0,0 +1,99 @@
+import heapq, itertools
+import numpy as np
+import scipy.sparse as sp
+
+from retrieval import select
+from segments import SegmentedMatrix
+
+# 分片检索：TF-IDF 主段按非零元个数均分成若干行分片，线程池里并行打分、各取局部 Top-K，再用堆归并成全局 Top-K
+# 分片是 mmap 数组上的零拷贝视图（只有各分片的 indptr 是小拷贝），多个 worker 进程仍共享同一份 page cache
+# scipy 的稀疏矩阵×向量与 numpy 的 argpartition 在 C/C++ 里释放 GIL，线程就能用满多核，不需要进程池和跨进程传结果
+# 增量段作为最后一个分片，被替换的主段行打分为 -1（与 segments.SegmentedMatrix 一致）
+# 结果与 retrieval.select(score_all(...)) 完全相同，包括同分时下标大的在前
+
+
+def csr_rows(X, start, stop):
+    """X[start:stop] 的零拷贝视图：data/indices 直接切片，indptr 平移"""
+    lo, hi = X.indptr[start], X.indptr[stop]
+    view = sp.csr_matrix((stop - start, X.shape[1]), dtype=X.dtype)
+    # 不走 (data, indices, indptr) 构造：切片远小于底层数组时 scipy 会把它拷贝出来（_prune_array）
+    view.data, view.indices, view.indptr = X.data[lo:hi], X.indices[lo:hi], X.indptr[start:stop + 1] - lo
+    return view
+
+
+def shard_bounds(indptr, n_shards):
+    """按非零元个数均分的行边界 [0, ..., 行数]，分片数不超过行数"""
+    n = len(indptr) - 1
+    cuts = np.searchsorted(indptr, np.linspace(0, indptr[-1], n_shards + 1)[1:-1])
+    return np.unique(np.concatenate([[0], np.clip(cuts, 0, n), [n]]))
+
+
+def merge_top_k(parts, k):
+    """各分片的 (top_idx, scores)（全局行号，已按 分数降序、同分下标降序 排好）归并出前 k 个"""
+    merged = heapq.merge(*(zip(scores.tolist(), idx.tolist()) for idx, scores in parts),
+                         key=lambda item: (-item[0], -item[1]))
+    best = list(itertools.islice(merged, int(k)))
+    dtype = parts[0][1].dtype if parts else np.float64
+    return (np.fromiter((i for _, i in best), dtype=np.intp, count=len(best)),
+            np.fromiter((s for s, _ in best), dtype=dtype, count=len(best)))
+
+
+class ShardedMatrix:
+    """
+    按行分片的只读 TF-IDF 矩阵（CSR 或 SegmentedMatrix），可直接替换 Index.tfidf_matrix：
+    @ 稠密向量/矩阵与 search 在线程池里按分片并行，取子矩阵等其余操作交给原矩阵
+    """
+
+    def __init__(self, base, n_shards, pool):
+        self.base = base
+        self.pool = pool
+        self.shape = base.shape
+        self.nnz = base.nnz
+        if isinstance(base, SegmentedMatrix):
+            main, delta, dead = base.main, base.delta, np.asarray(base.dead, dtype=np.int64)
+        else:
+            main, delta, dead = base, None, np.empty(0, dtype=np.int64)
+        bounds = shard_bounds(main.indptr, max(1, int(n_shards)))
+        self.shards = [(start, csr_rows(main, start, stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+        if delta is not None and delta.shape[0]:
+            self.shards.append((main.shape[0], delta))
+        # 各分片里被替换的行（分片内行号）
+        self.dead = [dead[(dead >= start) & (dead < start + X.shape[0])] - start for start, X in self.shards]
+
+    def __len__(self):
+        return len(self.shards)
+
+    def _score(self, i, other):
+        sims = np.asarray(self.shards[i][1] @ other)
+        sims[self.dead[i]] = -1
+        return sims
+
+    def _map(self, fn):
+        if len(self.shards) == 1:
+            return [fn(0)]
+        return list(self.pool.map(fn, range(len(self.shards))))
+
+    def __matmul__(self, other):
+        return np.concatenate(self._map(lambda i: self._score(i, other)))
+
+    def __getitem__(self, rows):
+        return self.base[rows]
+
+    def tocsr(self):
+        return self.base.tocsr()
+
+    def search(self, q_vec, k, exclude=None, mask=None):
+        """各分片打分后就地取局部 Top-K，堆归并；参数与返回值同 retrieval.search"""
+        if hasattr(q_vec, 'toarray'):
+            q_vec = q_vec.toarray()
+        q = np.asarray(q_vec).ravel()
+        exclude = np.atleast_1d(np.asarray(exclude, dtype=np.int64)) if exclude is not None else None
+
+        def run(i):
+            start, X = self.shards[i]
+            stop = start + X.shape[0]
+            local = exclude[(exclude >= start) & (exclude < stop)] - start if exclude is not None else None
+            top_idx, scores = select(self._score(i, q), k, local, mask[start:stop] if mask is not None else None)
+            return top_idx + start, scores
+
+        return merge_top_k(self._map(run), k)
@@ -0,0 +1,421 @@
+import os, json, shutil, time, uuid, logging
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ann import IVFIndex
+from embedding import FIELDS as EMBEDDING_FIELDS, VectorStore, load_encoder
+from ranking import FEATURES as RANK_FEATURES
+from columns import ConcatColumn, StringColumn
+from filters import ConcatFilters, FilterIndex
+from segments import SegmentedANN, SegmentedArray, SegmentedMatrix, SegmentedVectors
+from titles import MergedTitleIndex, TitleIndex
+
+# 索引产物的磁盘格式：全部为原始 .npy 数组 + meta.json，可直接 np.load(mmap_mode='r')
+# 多个 worker 映射同一份文件时共享 page cache，不再各自反序列化 pickle
+#
+# models/index/
+#   CURRENT                       当前版本目录名；写新版本后原子替换（os.replace），API 轮询它热切换
+#   versions/<version>/           每次构建一个目录，保留最近 KEEP_VERSIONS 个，内容如下
+#   meta.json                     格式版本、形状、向量化参数
+#   tfidf.{data,indices,indptr}.npy   CSR 三个数组
+#   vocab.npy / idf.npy           词表与 IDF，用于重建 TfidfVectorizer
+#   doc_top_terms.npy             推荐理由索引
+#   books.id.npy                  书目 id（int64）
+#   books.{title,author}.{data,offsets}.npy   UTF-8 字节 + 偏移量的字符串列
+#   books.{title,author}_json.*.npy           同上，预编码为 JSON 字面量
+#   books.updated.*.npy           书目的 last_update_time（db 来源），增量更新据此判断哪些书变了
+#   titles.*.npy                  书名索引（规范化书名排序 + n-gram 倒排）
+#   ann_*.npy                     ANN 索引（可选）
+#   filters.*.npy                 属性过滤位图与 word_count 范围索引（可选，db 来源，见 filters.py）
+#   rank_features.npy            热度/增长/更新时间/完结特征，(rows, len(ranking.FEATURES)) float32（可选，db 来源）
+#   embedding.vectors.npy         量化的书向量 (rows, dim) int8/float16，int8 另有 embedding.scale.npy（可选，见 embedding.py）
+#   encoder.*                     书向量的编码器（encoder.json，lsa 另有词表/IDF/投影矩阵），查询文本用它编码
+#   delta/                        增量段（可选）：布局同上（无 ANN 与编码器），另有 dead.npy 记录被替换的主段行号
+#
+# 增量段只对 base_version 与主段 version 相同的主段生效；主段重建或压缩后旧增量段随目录一起被替换
+# 没有 CURRENT 的目录按单版本（旧布局）直接加载
+
+log = logging.getLogger(__name__)
+
+# 4：meta.json 记录 title_t2s（书名索引是否做了繁简折叠）
+FORMAT_VERSION = 4
+CURRENT_FILE = 'CURRENT'
+VERSIONS_DIR = 'versions'
+DELTA_DIR = 'delta'
+# 旧版本目录保留个数：切换后仍在处理请求的进程还映射着它们
+KEEP_VERSIONS = 3
+# 旧布局（版本目录之前）直接写在 index_dir 与 index_dir/delta/ 下的文件，切换到版本目录后清理
+LEGACY_FILES = (
+    'meta.json', 'vocab.npy', 'idf.npy', 'doc_top_terms.npy', 'books.id.npy', 'dead.npy',
+    'tfidf.data.npy', 'tfidf.indices.npy', 'tfidf.indptr.npy',
+    'titles.order.npy', 'titles.gram_offsets.npy', 'titles.gram_ids.npy',
+    *(f'{column}.{part}.npy'
+      for column in ('books.title', 'books.author', 'books.title_json', 'books.author_json', 'books.updated',
+                     'titles.norm', 'titles.grams')
+      for part in ('data', 'offsets')),
+    *(f'ann_{name}.npy' for name in ('components', 'centroids', 'list_offsets', 'list_ids', 'vectors')),
+)
+# 重建向量化器时需要的参数；max_features/min_df 等只影响拟合，不需要保存
+VECTORIZER_PARAMS = ('analyzer', 'binary', 'lowercase', 'ngram_range', 'norm', 'smooth_idf',
+                     'strip_accents', 'sublinear_tf', 'token_pattern', 'use_idf')
+
+
+class BookTable:
+    """按列存放的书目元数据，行号与 TF-IDF 矩阵的行一一对应"""
+
+    def __init__(self, ids, title, author, title_json, author_json, updated=None):
+        self.ids = ids
+        self.title = title
+        self.author = author
+        # 预编码的 JSON 字面量，供 serialize.results_json 直接拼接
+        self.title_json = title_json
+        self.author_json = author_json
+        # 构建时的 last_update_time，csv 来源的索引没有这一列
+        self.updated = updated
+        self._id_order = None
+        self._sorted_ids = None
+
+    def rows_for_ids(self, book_ids):
+        """book_id -> 行号，不存在的返回 -1；首次调用时建立排序索引"""
+        if self._id_order is None:
+            self._id_order = np.argsort(self.ids, kind='stable')
+            self._sorted_ids = np.asarray(self.ids)[self._id_order]
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        if len(self) == 0:
+            return np.full(book_ids.shape, -1, dtype=np.int64)
+        pos = np.clip(np.searchsorted(self._sorted_ids, book_ids), 0, len(self) - 1)
+        return np.where(self._sorted_ids[pos] == book_ids, self._id_order[pos], -1)
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def records(self, rows):
+        """按行号批量取出 book_id/title/author"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return [
+            {'book_id': book_id, 'title': title, 'author': author}
+            for book_id, title, author in zip(self.ids[rows].tolist(), self.title.take(rows), self.author.take(rows))
+        ]
+
+
+class Index:
+    def __init__(self, meta, vectorizer, tfidf_matrix, books, titles, feature_names, doc_terms, ann,
+                 rank_features=None, filters=None, path=None, embedding=None, encoder=None):
+        self.meta = meta
+        self.path = path  # 实际加载的版本目录
+        self.rank_features = rank_features
+        self.filters = filters
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.books = books
+        self.titles = titles
+        self.feature_names = feature_names
+        self.doc_terms = doc_terms
+        self.ann = ann
+        self.embedding = embedding  # 量化书向量（VectorStore / SegmentedVectors），没有时为 None
+        self.encoder = encoder      # 查询文本的编码器；编码器依赖未安装时为 None，只能按书名查
+
+
+def _write_rows(out_dir, X, books_df, doc_terms, rank_features=None, embedding=None, title_t2s=None):
+    """主段与增量段共用：按行存放的矩阵、推荐理由、书目列、排序特征与书名索引；返回书名是否做了繁简折叠"""
+    path = lambda name: os.path.join(out_dir, name)
+    if rank_features is not None:
+        np.save(path('rank_features.npy'), np.asarray(rank_features, dtype=np.float32))
+    if embedding is not None:
+        embedding.save(out_dir)
+    np.save(path('tfidf.data.npy'), X.data)
+    np.save(path('tfidf.indices.npy'), X.indices)
+    np.save(path('tfidf.indptr.npy'), X.indptr)
+    np.save(path('doc_top_terms.npy'), doc_terms)
+    np.save(path('books.id.npy'), books_df['id'].to_numpy(dtype=np.int64))
+    StringColumn.from_strings(books_df['title']).save(path('books.title'))
+    StringColumn.from_strings(books_df['author']).save(path('books.author'))
+    StringColumn.from_json_strings(books_df['title']).save(path('books.title_json'))
+    StringColumn.from_json_strings(books_df['author']).save(path('books.author_json'))
+    if 'last_update_time' in books_df:
+        StringColumn.from_strings(books_df['last_update_time'].fillna('')).save(path('books.updated'))
+    titles = TitleIndex.build(books_df['title'], title_t2s)
+    titles.save(out_dir)
+    filters = FilterIndex.build(books_df)
+    if filters is not None:
+        filters.save(out_dir)
+    return titles.t2s
+
+
+def _replace_dir(tmp_dir, target):
+    old_dir = target + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(target):
+        os.rename(target, old_dir)
+    os.rename(tmp_dir, target)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _new_version():
+    # 每次构建唯一的版本号，查询缓存以此判断失效
+    return time.strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:6]
+
+
+def resolve_index_dir(index_dir):
+    """CURRENT 指向的版本目录；旧布局（没有 CURRENT）返回 index_dir 本身"""
+    index_dir = str(index_dir)
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return index_dir
+    return os.path.join(index_dir, VERSIONS_DIR, name)
+
+
+def _read_meta(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def current_version(index_dir):
+    """当前生效的索引版本（有匹配的增量段时为增量段版本），只读两个小文件，供轮询使用；没有索引时返回 None"""
+    version_dir = resolve_index_dir(index_dir)
+    meta = _read_meta(os.path.join(version_dir, 'meta.json'))
+    if meta is None:
+        return None
+    delta = _read_meta(os.path.join(version_dir, DELTA_DIR, 'meta.json'))
+    if delta is not None and delta.get('base_version') == meta['version']:
+        return delta['version']
+    return meta['version']
+
+
+def _publish(index_dir, name):
+    """原子替换 CURRENT：读到的要么是旧版本名，要么是新版本名"""
+    tmp = os.path.join(index_dir, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(name + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(index_dir, CURRENT_FILE))
+
+
+def _prune(index_dir, current, keep=KEEP_VERSIONS):
+    # CURRENT 已指向 current 才清理：没切过去（或已被别的构建换掉）时旧文件可能仍在用
+    if resolve_index_dir(index_dir) != os.path.join(index_dir, VERSIONS_DIR, current):
+        return
+    versions_dir = os.path.join(index_dir, VERSIONS_DIR)
+    # 版本名以构建时间开头，字典序即时间序
+    names = sorted(n for n in os.listdir(versions_dir) if not n.endswith('.tmp') and n != current)
+    for name in names[:max(0, len(names) - (keep - 1))]:
+        shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+    # 旧布局直接放在 index_dir 下的文件，切换到版本目录后不再使用；只删认得的文件名，目录里的其它东西不动
+    for base in (index_dir, os.path.join(index_dir, DELTA_DIR)):
+        for name in LEGACY_FILES:
+            try:
+                os.remove(os.path.join(base, name))
+            except FileNotFoundError:
+                pass
+    try:
+        os.rmdir(os.path.join(index_dir, DELTA_DIR))
+    except OSError:
+        pass
+
+
+def write_index(index_dir, vectorizer, X, books_df, doc_terms, ann=None, rank_features=None, embedding=None, encoder=None):
+    """
+    写到 versions/<version>.tmp，改名后再原子替换 CURRENT 指针；
+    旧版本目录保留到被清理为止，正在映射旧文件的进程不受影响
+    """
+    index_dir = str(index_dir)
+    version = _new_version()
+    tmp_dir = os.path.join(index_dir, VERSIONS_DIR, version + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    path = lambda name: os.path.join(tmp_dir, name)
+
+    X = X.tocsr()
+    np.save(path('vocab.npy'), vectorizer.get_feature_names_out().astype(str))
+    np.save(path('idf.npy'), vectorizer.idf_)
+    title_t2s = _write_rows(tmp_dir, X, books_df, doc_terms, rank_features, embedding)
+    if ann is not None:
+        ann.save(tmp_dir)
+    if embedding is not None:
+        encoder.save(tmp_dir)
+
+    params = vectorizer.get_params()
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'rows': X.shape[0],
+        'features': X.shape[1],
+        'nnz': int(X.nnz),
+        'vectorizer': {name: params[name] for name in VECTORIZER_PARAMS},
+        'rank_features': list(RANK_FEATURES) if rank_features is not None else None,
+        'title_t2s': title_t2s,
+        'embedding': {
+            'model': encoder.model_id, 'kind': encoder.kind, 'dim': int(embedding.shape[1]),
+            'dtype': str(embedding.dtype), 'fields': list(EMBEDDING_FIELDS),
+        } if embedding is not None else None,
+    }
+    with open(path('meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.rename(tmp_dir, os.path.join(index_dir, VERSIONS_DIR, version))
+    _publish(index_dir, version)
+    _prune(index_dir, version)
+    return meta
+
+
+def write_delta(index_dir, base_meta, X, books_df, doc_terms, dead, rank_features=None, embedding=None):
+    """
+    写增量段：X 为按主段冻结词表/IDF 变换的新行，dead 为被这些行替换掉的主段行号。
+    每次都整体重写 <版本目录>/delta/（先写 delta.tmp 再改名），旧增量段中未再变化的行由调用方一并传入。
+    index_dir 为主段所在的版本目录（Index.path）。
+    """
+    delta_dir = os.path.join(str(index_dir), DELTA_DIR)
+    tmp_dir = delta_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    X = X.tocsr()
+    # 增量段的书名按主段的方式规范化
+    _write_rows(tmp_dir, X, books_df, doc_terms, rank_features, embedding, base_meta['title_t2s'])
+    np.save(os.path.join(tmp_dir, 'dead.npy'), np.asarray(dead, dtype=np.int64))
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'base_version': base_meta['version'],
+        'version': _new_version(),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'rows': X.shape[0],
+        'nnz': int(X.nnz),
+        'dead': int(len(dead)),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    _replace_dir(tmp_dir, delta_dir)
+    return meta
+
+
+class Delta:
+    def __init__(self, meta, tfidf_matrix, books, titles, doc_terms, dead, rank_features=None, filters=None,
+                 embedding=None):
+        self.meta = meta
+        self.tfidf_matrix = tfidf_matrix
+        self.books = books
+        self.titles = titles
+        self.doc_terms = doc_terms
+        self.dead = dead
+        self.rank_features = rank_features
+        self.filters = filters
+        self.embedding = embedding
+
+
+def _load_rank_features(path, mmap_mode, meta=None):
+    # 特征列与当前代码不一致（旧索引）时当作没有，退回纯相似度排序
+    if meta is not None and meta.get('rank_features') != list(RANK_FEATURES):
+        return None
+    if not os.path.exists(path('rank_features.npy')):
+        return None
+    return np.load(path('rank_features.npy'), mmap_mode=mmap_mode)
+
+
+def _load_books(load, path, mmap_mode):
+    updated = StringColumn.load(path('books.updated'), mmap_mode) if os.path.exists(path('books.updated.data.npy')) else None
+    return BookTable(load('books.id.npy'),
+                     StringColumn.load(path('books.title'), mmap_mode),
+                     StringColumn.load(path('books.author'), mmap_mode),
+                     StringColumn.load(path('books.title_json'), mmap_mode),
+                     StringColumn.load(path('books.author_json'), mmap_mode),
+                     updated)
+
+
+def _load_matrix(load, shape):
+    return sp.csr_matrix(
+        (load('tfidf.data.npy'), load('tfidf.indices.npy'), load('tfidf.indptr.npy')),
+        shape=shape, copy=False,
+    )
+
+
+def load_delta(index_dir, base_meta, mmap_mode='r'):
+    """加载版本目录 index_dir 下与主段匹配的增量段；没有或已过期（基于旧主段）时返回 None"""
+    delta_dir = os.path.join(str(index_dir), DELTA_DIR)
+    path = lambda name: os.path.join(delta_dir, name)
+    if not os.path.exists(path('meta.json')):
+        return None
+    with open(path('meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('base_version') != base_meta['version'] or meta.get('format_version') != FORMAT_VERSION:
+        return None
+    load = lambda name: np.load(path(name), mmap_mode=mmap_mode)
+    books = _load_books(load, path, mmap_mode)
+    return Delta(meta, _load_matrix(load, (meta['rows'], base_meta['features'])), books,
+                 TitleIndex.load(delta_dir, books.title, mmap_mode, base_meta['title_t2s']), load('doc_top_terms.npy'), np.load(path('dead.npy')),
+                 _load_rank_features(path, mmap_mode), FilterIndex.load(delta_dir, meta['rows'], mmap_mode),
+                 VectorStore.load(delta_dir, mmap_mode))
+
+
+def _merge(index, delta):
+    """主段 + 增量段的合并视图；行号为 [主段..., 增量段...]，被替换的主段行 id 置 -1"""
+    n_main = index.tfidf_matrix.shape[0]
+    n_rows = n_main + delta.meta['rows']
+    dead_mask = np.zeros(n_rows, dtype=bool)
+    dead_mask[delta.dead] = True
+    ids = np.concatenate([index.books.ids, delta.books.ids])
+    ids[delta.dead] = -1
+    main, extra = index.books, delta.books
+    updated = None
+    if main.updated is not None and extra.updated is not None:
+        updated = ConcatColumn(main.updated, extra.updated)
+    books = BookTable(ids, ConcatColumn(main.title, extra.title), ConcatColumn(main.author, extra.author),
+                      ConcatColumn(main.title_json, extra.title_json),
+                      ConcatColumn(main.author_json, extra.author_json), updated)
+    meta = dict(index.meta, version=delta.meta['version'], main_version=index.meta['version'],
+                rows=n_rows, delta_rows=delta.meta['rows'], dead_rows=delta.meta['dead'])
+    ann = None
+    if index.ann is not None:
+        ann = SegmentedANN(index.ann, n_main, delta.meta['rows'], dead_mask)
+    rank_features = None
+    if index.rank_features is not None and delta.rank_features is not None:
+        rank_features = SegmentedArray(index.rank_features, delta.rank_features)
+    filters = None
+    if index.filters is not None and delta.filters is not None:
+        filters = ConcatFilters(index.filters, delta.filters)
+    embedding = None
+    if index.embedding is not None and delta.embedding is not None:
+        embedding = SegmentedVectors(index.embedding, delta.embedding, delta.dead)
+    return Index(meta, index.vectorizer, SegmentedMatrix(index.tfidf_matrix, delta.tfidf_matrix, delta.dead),
+                 books, MergedTitleIndex(index.titles, delta.titles, dead_mask), index.feature_names,
+                 SegmentedArray(index.doc_terms, delta.doc_terms), ann, rank_features, filters, index.path,
+                 embedding, index.encoder)
+
+
+def load_index(index_dir, mmap_mode='r', merge_delta=True):
+    index_dir = resolve_index_dir(index_dir)
+    path = lambda name: os.path.join(index_dir, name)
+    if not os.path.exists(path('meta.json')):
+        raise FileNotFoundError(f'{index_dir} 下没有索引，请先运行 scripts/build_index.py')
+    with open(path('meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"索引格式版本 {meta.get('format_version')} 与当前版本 {FORMAT_VERSION} 不一致，请重新构建")
+    load = lambda name: np.load(path(name), mmap_mode=mmap_mode)
+
+    tfidf_matrix = _load_matrix(load, (meta['rows'], meta['features']))
+    feature_names = load('vocab.npy')
+    params = dict(meta['vectorizer'])
+    params['ngram_range'] = tuple(params['ngram_range'])
+    vectorizer = TfidfVectorizer(vocabulary={t: i for i, t in enumerate(feature_names.tolist())}, **params)
+    vectorizer.idf_ = np.load(path('idf.npy'))
+    books = _load_books(load, path, mmap_mode)
+    titles = TitleIndex.load(index_dir, books.title, mmap_mode, meta['title_t2s'])
+    embedding, encoder = VectorStore.load(index_dir, mmap_mode), None
+    if embedding is not None:
+        try:
+            encoder = load_encoder(index_dir)
+        except (RuntimeError, OSError) as e:
+            # 按书名查仍可用存好的书向量，按文本查需要编码器
+            log.warning('embedding encoder unavailable: %s', e)
+    index = Index(meta, vectorizer, tfidf_matrix, books, titles, feature_names,
+                  load('doc_top_terms.npy'), IVFIndex.load(index_dir, mmap_mode),
+                  _load_rank_features(path, mmap_mode, meta), FilterIndex.load(index_dir, meta['rows'], mmap_mode),
+                  index_dir, embedding, encoder)
+    delta = load_delta(index_dir, meta, mmap_mode) if merge_delta else None
+    return _merge(index, delta) if delta is not None else index
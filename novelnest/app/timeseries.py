@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+# stats 时间序列的向量化读取：一条区间查询取出全部书的快照（日粒度 stats + 降采样后的 stats_rollup），
+# 按 (书, 日期) 对齐成稠密矩阵，排序特征、趋势统计都在矩阵上按列批量计算，不再逐书查询
+#   Series.values[metric]   (书数, 时间格数) float32，没有快照的格子为 NaN；fill=True 时沿时间向前填充
+#   freq                    'D' 按天，'W' 按周（周日为格），'M' 按月（月末为格）；同一格内取最后一次快照
+# 各计数都是累计值，向前填充后任意两格相减就是区间内的增量
+# 日期区间查询走 stats 的覆盖索引 idx_stats_date_cover，最新快照直接读 stats_latest
+
+METRICS = ('review_count', 'favorite_count', 'nutrient_count', 'total_click_count', 'score', 'chapter_count')
+_OFFSETS = {'D': pd.offsets.Day(), 'W': pd.offsets.Week(weekday=6), 'M': pd.offsets.MonthEnd()}
+
+
+def _has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def _check(metrics):
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f'unknown metrics {sorted(unknown)}, expected some of {list(METRICS)}')
+
+
+def ffill(matrix):
+    """沿时间轴（第 1 维）向前填充 NaN，开头的 NaN 保持不变"""
+    valid = ~np.isnan(matrix)
+    idx = np.where(valid, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return matrix[np.arange(matrix.shape[0])[:, None], idx]
+
+
+def first_valid(matrix):
+    """每行第一个非 NaN 的 (列号, 值)；整行为空时列号为 -1、值为 NaN"""
+    valid = ~np.isnan(matrix)
+    col = np.where(valid.any(axis=1), valid.argmax(axis=1), -1)
+    return col, np.where(col >= 0, matrix[np.arange(len(matrix)), np.maximum(col, 0)], np.nan)
+
+
+def last_valid(matrix):
+    """每行最后一个非 NaN 的 (列号, 值)；整行为空时列号为 -1、值为 NaN"""
+    col, values = first_valid(matrix[:, ::-1])
+    return np.where(col >= 0, matrix.shape[1] - 1 - col, -1), values
+
+
+class Series:
+    def __init__(self, book_ids, dates, values, filled):
+        self.book_ids = book_ids    # 行对应的 book_id
+        self.dates = dates          # 列对应的日期（DatetimeIndex，周/月为周期末）
+        self.values = values        # 指标 -> (len(book_ids), len(dates)) float32
+        self.filled = filled
+
+    def __getitem__(self, metric):
+        return self.values[metric]
+
+    def change(self, metric, periods):
+        """最近 periods 格的增量（如 freq='D' 时 change('favorite_count', 7) 为近 7 天新增收藏）"""
+        m = self.values[metric] if self.filled else ffill(self.values[metric])
+        return m[:, -1] - m[:, max(m.shape[1] - 1 - periods, 0)]
+
+    def to_frame(self, metric):
+        return pd.DataFrame(self.values[metric], index=pd.Index(self.book_ids, name='book_id'), columns=self.dates)
+
+
+def _bounds(conn, tables):
+    lo, hi = None, None
+    for table in tables:
+        a, b = conn.execute(f'SELECT MIN(date), MAX(date) FROM {table}').fetchone()
+        if a is not None:
+            lo = a if lo is None else min(lo, a)
+            hi = b if hi is None else max(hi, b)
+    return lo, hi
+
+
+def load_series(conn, metrics=METRICS, start=None, end=None, days=None, book_ids=None, freq='D', fill=True):
+    """
+    读出 [start, end] 内所有快照，返回对齐后的 Series。
+    end 缺省为库里最新的日期；给了 days 时 start = end - days。
+    book_ids 缺省为区间内出现过的全部书（升序）；给定时按其顺序对齐，没有记录的书整行为 NaN。
+    """
+    metrics = tuple(metrics)
+    _check(metrics)
+    if freq not in _OFFSETS:
+        raise ValueError(f'unknown freq {freq!r}, expected one of {sorted(_OFFSETS)}')
+    tables = ['stats'] + (['stats_rollup'] if _has_table(conn, 'stats_rollup') else [])
+    if start is None or end is None:
+        lo, hi = _bounds(conn, tables)
+        end = end or hi
+        start = start or lo
+    if end is None:
+        start = end = pd.Timestamp('1970-01-01')
+    end = pd.Timestamp(end)
+    start = end - pd.Timedelta(days=days) if days is not None else pd.Timestamp(start)
+
+    cols = ', '.join(metrics)
+    sql = ' UNION ALL '.join(f'SELECT book_id, date, {cols} FROM {t} WHERE date >= ? AND date <= ?' for t in tables)
+    params = [start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')] * len(tables)
+    frame = pd.read_sql(sql, conn, params=params)
+    frame = frame[frame['book_id'].notna()]
+
+    offset = _OFFSETS[freq]
+    dates = pd.date_range(offset.rollforward(start.normalize()), offset.rollforward(end.normalize()), freq=offset)
+    obs_ids = frame['book_id'].to_numpy(dtype=np.int64)
+    if book_ids is None:
+        book_ids = np.unique(obs_ids)
+        rows = np.searchsorted(book_ids, obs_ids)
+    else:
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        rows = pd.Index(book_ids).get_indexer(obs_ids)
+    obs_dates = pd.to_datetime(frame['date'], errors='coerce')
+    col = dates.searchsorted(pd.DatetimeIndex(obs_dates).normalize(), side='left')
+    keep = (rows >= 0) & obs_dates.notna().to_numpy()
+    # 同一格里有多条快照时保留日期最晚的一条：按日期稳定排序后后写覆盖先写
+    order = np.argsort(obs_dates.to_numpy()[keep], kind='stable')
+    cells = (rows[keep] * len(dates) + col[keep])[order]
+    last = len(cells) - 1 - np.unique(cells[::-1], return_index=True)[1]
+    cells = cells[last]
+
+    values = {}
+    for metric in metrics:
+        m = np.full((len(book_ids), len(dates)), np.nan, dtype=np.float32)
+        m.reshape(-1)[cells] = frame[metric].to_numpy(dtype=np.float32)[keep][order][last]
+        values[metric] = ffill(m) if fill else m
+    return Series(book_ids, dates, values, fill)
+
+
+def latest_snapshot(conn, book_ids=None, metrics=METRICS):
+    """每本书最新一天的快照（DataFrame，索引为 book_id，列为 date 与各指标）；旧库没有 stats_latest 时从 stats 现算"""
+    metrics = tuple(metrics)
+    _check(metrics)
+    cols = ', '.join(('date',) + metrics)
+    if _has_table(conn, 'stats_latest'):
+        frame = pd.read_sql(f'SELECT book_id, {cols} FROM stats_latest', conn)
+    else:
+        frame = pd.read_sql(
+            f'''SELECT book_id, {cols} FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY book_id ORDER BY date DESC, id DESC) AS rn
+                    FROM stats WHERE book_id IS NOT NULL
+                ) WHERE rn = 1''',
+            conn,
+        )
+    frame = frame.set_index('book_id')
+    return frame if book_ids is None else frame.reindex(np.asarray(book_ids, dtype=np.int64))
@@ -0,0 +1,195 @@
+import os, bisect, unicodedata
+import numpy as np
+
+from columns import StringColumn
+
+try:
+    from opencc import OpenCC
+    _t2s = OpenCC('t2s').convert
+except ImportError:  # 未安装 opencc 时不做繁简折叠
+    _t2s = None
+
+# 书名索引：
+#   - 规范化书名（全半角/大小写/繁简折叠）按字典序排序，精确匹配与前缀匹配都是二分查找
+#   - 单字 + 双字 n-gram 倒排表，子串匹配只需求交集再校验候选
+# 是否做了繁简折叠记在索引 meta.json 的 title_t2s 里，查询按建索引时的方式规范化；
+# 索引做了折叠而当前环境没有 opencc 时拒绝加载，否则繁体查询会悄悄匹配不上
+# 全部存为数组，随索引一起写盘并以 mmap 加载
+
+MAX_CANDIDATES = 10
+
+
+def normalize(title, t2s=True):
+    """t2s 为 False 时不做繁简折叠；t2s 为 True 时调用方须先确认 opencc 可用（check_t2s）"""
+    title = unicodedata.normalize('NFKC', title or '').casefold().strip()
+    if t2s and _t2s is not None:
+        title = _t2s(title)
+    return ' '.join(title.split())
+
+
+def check_t2s(t2s):
+    if t2s and _t2s is None:
+        raise RuntimeError('书名索引按繁简折叠构建，需要安装 opencc（或在当前环境里重新构建索引）')
+
+
+def _grams(text):
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    grams.discard(' ')
+    return grams
+
+
+class _SortedKeys:
+    """按 order 排列的只读视图，供 bisect 使用"""
+
+    def __init__(self, column, order):
+        self.column = column
+        self.order = order
+
+    def __len__(self):
+        return self.order.shape[0]
+
+    def __getitem__(self, i):
+        return self.column[self.order[i]]
+
+
+class TitleIndex:
+    def __init__(self, raw, norm, order, grams, gram_offsets, gram_ids, t2s=False):
+        self.raw = raw                    # 原始书名（按行）
+        self.norm = norm                  # 规范化书名（按行）
+        self.order = order                # 规范化书名的字典序 -> 行号
+        self.grams = grams                # 排好序的 n-gram
+        self.gram_offsets = gram_offsets  # 每个 n-gram 在 gram_ids 中的区间
+        self.gram_ids = gram_ids          # 倒排表：行号，组内升序
+        self.t2s = t2s                    # 规范化书名是否做了繁简折叠
+        self._sorted = _SortedKeys(norm, order)
+
+    @classmethod
+    def build(cls, titles, t2s=None):
+        """t2s 为 None 时有 opencc 就折叠；增量段传入主段的设置，保证两段一致"""
+        t2s = _t2s is not None if t2s is None else t2s
+        check_t2s(t2s)
+        raw = ['' if t is None or t != t else str(t) for t in titles]
+        norm = [normalize(t, t2s) for t in raw]
+        order = np.array(sorted(range(len(norm)), key=norm.__getitem__), dtype=np.int64)
+        postings = {}
+        for row, t in enumerate(norm):
+            for g in _grams(t):
+                postings.setdefault(g, []).append(row)
+        keys = sorted(postings)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(postings[g]) for g in keys], out=offsets[1:])
+        ids = np.array([row for g in keys for row in postings[g]], dtype=np.int64)
+        return cls(StringColumn.from_strings(raw), StringColumn.from_strings(norm), order,
+                   StringColumn.from_strings(keys), offsets, ids, t2s)
+
+    def save(self, index_dir):
+        path = lambda name: os.path.join(index_dir, name)
+        self.norm.save(path('titles.norm'))
+        self.grams.save(path('titles.grams'))
+        np.save(path('titles.order.npy'), self.order)
+        np.save(path('titles.gram_offsets.npy'), self.gram_offsets)
+        np.save(path('titles.gram_ids.npy'), self.gram_ids)
+
+    @classmethod
+    def load(cls, index_dir, raw, mmap_mode='r', t2s=False):
+        check_t2s(t2s)
+        path = lambda name: os.path.join(index_dir, name)
+        return cls(raw,
+                   StringColumn.load(path('titles.norm'), mmap_mode),
+                   np.load(path('titles.order.npy'), mmap_mode=mmap_mode),
+                   StringColumn.load(path('titles.grams'), mmap_mode),
+                   np.load(path('titles.gram_offsets.npy'), mmap_mode=mmap_mode),
+                   np.load(path('titles.gram_ids.npy'), mmap_mode=mmap_mode), t2s)
+
+    def _posting(self, gram):
+        i = bisect.bisect_left(self.grams, gram)
+        if i == len(self.grams) or self.grams[i] != gram:
+            return np.empty(0, dtype=np.int64)
+        return np.asarray(self.gram_ids[self.gram_offsets[i]:self.gram_offsets[i + 1]])
+
+    def _substring_rows(self, key):
+        grams = [g for g in _grams(key) if len(g) == min(2, len(key))]
+        if not grams:
+            return np.empty(0, dtype=np.int64)
+        postings = sorted((self._posting(g) for g in grams), key=len)
+        rows = postings[0]
+        for p in postings[1:]:
+            if rows.size == 0:
+                break
+            rows = np.intersect1d(rows, p, assume_unique=True)
+        # n-gram 交集只是必要条件，逐个校验
+        return np.array([r for r in rows if key in self.norm[r]], dtype=np.int64)
+
+    def _rank_key(self, row, key):
+        # 前缀命中优先，其次书名越短越优先（调用方再按行号）
+        norm = self.norm[row]
+        return not norm.startswith(key), len(norm)
+
+    def _rank(self, rows, key):
+        return sorted(rows.tolist(), key=lambda r: self._rank_key(r, key) + (r,))
+
+    def _exact_rows(self, key):
+        lo = bisect.bisect_left(self._sorted, key)
+        hi = bisect.bisect_right(self._sorted, key, lo)
+        return np.asarray(self.order[lo:hi]).tolist()
+
+    def resolve(self, query):
+        """书名 -> 行号：精确 > 规范化精确 > 前缀/子串；未命中返回 None"""
+        key = normalize(query, self.t2s)
+        if not key:
+            return None
+        exact = self._exact_rows(key)
+        if exact:
+            query = query.strip()
+            return next((r for r in exact if self.raw[r] == query), min(exact))
+        ranked = self._rank(self._substring_rows(key), key)
+        return ranked[0] if ranked else None
+
+    def suggest(self, query, limit=MAX_CANDIDATES):
+        """自动补全：前缀命中在前，其余子串命中在后"""
+        key = normalize(query, self.t2s)
+        if not key:
+            return []
+        return self._rank(self._substring_rows(key), key)[:limit]
+
+
+class MergedTitleIndex:
+    """主段与增量段两个书名索引的合并视图，行号为合并后的全局行号；被替换掉的主段行不参与匹配"""
+
+    def __init__(self, main, delta, dead_mask):
+        self.main = main
+        self.delta = delta
+        self.offset = len(main.raw)
+        self.dead_mask = dead_mask
+
+    def _raw(self, row):
+        return self.main.raw[row] if row < self.offset else self.delta.raw[row - self.offset]
+
+    def _live(self, rows):
+        return [r for r in rows if not self.dead_mask[r]]
+
+    def _ranked(self, key):
+        keyed = [(self.main._rank_key(r, key) + (r,), r)
+                 for r in self._live(self.main._substring_rows(key).tolist())]
+        keyed += [(self.delta._rank_key(r, key) + (r + self.offset,), r + self.offset)
+                  for r in self.delta._substring_rows(key).tolist()]
+        return [r for _, r in sorted(keyed)]
+
+    def resolve(self, query):
+        """与 TitleIndex.resolve 的规则相同，在两个分段上一起比较"""
+        key = normalize(query, self.main.t2s)
+        if not key:
+            return None
+        exact = self._live(self.main._exact_rows(key)) + [r + self.offset for r in self.delta._exact_rows(key)]
+        if exact:
+            query = query.strip()
+            return next((r for r in exact if self._raw(r) == query), min(exact))
+        ranked = self._ranked(key)
+        return ranked[0] if ranked else None
+
+    def suggest(self, query, limit=MAX_CANDIDATES):
+        key = normalize(query, self.main.t2s)
+        if not key:
+            return []
+        return self._ranked(key)[:limit]
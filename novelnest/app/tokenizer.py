@@ -0,0 +1,30 @@
+import functools
+import jieba
+
+# 建索引与线上查询共用的分词：两边必须一致，否则查询向量与文档向量落在不同的词表上
+
+QUERY_CACHE_SIZE = 4096
+
+
+def init():
+    """启动时加载 jieba 词典，避免第一条查询承担约 1 秒的加载时间"""
+    jieba.initialize()
+
+
+def _join(tokens):
+    return ' '.join(t.strip() for t in tokens if t.strip())
+
+
+def preprocess(text: str) -> str:
+    # 简单中文分词 + 去空白
+    if not isinstance(text, str): return ''
+    return _join(jieba.lcut(text.replace('\n', ' ')))
+
+
+# 线上查询分词带缓存：热门查询、模板化文本反复出现
+tokenize_query = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(preprocess)
+
+
+def tokenize_corpus(texts):
+    """批量分词，结果与逐条 preprocess 一致；并行由 build_index.py 的进程池按块完成"""
+    return [preprocess(t) for t in texts]
@@ -1,14 +1,14 @@
-import os, pickle, requests, json
+import os, requests, json
 import streamlit as st
-import pandas as pd
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+
+from retrieval import search
+from explain import query_terms, explain as explain_terms
+from store import current_version, load_index
+from tokenizer import init as init_tokenizer, tokenize_query
 
 APP_DIR = os.path.dirname(__file__)
 ROOT = os.path.abspath(os.path.join(APP_DIR, '..'))
-DATA_PATH = os.path.join(ROOT, 'data', 'books_sample.csv')
-VEC_PATH = os.path.join(ROOT, 'models', 'vectorizer.pkl')
-MAT_PATH = os.path.join(ROOT, 'models', 'tfidf_matrix.pkl')
+INDEX_DIR = os.path.join(ROOT, 'models', 'index')
 
 st.set_page_config(page_title='BookMatch Demo', page_icon='📚', layout='wide')
 st.title('📚 BookMatch Demo — 相似书推荐')
@@ -17,28 +17,18 @@ use_api = os.environ.get('STREAMLIT_USE_API') == '1'
 api_url = os.environ.get('API_URL', 'http://127.0.0.1:5000')
 
 @st.cache_resource
-def load_assets():
-    with open(VEC_PATH, 'rb') as f:
-        vectorizer = pickle.load(f)
-    with open(MAT_PATH, 'rb') as f:
-        tfidf_matrix = pickle.load(f)
-    books = pd.read_csv(DATA_PATH)
-    return vectorizer, tfidf_matrix, books
+def load_assets(version):
+    # version 作为缓存键：CURRENT 指向新版本后下一次运行自动重新加载
+    index = load_index(INDEX_DIR)
+    init_tokenizer()
+    return (index.vectorizer, index.tfidf_matrix, index.books, index.titles,
+            index.feature_names, index.doc_terms)
 
 if not use_api:
-    vectorizer, tfidf_matrix, books = load_assets()
+    vectorizer, tfidf_matrix, books, titles, feature_names, doc_terms = load_assets(current_version(INDEX_DIR))
 
-def explain(idx_top, q_vec, vectorizer, tfidf_matrix):
-    feature_names = np.array(vectorizer.get_feature_names_out())
-    q_weights = q_vec.toarray().ravel()
-    top_term_ids = q_weights.argsort()[-8:][::-1]
-    q_terms = set(feature_names[top_term_ids])
-    doc_vec = tfidf_matrix[idx_top]
-    doc_weights = doc_vec.toarray().ravel()
-    doc_term_ids = doc_weights.argsort()[-12:][::-1]
-    doc_terms = set(feature_names[doc_term_ids])
-    common = [w for w in feature_names if w in q_terms and w in doc_terms]
-    return common[:5]
+def explain(idx_top, q_terms, feature_names, doc_terms):
+    return explain_terms(q_terms, doc_terms[idx_top], feature_names)
 
 with st.sidebar:
     st.markdown("### 输入方式")
@@ -47,6 +37,14 @@ with st.sidebar:
 
 if mode == "按书名找相似":
     title = st.text_input("书名（样例：长安风月 / 京华故梦 / 霜刃未曾试 / 星河入梦 / 明月照归途）")
+    if title.strip():
+        if use_api:
+            resp = requests.get(f"{api_url}/api/title_suggest", params={"q": title, "limit": 8})
+            suggestions = [r["title"] for r in resp.json()] if resp.status_code == 200 else []
+        else:
+            suggestions = books.title.take(titles.suggest(title, 8))
+        if suggestions:
+            st.caption("候选书名：" + " / ".join(suggestions))
     if st.button("生成推荐", use_container_width=True) and title.strip():
         if use_api:
             resp = requests.post(f"{api_url}/api/similar_by_title", json={"title": title, "k": k})
@@ -57,25 +55,18 @@ if mode == "按书名找相似":
                 results = []
         else:
             # 本地计算
-            match = books[books['title'].str.contains(title, case=False, na=False)]
-            if match.empty:
+            idx = titles.resolve(title)
+            if idx is None:
                 st.warning("示例数据未找到该书，可尝试“粘贴简介找相似”。")
                 results = []
             else:
-                idx = match.index[0]
                 q_vec = tfidf_matrix[idx]
-                sims = cosine_similarity(q_vec, tfidf_matrix).ravel()
-                sims[idx] = -1
-                top_idx = sims.argsort()[::-1][:k]
-                results = []
-                for i in top_idx:
-                    results.append({
-                        "book_id": int(books.iloc[i]['id']),
-                        "title": books.iloc[i]['title'],
-                        "author": books.iloc[i]['author'],
-                        "score": float(sims[i]),
-                        "why": explain(i, q_vec, vectorizer, tfidf_matrix)
-                    })
+                top_idx, scores = search(q_vec, tfidf_matrix, k, exclude=idx)
+                q_terms = query_terms(q_vec)
+                results = books.records(top_idx)
+                for r, i, score in zip(results, top_idx, scores):
+                    r["score"] = float(score)
+                    r["why"] = explain(i, q_terms, feature_names, doc_terms)
         if results:
             for r in results:
                 st.markdown(f"**{r['title']}** · {r['author']} — 相似度 {r['score']:.3f}")
@@ -94,19 +85,14 @@ else:
             else:
                 st.error(resp.text); results = []
         else:
-            vectorizer, tfidf_matrix, books = load_assets()
-            q_vec = vectorizer.transform([text])
-            sims = cosine_similarity(q_vec, tfidf_matrix).ravel()
-            top_idx = sims.argsort()[::-1][:k]
-            results = []
-            for i in top_idx:
-                results.append({
-                    "book_id": int(books.iloc[i]['id']),
-                    "title": books.iloc[i]['title'],
-                    "author": books.iloc[i]['author'],
-                    "score": float(sims[i]),
-                    "why": explain(i, q_vec, vectorizer, tfidf_matrix)
-                })
+            vectorizer, tfidf_matrix, books, titles, feature_names, doc_terms = load_assets(current_version(INDEX_DIR))
+            q_vec = vectorizer.transform([tokenize_query(text)])
+            top_idx, scores = search(q_vec, tfidf_matrix, k)
+            q_terms = query_terms(q_vec)
+            results = books.records(top_idx)
+            for r, i, score in zip(results, top_idx, scores):
+                r["score"] = float(score)
+                r["why"] = explain(i, q_terms, feature_names, doc_terms)
         if results:
             for r in results:
                 st.markdown(f"**{r['title']}** · {r['author']} — 相似度 {r['score']:.3f}")
@@ -0,0 +1,242 @@
+import re, sys, time, argparse
+import numpy as np
+from datetime import date, timedelta
+from pathlib import Path
+
+import jieba
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'data'))
+from NovelMindScrawl import BOOK_INSERT_SQL, STATS_INSERT_SQL, init_db
+
+# 合成书目：与 book / stats 表同构，规模可到百万级，用于基准测试（真实库只有几百本）
+# 词的分布取自 jieba 自带词典的词频（真实中文语料的 Zipf 分布），每本书再按主题加权：
+#   - N_TOPICS 个主题，每个主题是一组内容词 + 网文题材词，组内按 1/rank 加权
+#   - 文案中 TOPIC_SHARE 的词来自本书的主题（主、次两个），其余来自全局词频，相似书检索才有结构
+#   - 标签、文章类型、视角与主题相关；字数、收藏等计数取对数正态（长尾）
+# 同一 seed、同一规模生成的库逐字节一致（按固定 CHUNK 分块、每块独立的随机流）
+# 用法：python bench/catalogue.py --books 100000 --db /tmp/bench/books_100k.db
+
+CHUNK = 10_000
+LEXICON_SIZE = 60_000
+N_TOPICS = 300
+TOPIC_WORDS = 400
+TOPIC_SHARE = 0.35
+INTRO_CHARS = 380           # 文案长度（字）的中位数，真实库均值约 450
+BASE_DATE = date(2024, 6, 30)
+SNAPSHOT_DAYS = (7, 0)      # 每本书两次 stats 快照（距 BASE_DATE 的天数），排序特征的增长率才有值
+
+# 晋江常见内容标签与风格标签
+TAGS = (
+    '情有独钟 穿越时空 天作之合 宫廷侯爵 豪门世家 娱乐圈 重生 系统 快穿 仙侠修真 强强 甜文 爽文 '
+    '破镜重圆 穿书 校园 都市 年代文 无限流 末世 星际 灵异神怪 悬疑推理 江湖 武侠 历史衍生 '
+    '种田文 美食 经营 宅斗 宫斗 女配 团宠 先婚后爱 追爱火葬场 成长 市井生活 业界精英 '
+    '异能 未来架空 西方罗曼 幻想空间 布衣生活 三教九流 体育竞技 电竞 游戏网游 网红 '
+    '直播 救赎 治愈 逆袭 升级流 轻松 正剧 悲剧 暗黑 沙雕 相爱相杀 青梅竹马 欢喜冤家 '
+    '年下 萌宠 朝堂 科举 权谋 机甲 赛博朋克 克苏鲁 规则怪谈 综漫 西幻 东方玄幻'
+).split()
+STYLES = ('正剧', '轻松', '爽文', '悲剧', '暗黑', '沙雕')
+# 网文题材词：真实文案里远比通用语料常见
+GENRE_WORDS = (
+    '穿越 重生 修仙 宗门 师尊 皇帝 将军 侯府 王爷 世子 嫡女 庶女 总裁 影帝 顶流 末世 丧尸 系统 任务 '
+    '副本 星际 帝国 元帅 机甲 江湖 剑客 魔教 掌门 灵根 渡劫 飞升 妖族 魔尊 天道 公主 太子 宫廷 '
+    '豪门 联姻 契约 校草 学霸 竞赛 电竞 战队 直播 粉丝 热搜 导演 剧组 古董 鉴宝 美食 餐馆 种田 '
+    '农家 考古 刑警 法医 案件 凶手 灵异 鬼怪 道士 符箓 阵法 神兽 龙族 血族 异能 觉醒 基地'
+).split()
+ORIENTATIONS = (('言情', 0.45, ('女主', '男主', '不明')), ('纯爱', 0.4, ('主受', '主攻', '互攻', '双视角')),
+                ('无CP', 0.1, ('男主', '女主', '不明')), ('百合', 0.05, ('女主', '双视角')))
+ERAS = ('近代现代', '架空历史', '幻想未来', '古色古香')
+GENRES = ('爱情', '奇幻', '仙侠', '悬疑', '剧情', '武侠', '科幻', '轻小说', '传奇')
+PUNCT = np.array(['', '，', '。', '。\n'], dtype=object)
+PUNCT_P = np.array([0.86, 0.09, 0.04, 0.01])
+
+_CJK = re.compile(r'^[一-鿿]{1,4}$')
+
+
+def _cdf(weights):
+    cdf = np.cumsum(weights, dtype=np.float64)
+    return cdf / cdf[-1]
+
+
+def _sample(rng, cdf, size):
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side='right'), len(cdf) - 1)
+
+
+def _lognormal(rng, median, sigma, size, lo, hi):
+    return np.clip(np.rint(median * np.exp(sigma * rng.standard_normal(size))), lo, hi).astype(np.int64)
+
+
+def load_lexicon(size=LEXICON_SIZE):
+    """jieba 词典里词频最高的 size 个纯汉字词（1~4 字）及其词频"""
+    words, freqs = [], []
+    with jieba.dt.get_dict_file() as f:
+        for line in f:
+            parts = line.decode('utf-8').split()
+            if len(parts) >= 2 and _CJK.match(parts[0]):
+                words.append(parts[0])
+                freqs.append(int(parts[1]))
+    order = np.argsort(-np.array(freqs), kind='stable')[:size]
+    return np.array(words, dtype=object)[order], np.array(freqs, dtype=np.float64)[order]
+
+
+class Catalogue:
+    def __init__(self, seed=0, lexicon_size=LEXICON_SIZE, n_topics=N_TOPICS):
+        self.seed = seed
+        rng = np.random.default_rng([seed, 0])
+        words, freqs = load_lexicon(lexicon_size)
+        self.words = np.concatenate([words, np.array(GENRE_WORDS, dtype=object)])
+        self.chars = np.array([w for w in words[:3000].tolist() if len(w) == 1], dtype=object)
+        self.background = _cdf(np.concatenate([freqs, np.zeros(len(GENRE_WORDS))]))
+        # 主题词：高频虚词之后的内容词 + 若干题材词，主题内按 1/rank 加权
+        content = np.arange(min(500, len(words) // 10), len(words))
+        genre = np.arange(len(words), len(self.words))
+        self.topic_words = np.stack([
+            rng.permutation(np.concatenate([rng.choice(genre, 12, replace=False),
+                                            rng.choice(content, TOPIC_WORDS - 12, replace=False)]))
+            for _ in range(n_topics)
+        ])
+        self.topic_cdf = _cdf(1.0 / np.arange(1, TOPIC_WORDS + 1))
+        # 主题的流行度本身也是长尾
+        self.topic_pop = _cdf(1.0 / np.arange(1, n_topics + 1) ** 0.8)
+        self.topic_tags = np.stack([rng.choice(len(TAGS), 4, replace=False) for _ in range(n_topics)])
+        self.tag_cdf = _cdf(1.0 / np.arange(1, len(TAGS) + 1))
+        self.topic_orientation = _sample(rng, _cdf([o[1] for o in ORIENTATIONS]), n_topics)
+        self.topic_era = rng.integers(0, len(ERAS), n_topics)
+        self.topic_genre = _sample(rng, _cdf(1.0 / np.arange(1, len(GENRES) + 1)), n_topics)
+
+    def topics(self, rng, n):
+        return _sample(rng, self.topic_pop, n)
+
+    def text(self, rng, topic, second, n_words):
+        """一段文案：按本书主题与全局词频混合取词，夹带逗号句号与分段"""
+        from_topic = rng.random(n_words) < TOPIC_SHARE
+        ids = self.words[_sample(rng, self.background, n_words)]
+        k = int(from_topic.sum())
+        if k:
+            which = np.where(rng.random(k) < 0.75, topic, second)
+            ids[from_topic] = self.words[self.topic_words[which, _sample(rng, self.topic_cdf, k)]]
+        punct = PUNCT[_sample(rng, _cdf(PUNCT_P), n_words)]
+        punct[-1] = '。'
+        return ''.join(map(str.__add__, ids.tolist(), punct.tolist()))
+
+    def texts(self, rng, topics, n_chars):
+        # 平均每个词约 1.9 字
+        seconds = self.topics(rng, len(topics))
+        n_words = np.maximum(np.asarray(n_chars) * 10 // 19, 3)
+        return [self.text(rng, t, s, n) for t, s, n in zip(topics.tolist(), seconds.tolist(), n_words.tolist())]
+
+    def _name(self, rng, n, length):
+        return [''.join(p) for p in rng.choice(self.chars, (n, length)).tolist()]
+
+    def books(self, chunk, ids):
+        """第 chunk 块的书目行（BOOK_INSERT_SQL 的列顺序）与两次 stats 快照"""
+        rng = np.random.default_rng([self.seed, 1, chunk])
+        n = len(ids)
+        topics = self.topics(rng, n)
+        intros = self.texts(rng, topics, _lognormal(rng, INTRO_CHARS, 0.6, n, 20, 2000))
+        first_300 = [t[:300] for t in self.texts(rng, topics, np.full(n, 320))]
+        titles = [''.join(self.words[self.topic_words[t, _sample(rng, self.topic_cdf, 2)]].tolist())
+                  + rng.choice(['', '之', '的', '与', '在']) + self.words[_sample(rng, self.background, 1)[0]]
+                  for t in topics.tolist()]
+        authors = [''.join(p) for p in zip(self._name(rng, n, 2), rng.choice(['', '酱', '君', '子', '鱼'], n).tolist())]
+        n_tags = rng.integers(1, 5, n)
+        tags = []
+        for t, m in zip(topics.tolist(), n_tags.tolist()):
+            own = [TAGS[i] for i in self.topic_tags[t, :m]]
+            if rng.random() < 0.3:
+                own.append(TAGS[_sample(rng, self.tag_cdf, 1)[0]])
+            own.append(STYLES[int(_sample(rng, _cdf([0.45, 0.3, 0.15, 0.04, 0.03, 0.03]), 1)[0])])
+            tags.append(' '.join(dict.fromkeys(own)))
+        word_count = _lognormal(rng, 200_000, 0.9, n, 1000, 5_000_000)
+        chapter_count = np.maximum(word_count // 3000, 1)
+        status = np.where(rng.random(n) < 0.7, '完结', '连载')
+        updated = [(BASE_DATE - timedelta(days=int(d))).isoformat() + f' {h:02d}:{m:02d}:00'
+                   for d, h, m in zip(rng.exponential(120, n).astype(int), rng.integers(0, 24, n), rng.integers(0, 60, n))]
+        names = self._name(rng, 3 * n, 2)
+        rows = []
+        for i in range(n):
+            t = int(topics[i])
+            orient, _, persps = ORIENTATIONS[self.topic_orientation[t]]
+            rows.append((
+                int(ids[i]), titles[i], authors[i], intros[i], tags[i],
+                f'{names[3 * i]}，{names[3 * i + 1]}', names[3 * i + 2], f'立意：{self.words[self.topic_words[t, 0]]}',
+                f'原创-{orient}-{ERAS[self.topic_era[t]]}-{GENRES[self.topic_genre[t]]}',
+                persps[int(rng.integers(len(persps)))], '无从属系列', str(status[i]), int(word_count[i]),
+                '已出版' if rng.random() < 0.1 else '尚未出版', '已签约' if rng.random() < 0.6 else '未签约',
+                updated[i], int(chapter_count[i]), first_300[i],
+            ))
+
+        favorites = _lognormal(rng, 2000, 1.8, n, 0, 10 ** 7)
+        stats = []
+        for days in SNAPSHOT_DAYS:
+            # 较早的快照按收藏增长率回推
+            shrink = 1.0 - np.minimum(days * rng.exponential(0.005, n), 0.9)
+            fav = np.rint(favorites * shrink).astype(np.int64)
+            day = (BASE_DATE - timedelta(days=days)).isoformat()
+            stats += [(int(ids[i]), day, int(fav[i] // 20), int(fav[i]), int(fav[i] * 3), int(fav[i] * 40),
+                       int(fav[i] * 900), int(chapter_count[i]) - int(days > 0 and status[i] == '连载'))
+                      for i in range(n)]
+        return rows, stats
+
+
+def book_ids(n, seed=0):
+    """稀疏、递增的 book_id（与晋江 novelid 类似，不连续）"""
+    rng = np.random.default_rng([seed, 2])
+    return np.sort(rng.choice(8 * n, n, replace=False)) + 1
+
+
+def generate(db_path, n_books, seed=0, log=None):
+    """生成 n_books 本书写入 db_path（已有的库会被覆盖），返回 {rows, seconds}"""
+    path = Path(db_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        Path(str(path) + suffix).unlink(missing_ok=True)
+    t0 = time.perf_counter()
+    catalogue = Catalogue(seed)
+    ids = book_ids(n_books, seed)
+    conn = init_db(str(path))
+    conn.execute('PRAGMA synchronous=OFF')
+    try:
+        for chunk, start in enumerate(range(0, n_books, CHUNK)):
+            rows, stats = catalogue.books(chunk, ids[start:start + CHUNK])
+            with conn:
+                conn.executemany(BOOK_INSERT_SQL, rows)
+                conn.executemany(STATS_INSERT_SQL, stats)
+            if log:
+                log(f'\rGenerated: {start + len(rows)}/{n_books} books', end='', flush=True)
+        if log:
+            log()
+        conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+    return {'rows': n_books, 'seconds': time.perf_counter() - t0}
+
+
+def query_texts(n, seed=0):
+    """与书目同分布、但不在库里的查询文本（长度 20~200 字），用于 similar_by_text"""
+    catalogue = Catalogue(seed)
+    rng = np.random.default_rng([seed, 3])
+    return catalogue.texts(rng, catalogue.topics(rng, n), _lognormal(rng, 60, 0.7, n, 20, 200))
+
+
+def parse_size(text):
+    """10k / 100k / 1m / 2500 -> 整数"""
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=parse_size, default=10_000, help='书目数，可写 10k / 100k / 1m')
+    parser.add_argument('--db', required=True, help='输出的 SQLite 路径（已存在会被覆盖）')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if Path(args.db).resolve() == (ROOT / 'data' / 'jinjiang_novels.db').resolve():
+        sys.exit('不能覆盖 data/jinjiang_novels.db')
+    result = generate(args.db, args.books, args.seed, log=print)
+    print(f"{result['rows']} books -> {args.db} in {result['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
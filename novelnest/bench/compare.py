@@ -0,0 +1,96 @@
+import sys, json, math, argparse
+
+# 对比两份 bench/run.py 报告：逐项列出变化，超过阈值的退化记为回退，有回退时退出码为 1（可接在 CI 里）
+# 指标方向按名字判断：*_per_s / recall 越大越好，*_ms / seconds / *_mb / *_bytes / errors / mismatches 越小越好，
+# 其余（行数、页数等）只作说明，不参与判定
+# 用法：python bench/compare.py base.json new.json [--threshold 0.1]
+
+HIGHER = ('_per_s', 'recall')
+LOWER = ('_ms', 'seconds', '_mb', '_bytes', 'errors', 'mismatches')
+# 各阶段耗时明细波动大，只展示不判定
+IGNORE = ('stages_p50_ms',)
+
+
+def flatten(report, prefix=''):
+    out = {}
+    for key, value in report.items():
+        if key == 'meta':
+            continue
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            out.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[path] = float(value)
+    return out
+
+
+def direction(path):
+    """+1 越大越好，-1 越小越好，0 不判定"""
+    if any(part in IGNORE for part in path.split('.')):
+        return 0
+    name = path.rsplit('.', 1)[-1]
+    if name.endswith(HIGHER):
+        return 1
+    if name.endswith(LOWER):
+        return -1
+    return 0
+
+
+def compare(base, new, threshold):
+    """返回 [(指标, 旧值, 新值, 相对变化, 状态)]，状态为 regression / improvement / ok / info"""
+    a, b = flatten(base), flatten(new)
+    rows = []
+    for path in sorted(set(a) & set(b)):
+        old, cur = a[path], b[path]
+        sign = direction(path)
+        if math.isnan(old) or math.isnan(cur):
+            continue
+        change = (cur - old) / abs(old) if old else (0.0 if cur == old else math.inf)
+        if sign == 0:
+            status = 'info'
+        elif path.endswith(('errors', 'mismatches')):
+            status = 'regression' if cur > old else 'improvement' if cur < old else 'ok'
+        elif sign * change < -threshold:
+            status = 'regression'
+        elif sign * change > threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((path, old, cur, change, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base', help='基准报告（旧提交）')
+    parser.add_argument('new', help='新报告')
+    parser.add_argument('--threshold', type=float, default=0.1, help='相对变化超过该比例才算回退/提升')
+    parser.add_argument('--all', action='store_true', help='也列出没有明显变化的指标')
+    args = parser.parse_args()
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    for label, report in (('base', base), ('new', new)):
+        meta = report.get('meta', {})
+        dirty = ' (dirty)' if meta.get('dirty') else ''
+        print(f"{label:<5} {(meta.get('commit') or '?')[:10]}{dirty}  python {meta.get('python')}  cpus {meta.get('cpus')}")
+    for key in ('seed', 'queries', 'k', 'workers', 'pages', 'cpus'):
+        if base.get('meta', {}).get(key) != new.get('meta', {}).get(key):
+            print(f"warning: {key} differs ({base['meta'].get(key)} vs {new['meta'].get(key)}), results may not be comparable")
+
+    rows = compare(base, new, args.threshold)
+    shown = [r for r in rows if args.all or r[4] in ('regression', 'improvement')]
+    width = max([len(r[0]) for r in shown] + [6])
+    print(f"{'metric':<{width}} {'base':>12} {'new':>12} {'change':>8}")
+    for path, old, cur, change, status in shown:
+        mark = {'regression': '  REGRESSION', 'improvement': '  improved'}.get(status, '')
+        print(f'{path:<{width}} {old:>12.4g} {cur:>12.4g} {change:>+8.1%}{mark}')
+    regressions = sum(r[4] == 'regression' for r in rows)
+    print(f'{len(rows)} metrics, {regressions} regressions (threshold {args.threshold:.0%})')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
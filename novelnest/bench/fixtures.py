@@ -0,0 +1,170 @@
+import os, sys, html, sqlite3, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'data'))
+from NovelMindScrawl import RANK_PATH_TEMPLATE
+from fixture_server import fixture_name
+
+# 解析器基准用的页面：按合成库（catalogue.py）里的书渲染 排行页 / 详情页 / 第一章，文件名沿用 fixture_server.py 的规则，
+# 同一目录既能给 bench/run.py 的解析阶段用，也能直接用 fixture_server.py 回放给爬虫
+# 详情页按晋江真实页面的结构写（脚本、注释、章节表、VIP 章节、统计栏等），编码 gb18030；
+# 注释特意放在解析器要跨节点取文本的位置（主角/配角一行内外、最新更新与时间之间），核对两版解析器对注释节点的处理
+# 用法：python bench/fixtures.py --db /tmp/bench/books_10k.db --out /tmp/bench/pages --books 500
+
+RANK_PER_PAGE = 100
+MAX_CHAPTERS = 200
+FREE_CHAPTERS = 20
+
+DETAIL_TEMPLATE = '''<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=gb2312" />
+<title>《{title}》{author}_晋江文学城_【原创小说|{orient}小说】</title>
+<script type="text/javascript">var novelid = {book_id}; var tips = "最新更新请关注作者专栏";</script>
+<style type="text/css">.readtd {{ padding: 4px; }} .bluetext {{ color: #009900; }}</style>
+</head>
+<body>
+<!-- 页头 -->
+<div id="sitehead"><a href="/">首页</a> | <a href="bookbase.php">作品库</a> | 最新更新 | <a href="help.php">帮助</a></div>
+<table width="984" border="0" align="center" cellpadding="0" cellspacing="0">
+  <tr>
+    <td class="readtd">
+      <div class="smallreadbody">
+        <div id="novelintro" itemprop="description">{intro}</div>
+      </div>
+      <div class="smallreadbody"><span class="bluetext">内容标签：</span>{tag_links}</div>
+      <div class="smallreadbody"><span class="bluetext">搜索关键字：主角：<!-- 主角 -->{main_chars} ┃ 配角：{support_chars} ┃ 其它：{other_info}</span></div><!-- 关键字 end -->
+      <div class="smallreadbody"><span class="bluetext">一句话简介：{oneline}</span></div>
+    </td>
+    <td class="rightbox">
+      <ul name="printright" class="rightul">
+        <li><span>文章类型：</span><span itemprop="genre">{category}</span></li>
+        <li><span>作品视角：</span>{perspective}</li>
+        <li><span>所属系列：</span><span>{series}</span></li>
+        <li><span>文章进度：</span><span itemprop="updataStatus"><font color=black>{status}</font></span></li>
+        <li><span>全文字数：</span><span itemprop="wordCount">{word_count}字</span></li>
+        <li><span>版权转化：</span>{publish}</li>
+        <li><span>签约状态：</span>{sign}</li>
+      </ul>
+    </td>
+  </tr>
+</table>
+<table id="oneboolt" cellspacing="0" cellpadding="0" width="984" align="center">
+  <tr class="tr"><td>章节</td><td>标题</td><td>内容提要</td><td>字数</td><td>更新时间</td></tr>
+{chapters}
+</table>
+<div align="center" style="padding:5px">总书评数：{review_count}　当前被收藏数：{favorite_count}　营养液数：{nutrient_count}　文章积分：{score}<br/>非V章节总点击数：{total_click_count}</div>
+<div class="update">最新更新:<!-- 更新时间 -->{last_update_time}</div>
+</body>
+</html>
+'''
+
+CHAPTER_TEMPLATE = '''<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312" /><title>{title}_第1章</title></head>
+<body><div class="noveltitle"><h2>第1章</h2></div>
+<div class="novelbody"><div style="font-size: 16px; color: #333">
+{text}
+</div></div>
+<div class="readsmall">作者有话要说：感谢阅读。</div>
+</body></html>
+'''
+
+RANK_TEMPLATE = '''<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312" /><title>作品库</title></head>
+<body><table class="cytable">
+<tr><th>作者</th><th>作品</th><th>类型</th><th>进度</th><th>字数</th><th>积分</th><th>发表时间</th></tr>
+{rows}
+</table></body></html>
+'''
+
+BOOK_SQL = '''
+    SELECT b.book_id, title, author, intro, tags, main_chars, support_chars, other_info, category, perspective, series,
+           status, word_count, publish_status, sign_status, last_update_time, b.chapter_count, first_300_text,
+           s.review_count, s.favorite_count, s.nutrient_count, s.total_click_count, s.score
+    FROM book b LEFT JOIN stats_latest s ON s.book_id = b.book_id
+    ORDER BY b.book_id LIMIT ?
+'''
+
+
+def _e(value):
+    return html.escape('' if value is None else str(value), quote=False)
+
+
+def detail_page(b):
+    book_id = b['book_id']
+    chapters = []
+    for c in range(1, min(b['chapter_count'] or 0, MAX_CHAPTERS) + 1):
+        if c <= FREE_CHAPTERS:
+            href = f'onebook.php?novelid={book_id}&amp;chapterid={c}'
+        else:
+            href = f'https://my.jjwxc.net/onebook_vip.php?novelid={book_id}&amp;chapterid={c}'
+        chapters.append(f'  <tr itemprop="chapter"><td>{c}</td><td><a itemprop="url" href="{href}">第{c}章</a></td>'
+                        f'<td>内容提要{c}</td><td>{3000 + c}</td><td>{_e(b["last_update_time"])}</td></tr>')
+    return DETAIL_TEMPLATE.format(
+        book_id=book_id, title=_e(b['title']), author=_e(b['author']), orient=_e(''.join((b['category'] or '').split('-')[1:2])),
+        intro='<br />\r\n'.join(_e(line) for line in (b['intro'] or '').split('\n')),
+        tag_links='&nbsp;'.join(f'<a href="#">{_e(t)}</a>' for t in (b['tags'] or '').split()),
+        main_chars=_e(b['main_chars']), support_chars=_e(b['support_chars']), other_info=_e(b['other_info']),
+        oneline=_e((b['intro'] or '')[:20]), category=_e(b['category']), perspective=_e(b['perspective']),
+        series=_e(b['series']), status=_e(b['status']), word_count=b['word_count'],
+        publish='<img src="pub.gif" title="已出版">' if b['publish_status'] == '已出版' else '<font color=gray>尚未出版</font>',
+        sign=f'<font color="#FF0000">{_e(b["sign_status"])}</font>', chapters='\n'.join(chapters),
+        review_count=b['review_count'] or 0, favorite_count=b['favorite_count'] or 0,
+        nutrient_count=b['nutrient_count'] or 0, score=f'{b["score"] or 0:,}',
+        total_click_count=b['total_click_count'] or 0, last_update_time=_e(b['last_update_time']),
+    )
+
+
+def rank_row(b):
+    title_attr = html.escape(f'简介：{(b["intro"] or "")[:60]} 标签：{b["tags"] or ""}')
+    return (f'<tr><td><a href="oneauthor.php?authorid={b["book_id"]}">{_e(b["author"])}</a></td>'
+            f'<td><a href="onebook.php?novelid={b["book_id"]}" title="{title_attr}">{_e(b["title"])}</a></td>'
+            f'<td>{_e(b["category"])}</td><td>{_e(b["status"])}</td><td>{b["word_count"]}</td>'
+            f'<td>{b["score"] or 0}</td><td>{_e(b["last_update_time"])}</td></tr>')
+
+
+def chapter_page(b):
+    # 正文比 first_300_text 长一些，解析时截到前 300 字
+    text = b['first_300_text'] or ''
+    return CHAPTER_TEMPLATE.format(title=_e(b['title']), text='<br />\n'.join(_e(line) for line in (text * 3).split('。')))
+
+
+def write_pages(db_path, out_dir, n_books):
+    """按 book_id 顺序取前 n_books 本书写页面，返回 {'rank': 页数, 'detail': 页数, 'chapter': 页数}"""
+    os.makedirs(out_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        books = conn.execute(BOOK_SQL, (n_books,)).fetchall()
+    finally:
+        conn.close()
+
+    def write(path, page):
+        with open(os.path.join(out_dir, fixture_name(path)), 'wb') as f:
+            f.write(page.encode('gb18030'))
+
+    counts = {'rank': 0, 'detail': 0, 'chapter': 0}
+    for start in range(0, len(books), RANK_PER_PAGE):
+        rows = '\n'.join(rank_row(b) for b in books[start:start + RANK_PER_PAGE])
+        write(RANK_PATH_TEMPLATE.format(page=start // RANK_PER_PAGE + 1), RANK_TEMPLATE.format(rows=rows))
+        counts['rank'] += 1
+    for b in books:
+        write(f'onebook.php?novelid={b["book_id"]}', detail_page(b))
+        counts['detail'] += 1
+        if b['chapter_count']:
+            write(f'onebook.php?novelid={b["book_id"]}&chapterid=1', chapter_page(b))
+            counts['chapter'] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='catalogue.py 生成的 SQLite 路径')
+    parser.add_argument('--out', required=True, help='页面输出目录')
+    parser.add_argument('--books', type=int, default=500, help='渲染的书目数')
+    args = parser.parse_args()
+    counts = write_pages(args.db, args.out, args.books)
+    print(f"{counts['rank']} rank / {counts['detail']} detail / {counts['chapter']} chapter pages -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
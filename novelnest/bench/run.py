@@ -0,0 +1,320 @@
+import os, sys, json, time, shutil, sqlite3, argparse, platform, subprocess
+import numpy as np
+from contextlib import redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'data'))
+sys.path.insert(0, str(ROOT / 'scripts'))
+from catalogue import generate, parse_size, query_texts
+from fixtures import write_pages
+
+# 可复现的基准套件：合成书目 -> build_index.py 全量构建 -> API 两个检索接口 -> 爬虫解析器，结果写成一份 JSON，
+# 用 bench/compare.py 对比两次提交的报告找回退
+#   catalogue  生成合成库（同一 seed 与规模的库缓存在 --workdir 里复用）
+#   build      子进程跑 scripts/build_index.py，记录墙钟时间、吞吐、峰值 RSS、索引大小
+#   api        子进程里 import api（INDEX_DIR 指向基准索引），经 Flask 测试客户端请求
+#              similar_by_title / similar_by_text 的 exact 与 ann 模式，记录延迟分位数、吞吐、ANN 召回率、各阶段耗时
+#   shards     分片检索的扩展性：按 --shard-counts 逐个起 api 子进程（SHARDS=n，绑定到 n 个核），
+#              记录 similar_by_title / similar_by_text 精确检索的延迟与吞吐随核数的变化；不在默认阶段里
+#   parser     排行页 / 详情页（html.parser 与 lxml 两条路径，并核对结果一致）/ 章节页的解析吞吐，与书目规模无关，只跑一次
+# 每个阶段都在独立子进程里跑，峰值 RSS 取自 wait4 的 rusage（只含该子进程本身，不含 --workers 派生的进程池）
+# 查询缓存关掉（CACHE_SIZE=0），每个请求都走完整检索路径
+# 用法：python bench/run.py --sizes 10k,100k --out bench.json
+#       python bench/compare.py old.json bench.json
+
+STAGES = ('build', 'api', 'shards', 'parser')
+DEFAULT_STAGES = ('build', 'api', 'parser')
+ENDPOINTS = ('similar_by_title', 'similar_by_text')
+MODES = ('exact', 'ann')
+WARMUP = 20
+
+
+def percentiles(times_ms):
+    p50, p95, p99 = np.percentile(times_ms, [50, 95, 99]) if len(times_ms) else (float('nan'),) * 3
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'mean_ms': float(np.mean(times_ms)) if len(times_ms) else float('nan')}
+
+
+def run_child(cmd, log_path, env=None):
+    """跑一个子进程，输出写进 log_path，返回 (墙钟秒数, 峰值 RSS MB)；失败时抛 RuntimeError"""
+    with open(log_path, 'w') as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env={**os.environ, **(env or {})})
+        # wait4 拿到该子进程的 rusage；ru_maxrss 在 Linux 上以 KB 计
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - t0
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f'{cmd[1]} exited with {proc.returncode}, see {log_path}')
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def _dir_bytes(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+
+def _worker(stage, args, workdir, env=None, name=None):
+    name = name or stage
+    result = workdir / f'{name}.json'
+    cmd = [sys.executable, str(Path(__file__).resolve()), '--worker', stage, '--result', str(result)] + args
+    elapsed, peak_rss = run_child(cmd, workdir / f'{name}.log', env)
+    with open(result) as f:
+        out = json.load(f)
+    out.update(seconds=elapsed, peak_rss_mb=peak_rss)
+    return out
+
+
+def bench_build(db, index_dir, workers, log_dir):
+    shutil.rmtree(index_dir, ignore_errors=True)
+    rows = sqlite3.connect(db).execute('SELECT COUNT(*) FROM book').fetchone()[0]
+    cmd = [sys.executable, str(ROOT / 'scripts' / 'build_index.py'), '--source', 'db', '--db', str(db),
+           '--index-dir', str(index_dir), '--workers', str(workers)]
+    elapsed, peak_rss = run_child(cmd, log_dir / 'build.log')
+    return {'rows': rows, 'seconds': elapsed, 'docs_per_s': rows / elapsed, 'peak_rss_mb': peak_rss,
+            'index_bytes': _dir_bytes(index_dir)}
+
+
+# ---------- 子进程里执行的阶段 ----------
+
+def _timed_requests(client, endpoint, payloads):
+    times, stages, results, errors = [], {}, [], 0
+    for payload in payloads:
+        t0 = time.perf_counter()
+        resp = client.post(f'/api/{endpoint}', json=payload, headers={'X-Timing': '1'})
+        times.append((time.perf_counter() - t0) * 1000)
+        if resp.status_code != 200:
+            errors += 1
+            results.append(None)
+            continue
+        results.append([r['book_id'] for r in resp.get_json()])
+        for part in resp.headers.get('X-Timing', '').split(','):
+            name, _, ms = part.partition('=')
+            if name and name != 'total':
+                stages.setdefault(name, []).append(float(ms))
+    return times, stages, results, errors
+
+
+def worker_api(args):
+    if args.cores:
+        # 只在前 cores 个核上跑，分片线程也受限于此
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:args.cores])
+    os.environ.update(INDEX_DIR=args.index_dir, INDEX_POLL_INTERVAL='0', CACHE_SIZE='0',
+                      PROFILE_DB=str(Path(args.index_dir) / 'profiles.db'))
+    sys.path.insert(0, str(ROOT / 'app'))
+    t0 = time.perf_counter()
+    import api
+    startup = time.perf_counter() - t0
+    client = api.app.test_client()
+
+    rng = np.random.default_rng([args.seed, 4])
+    conn = sqlite3.connect(args.db)
+    titles = [r[0] for r in conn.execute('SELECT title FROM book ORDER BY book_id')]
+    conn.close()
+    n = args.queries
+    queries = {
+        'similar_by_title': [{'title': titles[i], 'k': args.k} for i in rng.choice(len(titles), n + WARMUP, replace=n + WARMUP > len(titles))],
+        'similar_by_text': [{'text': t, 'k': args.k} for t in query_texts(n + WARMUP, args.seed + 1)],
+    }
+    out = {'startup_seconds': startup, 'queries': n, 'k': args.k}
+    has_ann = api.indexes.active.index.ann is not None
+    for endpoint in ENDPOINTS:
+        exact_results = None
+        for mode in args.modes.split(','):
+            if mode == 'ann' and not has_ann:
+                continue
+            payloads = [dict(p, mode=mode) for p in queries[endpoint]]
+            _timed_requests(client, endpoint, payloads[:WARMUP])
+            t0 = time.perf_counter()
+            times, stages, results, errors = _timed_requests(client, endpoint, payloads[WARMUP:])
+            elapsed = time.perf_counter() - t0
+            entry = {'requests_per_s': n / elapsed, 'errors': errors, **percentiles(times),
+                     'stages_p50_ms': {name: float(np.median(v)) for name, v in stages.items()}}
+            if mode == 'exact':
+                exact_results = results
+            elif exact_results is not None:
+                # ANN 相对精确检索的 recall@k
+                hits = [len(set(a) & set(e)) / max(len(e), 1)
+                        for a, e in zip(results, exact_results) if a is not None and e is not None]
+                entry['recall'] = float(np.mean(hits)) if hits else float('nan')
+            out[f'{endpoint}/{mode}'] = entry
+    api.profiles.stop()
+    return out
+
+
+def worker_parser(args):
+    from fast_parser import decode_page, parse_novel_detail as fast_parse_novel_detail
+    from NovelMindScrawl import parse_chapter_text, parse_novel_detail, parse_rank_page
+    from bench_parse import check, load_pages, throughput
+    from reparse import classify
+    from urllib.parse import unquote
+
+    pages = {'rank': [], 'chapter': []}
+    for name in sorted(os.listdir(args.page_dir)):
+        kind = classify(unquote(name)[:-len('.html')]) if name.endswith('.html') else None
+        if kind in pages:
+            with open(os.path.join(args.page_dir, name), 'rb') as f:
+                pages[kind].append((name, decode_page(f.read())))
+    detail = load_pages(args.page_dir)
+    # check() 逐条打印不一致的页面，写到日志里
+    with redirect_stdout(sys.stderr):
+        mismatches = check(detail)
+    out = {
+        'pages': {'rank': len(pages['rank']), 'detail': len(detail), 'chapter': len(pages['chapter'])},
+        'detail_mismatches': mismatches,
+    }
+    if pages['rank']:
+        out['rank_pages_per_s'] = throughput(parse_rank_page, pages['rank'], args.repeat)
+        out['rank_rows'] = sum(len(parse_rank_page(html)) for _, html in pages['rank'])
+    if detail:
+        out['detail_bs4_pages_per_s'] = throughput(parse_novel_detail, detail, args.repeat)
+        out['detail_lxml_pages_per_s'] = throughput(fast_parse_novel_detail, detail, args.repeat)
+    if pages['chapter']:
+        out['chapter_pages_per_s'] = throughput(parse_chapter_text, pages['chapter'], args.repeat)
+    return out
+
+
+def bench_shards(db, index_dir, counts, args, run_dir):
+    """每个分片数各跑一遍精确检索，返回 {核数: {接口: 延迟/吞吐}}，speedup_p50 相对第一个分片数"""
+    out, cpus = {}, len(os.sched_getaffinity(0))
+    for n in counts:
+        if n > cpus:
+            print(f'warning: {n} shards > {cpus} usable cores, threads will share cores', file=sys.stderr)
+        res = _worker('api', ['--db', str(db), '--index-dir', str(index_dir), '--seed', str(args.seed),
+                              '--queries', str(args.queries), '-k', str(args.k), '--modes', 'exact',
+                              '--cores', str(min(n, cpus))],
+                      run_dir, env={'SHARDS': str(n)}, name=f'shards_{n}')
+        out[str(n)] = {endpoint: {key: value for key, value in res[f'{endpoint}/exact'].items() if key != 'stages_p50_ms'}
+                       for endpoint in ENDPOINTS}
+    base = out[str(counts[0])]
+    for entry in out.values():
+        for endpoint in ENDPOINTS:
+            entry[endpoint]['speedup_p50'] = base[endpoint]['p50_ms'] / entry[endpoint]['p50_ms']
+    return out
+
+
+# ---------- 报告 ----------
+
+def _git(*cmd):
+    try:
+        return subprocess.run(['git', *cmd], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def meta(args, sizes):
+    import scipy, sklearn
+    status = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__, 'scipy': scipy.__version__, 'sklearn': sklearn.__version__,
+        'sizes': sizes, 'seed': args.seed, 'queries': args.queries, 'k': args.k,
+        'workers': args.workers, 'pages': args.page_dir or args.pages,
+    }
+
+
+def default_shard_counts():
+    """1, 2, 4, ... 直到可用核数"""
+    cpus = len(os.sched_getaffinity(0))
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return ','.join(map(str, counts))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10k', help='逗号分隔的书目规模，如 10k,100k,1m')
+    parser.add_argument('--stages', default=','.join(DEFAULT_STAGES),
+                        help=f'要跑的阶段（{",".join(STAGES)}），默认 {",".join(DEFAULT_STAGES)}')
+    parser.add_argument('--out', default=None, help='报告 JSON 路径，默认打印到标准输出')
+    parser.add_argument('--workdir', default=os.path.join(os.environ.get('TMPDIR', '/tmp'), 'novelnest-bench'),
+                        help='合成库、索引与日志的目录')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fresh', action='store_true', help='重新生成合成库，不复用缓存')
+    parser.add_argument('--workers', type=int, default=1, help='build_index.py 的 --workers')
+    parser.add_argument('--queries', type=int, default=300, help='每个接口、每种模式计时的请求数')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=500, help='解析阶段渲染的书目数（未指定 --page-dir 时）')
+    parser.add_argument('--page-dir', default=None, help='改用已保存的页面目录（fixture_server.py 命名）')
+    parser.add_argument('--repeat', type=int, default=3, help='解析吞吐取 repeat 次里最快的一次')
+    parser.add_argument('--shard-counts', default=None,
+                        help='shards 阶段的分片数（同时是绑定的核数），逗号分隔，默认 1,2,4... 直到可用核数')
+    # 内部用：在子进程里执行单个阶段
+    parser.add_argument('--worker', choices=('api', 'parser'), help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--index-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--modes', default=','.join(MODES), help=argparse.SUPPRESS)
+    parser.add_argument('--cores', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        out = worker_api(args) if args.worker == 'api' else worker_parser(args)
+        with open(args.result, 'w') as f:
+            json.dump(out, f)
+        return
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f'未知阶段: {", ".join(sorted(unknown))}')
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    report = {'meta': meta(args, sizes), 'sizes': {}}
+
+    for n in sizes:
+        db = workdir / f'books_{n}_s{args.seed}.db'
+        run_dir = workdir / f'run_{n}'
+        run_dir.mkdir(exist_ok=True)
+        result = report['sizes'][str(n)] = {}
+        index_dir = run_dir / 'index'
+        if args.fresh or not db.exists():
+            print(f'[{n}] generating catalogue', file=sys.stderr)
+            result['catalogue'] = generate(str(db), n, args.seed)
+            shutil.rmtree(index_dir, ignore_errors=True)
+        if 'build' in stages or ({'api', 'shards'} & set(stages) and not index_dir.exists()):
+            print(f'[{n}] build_index.py', file=sys.stderr)
+            result['build'] = bench_build(db, index_dir, args.workers, run_dir)
+        if 'api' in stages:
+            print(f'[{n}] api', file=sys.stderr)
+            result['api'] = _worker('api', ['--db', str(db), '--index-dir', str(index_dir), '--seed', str(args.seed),
+                                            '--queries', str(args.queries), '-k', str(args.k)], run_dir)
+        if 'shards' in stages:
+            counts = [int(c) for c in (args.shard_counts or default_shard_counts()).split(',') if c.strip()]
+            print(f'[{n}] shards {counts}', file=sys.stderr)
+            result['shards'] = bench_shards(db, index_dir, counts, args, run_dir)
+
+    if 'parser' in stages:
+        page_dir = args.page_dir
+        if page_dir is None:
+            # 页面按最小规模的合成库渲染
+            n = min(sizes) if sizes else 10_000
+            db = workdir / f'books_{n}_s{args.seed}.db'
+            if not db.exists():
+                generate(str(db), n, args.seed)
+            page_dir = str(workdir / f'pages_{n}_s{args.seed}_{args.pages}')
+            if args.fresh or not os.path.isdir(page_dir):
+                write_pages(str(db), page_dir, args.pages)
+        print('[parser]', page_dir, file=sys.stderr)
+        report['parser'] = _worker('parser', ['--page-dir', page_dir, '--repeat', str(args.repeat)], workdir)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print('Saved:', args.out, file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
+import os
+import argparse
 import requests
-import sqlite3
 import re
 import time
 import random
@@ -7,6 +8,10 @@ from bs4 import BeautifulSoup
 from datetime import date
 from urllib.parse import urljoin, urlparse, parse_qs
 
+import fast_parser
+from fast_parser import decode_page
+from writer import BATCH_SIZE, SQLiteWriter, connect
+
 # 配置请求头（User-Agent 等）
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 "
@@ -15,9 +20,22 @@ headers = {
 
 # 晋江基础URL和排行榜URL模板
 BASE_URL = "https://www.jjwxc.net/"
-RANK_URL_TEMPLATE = (
-    "https://www.jjwxc.net/bookbase.php?sortType=4&collectiontypes=ors&page={page}"
-)
+RANK_PATH_TEMPLATE = "bookbase.php?sortType=4&collectiontypes=ors&page={page}"
+RANK_URL_TEMPLATE = BASE_URL + RANK_PATH_TEMPLATE
+
+# 排行榜/详情页里的更新时间，如 2024-05-01 12:00:00（排行榜上可能只到分钟）
+UPDATE_TIME_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}(?::\d{2})?")
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(DATA_DIR, "jinjiang_novels.db")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "raw_pages")
+
+# 复用 TCP 连接（keep-alive）
+session = requests.Session()
+session.headers.update(headers)
+
+# 原始页面归档（page_store.PageStore），由 main 按命令行参数设置；为 None 时不归档
+archive = None
 
 
 def extract_novelid(novel_url: str):
@@ -31,18 +49,19 @@ def extract_novelid(novel_url: str):
     return None
 
 
-def crawl_rank_page(page=1, limit=None):
-    """抓取排行榜列表页，返回该页上的小说概要列表"""
-    url = RANK_URL_TEMPLATE.format(page=page)
-    try:
-        resp = requests.get(url, headers=headers, timeout=15)
-    except Exception as e:
-        print(f"获取第{page}页排行失败：", e)
-        return []
+def rebase_url(url: str, base_url: str = BASE_URL):
+    """把晋江站内链接改写到 base_url 下（对本地 fixture 服务器抓取时使用）"""
+    if base_url != BASE_URL and url.startswith(BASE_URL):
+        return base_url + url[len(BASE_URL):]
+    return url
+
+
+# ========== 页面解析（纯函数，不做网络请求） ==========
 
-    # 晋江页面编码为 GBK/GB18030，需要正确解析编码
-    resp.encoding = resp.apparent_encoding or "gb18030"
-    soup = BeautifulSoup(resp.text, "lxml")
+
+def parse_rank_page(html: str, base_url: str = BASE_URL, limit=None):
+    """解析排行榜列表页，返回该页上的小说概要列表"""
+    soup = BeautifulSoup(html, "lxml")
     rows = soup.find_all("tr")
     novels = []
     # 跳过表头，从第2行开始解析
@@ -55,7 +74,7 @@ def crawl_rank_page(page=1, limit=None):
         if not title_tag:
             continue
         novel_name = title_tag.get_text(strip=True)  # 小说名称
-        novel_url = urljoin(BASE_URL, title_tag["href"])  # 小说详情页URL
+        novel_url = urljoin(base_url, title_tag["href"])  # 小说详情页URL
         novel_id = extract_novelid(novel_url)  # 小说ID
         if novel_id is None:
             continue
@@ -72,6 +91,13 @@ def crawl_rank_page(page=1, limit=None):
             else:
                 intro = title_attr.replace("简介：", "").strip()
 
+        # 排行榜行内的更新时间（如有），增量抓取据此跳过没有更新的书
+        last_update_time = None
+        for col in cols[2:]:
+            m = UPDATE_TIME_RE.search(col.get_text(" ", strip=True))
+            if m:
+                last_update_time = m.group(0)
+
         novels.append(
             {
                 "novel_id": novel_id,
@@ -80,6 +106,7 @@ def crawl_rank_page(page=1, limit=None):
                 "url": novel_url,
                 "intro": intro,
                 "tags": tags,
+                "last_update_time": last_update_time,
             }
         )
 
@@ -88,19 +115,19 @@ def crawl_rank_page(page=1, limit=None):
     return novels
 
 
-def fetch_first_300_text_from_first_chapter(novel_id: int, novel_soup: BeautifulSoup):
-    """
-    从小说主页 soup 中找到第一章的免费章节链接，
-    打开章节页并提取正文前 300 字。
-    """
+def find_first_chapter_url(novel_soup: BeautifulSoup, base_url: str = BASE_URL):
+    """从小说主页 soup 中找到第一章的免费章节链接；VIP 章节或找不到时返回 None"""
     # 查找第一章的免费章节链接：onebook.php?novelid=xxx&chapterid=1 这类
     first_chapter_link = novel_soup.find(
         "a", href=re.compile(r"onebook\.php\?novelid=\d+&chapterid=\d+")
     )
     if not first_chapter_link:
         return None
+    return chapter_url_from_href(first_chapter_link.get("href"), base_url)
+
 
-    chapter_href = first_chapter_link.get("href")
+def chapter_url_from_href(chapter_href, base_url: str = BASE_URL):
+    """第一章链接的 href 转成完整 URL；VIP 章节返回 None"""
     if not chapter_href:
         return None
 
@@ -108,16 +135,12 @@ def fetch_first_300_text_from_first_chapter(novel_id: int, novel_soup: Beautiful
     if "vip" in chapter_href.lower():
         return None
 
-    chapter_url = urljoin(BASE_URL, chapter_href)
+    return rebase_url(urljoin(base_url, chapter_href), base_url)
 
-    try:
-        resp = requests.get(chapter_url, headers=headers, timeout=15)
-    except Exception as e:
-        print(f"获取章节页面失败：{chapter_url}，原因：{e}")
-        return None
 
-    resp.encoding = resp.apparent_encoding or "gb18030"
-    csoup = BeautifulSoup(resp.text, "lxml")
+def parse_chapter_text(html: str):
+    """解析章节页，返回正文前 300 字"""
+    csoup = BeautifulSoup(html, "lxml")
 
     # 一般正文在 class="novelbody" 下面，或者 style 含有 font-size:16px 的 div 中
     content_div = csoup.find("div", class_="novelbody")
@@ -136,21 +159,13 @@ def fetch_first_300_text_from_first_chapter(novel_id: int, novel_soup: Beautiful
     return text[:300]
 
 
-def fetch_novel_detail(novel_url: str, novel_id: int):
+def parse_novel_detail(html: str):
     """
-    抓取单本小说的详情页信息，返回解析后的字段字典。
-    会额外尝试抓取第一章正文前300字：字段 first_300_text
+    解析单本小说的详情页，返回 (字段字典, soup)。
+    第一章正文需要另行请求，不在这里处理。
     """
     data = {}
-    try:
-        resp = requests.get(novel_url, headers=headers, timeout=15)
-    except Exception as e:
-        print(f"获取小说详情失败：{novel_url}, 原因：", e)
-        return data
-
-    # 晋江详情页通常为 GBK 编码
-    resp.encoding = resp.apparent_encoding or "gb18030"
-    soup = BeautifulSoup(resp.text, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
     page_text = soup.get_text()  # 页面所有文本，用于搜索特定关键字
 
     # 1. 小说简介（文案）
@@ -238,8 +253,85 @@ def fetch_novel_detail(novel_url: str, novel_id: int):
     )
     data["chapter_count"] = len(chapter_links)
 
-    # 6. 章节正文前300字
-    first_300_text = fetch_first_300_text_from_first_chapter(novel_id, soup)
+    return data, soup
+
+
+def parse_detail(html: str, base_url: str = BASE_URL, fast=True):
+    """
+    解析详情页，返回 (字段字典, 第一章免费章节 URL 或 None)。
+    fast=True 使用 fast_parser（lxml + XPath），否则使用上面的 html.parser 版本，两者结果一致。
+    """
+    if fast:
+        data, chapter_href = fast_parser.parse_novel_detail(html)
+        return data, chapter_url_from_href(chapter_href, base_url)
+    data, soup = parse_novel_detail(html)
+    return data, find_first_chapter_url(soup, base_url)
+
+
+# ========== 同步抓取 ==========
+
+
+def fetch_html(url: str):
+    resp = session.get(url, timeout=15)
+    if archive is not None and resp.ok:
+        archive.put(url, resp.content)
+    # 晋江页面编码为 GBK/GB18030，固定按 GB18030 解码，省掉对整页的编码探测
+    return decode_page(resp.content)
+
+
+def crawl_rank_page(page=1, limit=None, base_url=BASE_URL):
+    """抓取排行榜列表页，返回该页上的小说概要列表"""
+    url = urljoin(base_url, RANK_PATH_TEMPLATE.format(page=page))
+    try:
+        html = fetch_html(url)
+    except Exception as e:
+        print(f"获取第{page}页排行失败：", e)
+        return []
+    return parse_rank_page(html, base_url, limit)
+
+
+def fetch_first_300_text_from_first_chapter(novel_id: int, novel_soup: BeautifulSoup, base_url=BASE_URL):
+    """
+    从小说主页 soup 中找到第一章的免费章节链接，
+    打开章节页并提取正文前 300 字。
+    """
+    return fetch_chapter_text(find_first_chapter_url(novel_soup, base_url))
+
+
+def fetch_chapter_text(chapter_url):
+    """打开章节页并提取正文前 300 字"""
+    if chapter_url is None:
+        return None
+
+    try:
+        html = fetch_html(chapter_url)
+    except Exception as e:
+        print(f"获取章节页面失败：{chapter_url}，原因：{e}")
+        return None
+
+    return parse_chapter_text(html)
+
+
+def fetch_novel_detail(novel_url: str, novel_id: int, base_url=BASE_URL, cached_chapter=None, fast=True):
+    """
+    抓取单本小说的详情页信息，返回解析后的字段字典。
+    会额外尝试抓取第一章正文前300字：字段 first_300_text
+    cached_chapter(novel_id, last_update_time) 返回非 None 时直接复用，不再请求章节页
+    """
+    try:
+        html = fetch_html(rebase_url(novel_url, base_url))
+    except Exception as e:
+        print(f"获取小说详情失败：{novel_url}, 原因：", e)
+        return {}
+
+    data, chapter_url = parse_detail(html, base_url, fast)
+
+    # 6. 章节正文前300字（书没有更新时复用库里已有的）
+    first_300_text = None
+    if cached_chapter is not None:
+        first_300_text = cached_chapter(novel_id, data.get("last_update_time"))
+    if first_300_text is None:
+        first_300_text = fetch_chapter_text(chapter_url)
     data["first_300_text"] = first_300_text
 
     return data
@@ -247,159 +339,282 @@ def fetch_novel_detail(novel_url: str, novel_id: int):
 
 # ========== 数据库部分 ==========
 
-# 连接SQLite数据库（文件不存在会自动创建）
-conn = sqlite3.connect("jinjiang_novels.db")
-cur = conn.cursor()
 
-# 创建主要数据表（书籍基本信息表 和 统计信息表）
-cur.execute(
+STATS_METRICS = ("review_count", "favorite_count", "nutrient_count", "total_click_count", "score", "chapter_count")
+STATS_METRICS_SQL = ", ".join(STATS_METRICS)
+
+
+def init_db(db_path=DB_PATH):
+    """连接SQLite数据库（文件不存在会自动创建，WAL 模式），并建好 book / stats 表及读侧索引"""
+    conn = connect(db_path)
+    cur = conn.cursor()
+
+    # 创建主要数据表（书籍基本信息表 和 统计信息表）
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS book (
+            book_id          INTEGER PRIMARY KEY,
+            title            TEXT,
+            author           TEXT,
+            intro            TEXT,
+            tags             TEXT,
+            main_chars       TEXT,
+            support_chars    TEXT,
+            other_info       TEXT,
+            category         TEXT,
+            perspective      TEXT,
+            series           TEXT,
+            status           TEXT,
+            word_count       INTEGER,
+            publish_status   TEXT,
+            sign_status      TEXT,
+            last_update_time TEXT,
+            chapter_count    INTEGER,
+            first_300_text   TEXT
+        )
     """
-    CREATE TABLE IF NOT EXISTS book (
-        book_id          INTEGER PRIMARY KEY,
-        title            TEXT,
-        author           TEXT,
-        intro            TEXT,
-        tags             TEXT,
-        main_chars       TEXT,
-        support_chars    TEXT,
-        other_info       TEXT,
-        category         TEXT,
-        perspective      TEXT,
-        series           TEXT,
-        status           TEXT,
-        word_count       INTEGER,
-        publish_status   TEXT,
-        sign_status      TEXT,
-        last_update_time TEXT,
-        chapter_count    INTEGER,
-        first_300_text   TEXT
     )
-"""
-)
 
-cur.execute(
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stats (
+            id                INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id           INTEGER,
+            date              TEXT,
+            review_count      INTEGER,
+            favorite_count    INTEGER,
+            nutrient_count    INTEGER,
+            total_click_count INTEGER,
+            score             INTEGER,
+            chapter_count     INTEGER,
+            FOREIGN KEY(book_id) REFERENCES book(book_id)
+        )
     """
-    CREATE TABLE IF NOT EXISTS stats (
-        id                INTEGER PRIMARY KEY AUTOINCREMENT,
-        book_id           INTEGER,
-        date              TEXT,
-        review_count      INTEGER,
-        favorite_count    INTEGER,
-        nutrient_count    INTEGER,
-        total_click_count INTEGER,
-        score             INTEGER,
-        chapter_count     INTEGER,
-        FOREIGN KEY(book_id) REFERENCES book(book_id)
     )
-"""
-)
-conn.commit()
-
-# 如果之前已经创建过 book 表但没有 first_300_text 字段，这里尝试补上
-cur.execute("PRAGMA table_info(book)")
-cols = [row[1] for row in cur.fetchall()]
-if "first_300_text" not in cols:
-    cur.execute("ALTER TABLE book ADD COLUMN first_300_text TEXT")
     conn.commit()
 
-# ========== 爬取排行榜并写入数据库 ==========
+    # 如果之前已经创建过 book 表但没有 first_300_text 字段，这里尝试补上
+    cur.execute("PRAGMA table_info(book)")
+    cols = [row[1] for row in cur.fetchall()]
+    if "first_300_text" not in cols:
+        cur.execute("ALTER TABLE book ADD COLUMN first_300_text TEXT")
+        conn.commit()
+
+    # 读侧按书取时间序列；按日期区间取全部书的快照走覆盖索引，不回表
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_stats_book_date ON stats(book_id, date)")
+    cur.execute("DROP INDEX IF EXISTS idx_stats_date")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_stats_date_cover ON stats(date, book_id, {STATS_METRICS_SQL})")
+    init_stats_rollup(cur)
+    conn.commit()
+    return conn
+
 
-target_count = 150  # 目标采集小说数量
-all_novel_list = []
-page = 1
+def init_stats_rollup(cur):
+    """
+    stats 的两张派生表：
+      stats_latest  每本书最新一天的快照，由 stats 上的插入触发器维护，取“当前热度”不用扫全表
+      stats_rollup  compact_stats.py 把旧的日粒度记录降采样成的周/月快照（取每个周期最后一天的值）
+    """
+    metric_cols = ",\n            ".join(f"{m} INTEGER" for m in STATS_METRICS)
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS stats_latest (
+            book_id INTEGER PRIMARY KEY,
+            date    TEXT,
+            {metric_cols}
+        ) WITHOUT ROWID
+    """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS stats_rollup (
+            book_id INTEGER,
+            period  TEXT,
+            start   TEXT,
+            date    TEXT,
+            days    INTEGER,
+            {metric_cols},
+            PRIMARY KEY (book_id, period, start)
+        ) WITHOUT ROWID
+    """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_stats_rollup_date ON stats_rollup(date)")
+    new_values = ", ".join(f"NEW.{m}" for m in STATS_METRICS)
+    updates = ", ".join(f"{m} = excluded.{m}" for m in ("date",) + STATS_METRICS)
+    # 补抓的旧日期不会覆盖更新的快照
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS stats_latest_insert AFTER INSERT ON stats
+        BEGIN
+            INSERT INTO stats_latest (book_id, date, {STATS_METRICS_SQL})
+            VALUES (NEW.book_id, NEW.date, {new_values})
+            ON CONFLICT(book_id) DO UPDATE SET {updates}
+            WHERE excluded.date >= stats_latest.date;
+        END
+    """
+    )
+    # 旧库第一次建表时从 stats 回填
+    if cur.execute("SELECT 1 FROM stats_latest LIMIT 1").fetchone() is None:
+        cur.execute(
+            f"""
+            INSERT INTO stats_latest (book_id, date, {STATS_METRICS_SQL})
+            SELECT book_id, date, {STATS_METRICS_SQL} FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY book_id ORDER BY date DESC, id DESC) AS rn
+                FROM stats WHERE book_id IS NOT NULL
+            ) WHERE rn = 1
+        """
+        )
 
-while len(all_novel_list) < target_count:
-    novels = crawl_rank_page(page=page)
-    if not novels:
-        break
-    all_novel_list.extend(novels)
-    if len(all_novel_list) >= target_count:
-        break
-    page += 1
-    time.sleep(random.uniform(1.0, 2.0))
 
-all_novel_list = all_novel_list[:target_count]
+BOOK_INSERT_SQL = """
+    INSERT OR REPLACE INTO book
+    (book_id, title, author, intro, tags, main_chars, support_chars, other_info,
+     category, perspective, series, status, word_count,
+     publish_status, sign_status, last_update_time, chapter_count, first_300_text)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+"""
 
-for novel in all_novel_list:
-    novel_id = novel["novel_id"]
-    novel_name = novel["novel_name"]
-    author = novel["author"]
-    novel_url = novel["url"]
+STATS_INSERT_SQL = """
+    INSERT INTO stats
+    (book_id, date, review_count, favorite_count, nutrient_count, total_click_count, score, chapter_count)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
 
-    detail = fetch_novel_detail(novel_url, novel_id)
-    if not detail:
-        continue
 
+def book_row(novel: dict, detail: dict):
+    """book 表的一行（与 BOOK_INSERT_SQL 的列顺序一致）"""
     # 优先使用详情页获取的完整简介；如详情页无简介，则用列表页摘要
     intro_text = detail.get("intro") or novel.get("intro") or ""
     tags_text = novel.get("tags") or ""
-
-    main_chars = detail.get("main_chars")
-    support_chars = detail.get("support_chars")
-    other_info = detail.get("other_info")
-    category = detail.get("category")
-    perspective = detail.get("perspective")
-    series = detail.get("series")
-    status = detail.get("status")
-    word_count = detail.get("word_count")
-    publish_status = detail.get("publish_status")
-    sign_status = detail.get("sign_status")
-    last_update = detail.get("last_update_time")
-    chapter_count = detail.get("chapter_count")
-    first_300_text = detail.get("first_300_text")
-
-    # 将基本信息插入或更新到 book 表
-    cur.execute(
-        """
-        INSERT OR REPLACE INTO book 
-        (book_id, title, author, intro, tags, main_chars, support_chars, other_info,
-         category, perspective, series, status, word_count,
-         publish_status, sign_status, last_update_time, chapter_count, first_300_text)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """,
-        (
-            novel_id,
-            novel_name,
-            author,
-            intro_text,
-            tags_text,
-            main_chars,
-            support_chars,
-            other_info,
-            category,
-            perspective,
-            series,
-            status,
-            word_count,
-            publish_status,
-            sign_status,
-            last_update,
-            chapter_count,
-            first_300_text,
-        ),
+    return (
+        novel["novel_id"],
+        novel["novel_name"],
+        novel["author"],
+        intro_text,
+        tags_text,
+        detail.get("main_chars"),
+        detail.get("support_chars"),
+        detail.get("other_info"),
+        detail.get("category"),
+        detail.get("perspective"),
+        detail.get("series"),
+        detail.get("status"),
+        detail.get("word_count"),
+        detail.get("publish_status"),
+        detail.get("sign_status"),
+        detail.get("last_update_time"),
+        detail.get("chapter_count"),
+        detail.get("first_300_text"),
     )
 
-    # 将当前爬取日期的动态数据插入到 stats 表
-    cur.execute(
-        """
-        INSERT INTO stats 
-        (book_id, date, review_count, favorite_count, nutrient_count, total_click_count, score, chapter_count)
-        VALUES (?,?,?,?,?,?,?,?)
-        """,
-        (
-            novel_id,
-            date.today().isoformat(),
-            detail.get("review_count"),
-            detail.get("favorite_count"),
-            detail.get("nutrient_count"),
-            detail.get("total_click_count"),
-            detail.get("score"),
-            chapter_count,
-        ),
+
+def stats_row(novel: dict, detail: dict, crawl_date=None):
+    """stats 表的一行：当前爬取日期的动态数据"""
+    return (
+        novel["novel_id"],
+        crawl_date or date.today().isoformat(),
+        detail.get("review_count"),
+        detail.get("favorite_count"),
+        detail.get("nutrient_count"),
+        detail.get("total_click_count"),
+        detail.get("score"),
+        detail.get("chapter_count"),
     )
 
-    conn.commit()
-    time.sleep(random.uniform(0.5, 1.0))
 
-conn.close()
-print(f"共采集{len(all_novel_list)}本小说的数据，已保存到数据库。")
\ No newline at end of file
+def save_novel(cur, novel: dict, detail: dict, crawl_date=None):
+    """把一本小说的列表页概要 + 详情页字段写入 book 表，并追加当天的 stats 记录"""
+    cur.execute(BOOK_INSERT_SQL, book_row(novel, detail))
+    cur.execute(STATS_INSERT_SQL, stats_row(novel, detail, crawl_date))
+
+
+# ========== 爬取排行榜并写入数据库 ==========
+
+
+def crawl_sync(run, target_count, base_url=BASE_URL, fast=True):
+    """逐本顺序抓取（原始模式），带随机间隔；先补完上次中断的书，再从断点页继续翻排行榜"""
+
+    def fetch(novels):
+        for novel in novels:
+            detail = fetch_novel_detail(novel["url"], novel["novel_id"], base_url, run.cached_chapter, fast)
+            if detail:
+                run.record(novel, detail)
+            else:
+                run.fail(novel["novel_id"])
+            time.sleep(random.uniform(0.5, 1.0))
+
+    fetch(run.pending())
+    page = run.last_page + 1
+    while run.enqueued < target_count:
+        novels = crawl_rank_page(page=page, base_url=base_url)
+        if not novels:
+            break
+        fetch(run.plan_page(page, novels[: target_count - run.enqueued]))
+        page += 1
+        time.sleep(random.uniform(1.0, 2.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="晋江排行榜爬虫")
+    parser.add_argument("--target-count", type=int, default=150, help="目标采集小说数量")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite 数据库路径")
+    parser.add_argument("--base-url", default=BASE_URL, help="站点根地址，可指向本地 fixture 服务器")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="使用 asyncio 并发抓取")
+    parser.add_argument("--concurrency", type=int, default=16, help="异步模式的最大并发请求数")
+    parser.add_argument("--rate", type=float, default=4.0, help="异步模式下每个域名每秒请求数上限")
+    parser.add_argument("--parser", choices=("lxml", "bs4"), default="lxml",
+                        help="详情页解析器：lxml 快速版（默认）或原始的 html.parser 版")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="写库线程每个事务的最大语句数")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="原始页面归档目录")
+    parser.add_argument("--no-archive", action="store_true", help="不归档原始页面")
+    parser.add_argument("--reparse", action="store_true",
+                        help="不联网，从归档里重新解析页面并重建 book / stats 表")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="重解析的进程数")
+    parser.add_argument("--dates", nargs="*", default=None, help="重解析只处理这些抓取日期（YYYY-MM-DD）")
+    parser.add_argument("--restart", action="store_true", help="放弃上次中断的抓取，从第 1 页重新开始")
+    parser.add_argument("--force", action="store_true", help="忽略更新时间，所有书都重新抓详情页")
+    parser.add_argument("--max-age-days", type=float, default=None,
+                        help="距上次抓取超过该天数的书即使没有更新也重新抓（刷新 stats）")
+    args = parser.parse_args()
+    fast = args.parser == "lxml"
+    base_url = args.base_url if args.base_url.endswith("/") else args.base_url + "/"
+
+    if args.reparse:
+        from reparse import reparse
+
+        reparse(args.db, args.archive, args.workers, args.dates)
+        return
+
+    from frontier import CrawlRun
+
+    global archive
+    if not args.no_archive:
+        from page_store import PageStore
+
+        archive = PageStore(args.archive)
+    conn = init_db(args.db)
+    # 写库在独立线程里分批提交，抓取线程/事件循环只负责入队；异步模式下 run.record 在事件循环线程里调用，入队不能阻塞
+    writer = SQLiteWriter(args.db, batch_size=args.batch_size, bounded=not args.use_async)
+    run = CrawlRun(
+        conn, writer, args.target_count, restart=args.restart, force=args.force, max_age_days=args.max_age_days
+    )
+    try:
+        if args.use_async:
+            from async_crawler import crawl_async
+
+            crawl_async(run, args.target_count, base_url, args.concurrency, args.rate, fast, archive)
+        else:
+            crawl_sync(run, args.target_count, base_url, fast)
+        run.finish()
+    finally:
+        # 中断时也把已入队的结果提交掉，下次从这里续抓
+        writer.close()
+        conn.close()
+        if archive is not None:
+            archive.close()
+    print(run.summary())
+    print(f"写库：{writer.rows} 条语句，{writer.batches} 个事务")
+
+
+if __name__ == "__main__":
+    main()
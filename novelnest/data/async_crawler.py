@@ -0,0 +1,177 @@
+import time
+import asyncio
+import aiohttp
+from urllib.parse import urljoin, urlparse
+
+from NovelMindScrawl import (
+    BASE_URL,
+    RANK_PATH_TEMPLATE,
+    headers,
+    rebase_url,
+    parse_rank_page,
+    parse_detail,
+    parse_chapter_text,
+)
+from fast_parser import decode_page
+
+# 异步抓取：一个 aiohttp 连接池 + 全局并发上限 + 每个域名一个令牌桶限速
+# 排行页 -> 详情页 -> 第一章 三段用队列串成流水线，章节请求与后续书目的详情请求重叠进行
+# 页面解析复用 NovelMindScrawl.py 里的纯函数，断点与增量规则复用 frontier.CrawlRun，结果与同步模式一致
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncCrawler:
+    def __init__(self, base_url=BASE_URL, concurrency=16, rate=4.0, burst=None, timeout=15, retries=2, fast=True, archive=None):
+        self.base_url = base_url
+        self.fast = fast
+        self.archive = archive
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.buckets = {}
+        self.session = None
+        self.semaphore = None
+        self.requests = 0
+
+    def _bucket(self, url):
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    async def fetch(self, url):
+        """限速 + 限并发地取回页面文本；晋江页面按 GB18030 解码，失败返回 None"""
+        for attempt in range(self.retries + 1):
+            await self._bucket(url).acquire()
+            try:
+                async with self.semaphore:
+                    self.requests += 1
+                    async with self.session.get(url) as resp:
+                        resp.raise_for_status()
+                        body = await resp.read()
+                if self.archive is not None:
+                    self.archive.put(url, body)
+                return decode_page(body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    print(f"请求失败：{url}，原因：{e!r}")
+                    return None
+                await asyncio.sleep(0.5 * (attempt + 1))
+
+    async def _rank_producer(self, run, target_count, detail_queue):
+        # 先补完上次中断时已登记的书，再从断点页继续翻排行榜
+        for novel in run.pending():
+            await detail_queue.put(novel)
+        page = run.last_page + 1
+        while run.enqueued < target_count:
+            html = await self.fetch(urljoin(self.base_url, RANK_PATH_TEMPLATE.format(page=page)))
+            novels = parse_rank_page(html, self.base_url) if html else []
+            if not novels:
+                break
+            for novel in run.plan_page(page, novels[: target_count - run.enqueued]):
+                await detail_queue.put(novel)
+            page += 1
+
+    async def _detail_worker(self, run, detail_queue, chapter_queue):
+        while True:
+            novel = await detail_queue.get()
+            try:
+                html = await self.fetch(rebase_url(novel["url"], self.base_url))
+                if not html:
+                    run.fail(novel["novel_id"])
+                    continue
+                try:
+                    data, chapter_url = parse_detail(html, self.base_url, self.fast)
+                    # 书没有更新时复用库里的第一章，不再排队请求章节页
+                    cached = run.cached_chapter(novel["novel_id"], data.get("last_update_time"))
+                except Exception as e:
+                    # 出错只算这本书失败，协程继续处理队列，否则生产者会卡在 put 上
+                    print(f"处理失败：{novel['url']}，原因：{e!r}")
+                    run.fail(novel["novel_id"])
+                    continue
+                if cached is not None:
+                    data["first_300_text"] = cached
+                    chapter_url = None
+                await chapter_queue.put((novel, data, chapter_url))
+            finally:
+                detail_queue.task_done()
+
+    async def _chapter_worker(self, run, chapter_queue):
+        while True:
+            novel, data, chapter_url = await chapter_queue.get()
+            try:
+                if chapter_url:
+                    html = await self.fetch(chapter_url)
+                    data["first_300_text"] = parse_chapter_text(html) if html else None
+                data.setdefault("first_300_text", None)
+                run.record(novel, data)
+            except Exception as e:
+                print(f"处理失败：{novel['url']}，原因：{e!r}")
+                run.fail(novel["novel_id"])
+            finally:
+                chapter_queue.task_done()
+
+    async def _drain(self, run, target_count, detail_queue, chapter_queue):
+        await self._rank_producer(run, target_count, detail_queue)
+        await detail_queue.join()
+        await chapter_queue.join()
+
+    async def crawl(self, run, target_count):
+        """按 run（frontier.CrawlRun）的断点与增量规则抓取，解析结果交给 run.record"""
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        detail_queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        chapter_queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=self.timeout) as session:
+            self.session = session
+            workers = [
+                asyncio.create_task(self._detail_worker(run, detail_queue, chapter_queue))
+                for _ in range(self.concurrency)
+            ] + [
+                asyncio.create_task(self._chapter_worker(run, chapter_queue))
+                for _ in range(self.concurrency)
+            ]
+            main = asyncio.create_task(self._drain(run, target_count, detail_queue, chapter_queue))
+            try:
+                # 工作协程只会因写库出错这类不属于单本书的异常退出，这时直接抛出，不再等队列排空
+                done, _ = await asyncio.wait([main, *workers], return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            finally:
+                for w in [main, *workers]:
+                    w.cancel()
+                await asyncio.gather(main, *workers, return_exceptions=True)
+
+
+def crawl_async(run, target_count, base_url=BASE_URL, concurrency=16, rate=4.0, fast=True, archive=None):
+    """异步模式入口：抓取结果在事件循环线程里经 run.record 写库"""
+    crawler = AsyncCrawler(base_url, concurrency, rate, fast=fast, archive=archive)
+    t0 = time.perf_counter()
+    asyncio.run(crawler.crawl(run, target_count))
+    elapsed = time.perf_counter() - t0
+    print(f"{crawler.requests} 次请求，耗时 {elapsed:.1f}s")
@@ -0,0 +1,95 @@
+import argparse
+import time
+from datetime import date, timedelta
+
+from NovelMindScrawl import DB_PATH, STATS_METRICS, STATS_METRICS_SQL, init_db
+
+# stats 降采样：日粒度记录只保留最近 DAILY_DAYS 天，更早的按周取每周最后一次抓取的快照写入 stats_rollup，
+# 周快照超过 WEEKLY_DAYS 天再合并成月快照。各计数都是累计值，相邻快照相减就是区间内的增量，
+# 降采样只丢掉周期内的日间波动，趋势不丢
+#   period = 'week' 时 start 为该周周一（跨月时为月初），'month' 时为该月 1 日；date 为快照实际的抓取日期，days 为合并的记录数
+# 截止日期对齐到周一 / 月初，同一周期不会被拆到两次压缩里；补抓的旧记录再压缩时合并进已有周期
+# 用法：python compact_stats.py [--daily-days 90] [--weekly-days 365] [--vacuum]
+
+DAILY_DAYS = 90
+WEEKLY_DAYS = 365
+
+# 跨月的周在月初切开，月快照由周快照合并时不会串月
+WEEK_START = "max(date({0}, '-6 days', 'weekday 1'), date({0}, 'start of month'))"
+MONTH_START = "date({}, 'start of month')"
+
+
+def _rollup_sql(period, bucket, source, days, order):
+    # 每个 (书, 周期) 取最后一条记录；已有同一周期时累加 days，快照取日期较新的一条
+    newer = "excluded.date >= stats_rollup.date"
+    updates = ",\n            ".join(
+        f"{col} = CASE WHEN {newer} THEN excluded.{col} ELSE stats_rollup.{col} END" for col in ("date",) + STATS_METRICS
+    )
+    return f"""
+        INSERT INTO stats_rollup (book_id, period, start, date, days, {STATS_METRICS_SQL})
+        SELECT book_id, '{period}', start, date, days, {STATS_METRICS_SQL} FROM (
+            SELECT book_id, {bucket} AS start, date, {STATS_METRICS_SQL},
+                   {days} OVER w AS days,
+                   ROW_NUMBER() OVER (w ORDER BY date DESC, {order} DESC) AS rn
+            FROM {source}
+            WINDOW w AS (PARTITION BY book_id, {bucket})
+        ) WHERE rn = 1
+        ON CONFLICT(book_id, period, start) DO UPDATE SET
+            days = stats_rollup.days + excluded.days,
+            {updates}
+    """
+
+
+def week_start(d):
+    return d - timedelta(days=d.weekday())
+
+
+def compact(conn, daily_days=DAILY_DAYS, weekly_days=WEEKLY_DAYS, today=None):
+    """单事务完成两级降采样，返回 (周快照新增/合并的记录数, 月快照新增/合并的记录数)"""
+    today = today or date.today()
+    daily_cutoff = week_start(today - timedelta(days=daily_days)).isoformat()
+    weekly_cutoff = (today - timedelta(days=weekly_days)).replace(day=1).isoformat()
+    with conn:
+        daily = f"(SELECT * FROM stats WHERE date < '{daily_cutoff}' AND book_id IS NOT NULL)"
+        weekly_rows = conn.execute(_rollup_sql("week", WEEK_START.format("date"), daily, "COUNT(*)", "id")).rowcount
+        conn.execute("DELETE FROM stats WHERE date < ?", (daily_cutoff,))
+        weeks = f"(SELECT * FROM stats_rollup WHERE period = 'week' AND date < '{weekly_cutoff}')"
+        monthly_rows = conn.execute(_rollup_sql("month", MONTH_START.format("date"), weeks, "SUM(days)", "start")).rowcount
+        conn.execute("DELETE FROM stats_rollup WHERE period = 'week' AND date < ?", (weekly_cutoff,))
+    conn.execute("PRAGMA optimize")
+    return weekly_rows, monthly_rows
+
+
+def _counts(conn):
+    return {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("stats", "stats_rollup", "stats_latest")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stats 时间序列降采样")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite 数据库路径")
+    parser.add_argument("--daily-days", type=int, default=DAILY_DAYS, help="日粒度记录保留的天数")
+    parser.add_argument("--weekly-days", type=int, default=WEEKLY_DAYS, help="周快照保留的天数，更早的合并成月快照")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="以该日期为基准计算保留窗口（默认今天）")
+    parser.add_argument("--vacuum", action="store_true", help="压缩后 VACUUM，把删掉的页还给文件系统")
+    args = parser.parse_args()
+
+    conn = init_db(args.db)
+    t0 = time.perf_counter()
+    before = _counts(conn)
+    weekly_rows, monthly_rows = compact(conn, args.daily_days, args.weekly_days, args.today)
+    if args.vacuum:
+        conn.execute("VACUUM")
+    after = _counts(conn)
+    conn.close()
+    print(
+        f"stats {before['stats']} -> {after['stats']} 行，stats_rollup {before['stats_rollup']} -> {after['stats_rollup']} 行"
+        f"（周 {weekly_rows}，月 {monthly_rows}），stats_latest {after['stats_latest']} 行，"
+        f"共 {time.perf_counter() - t0:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
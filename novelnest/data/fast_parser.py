@@ -0,0 +1,199 @@
+import re
+from lxml import etree
+
+# 详情页快速解析：lxml + 定点 XPath，结果与 NovelMindScrawl.parse_novel_detail（html.parser）逐字段一致
+# 对齐 BeautifulSoup 的取文本规则：
+#   - 只取普通文本节点，跳过注释、<script>/<style>/<template> 里的内容
+#   - 纯 ASCII 空白的文本节点折叠成 "\n"（含换行时）或 " "
+#   - libxml2 会把 \r\n 规范成 \n，而 html.parser 原样保留，解析前先把 \r 换成占位符再换回来
+
+PAGE_ENCODING = "gb18030"
+
+_CR = "\ue000"
+_ASCII_SPACES = " \n\t\x0c\r"
+_TEXT = 'text()[not(parent::script or parent::style or parent::template)]'
+_desc_text = etree.XPath(".//" + _TEXT)
+_SKIP_TAGS = frozenset(("script", "style", "template"))
+
+_CHAPTER_HREF = re.compile(r"novelid=\d+&chapterid=\d+")
+_FIRST_CHAPTER_HREF = re.compile(r"onebook\.php\?novelid=\d+&chapterid=\d+")
+_STATS = re.compile(
+    r"总书评数：(\d+).*?当前被收藏数：(\d+).*?营养液数：(\d+).*?文章积分：([\d,]+)", re.S
+)
+_CLICKS = re.compile(r"非V章节总点击数：(\d+)")
+_UPDATE_TIME = re.compile(r"最新更新[:：](\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+# "最新更新:" + 19 位时间
+_UPDATE_WINDOW = 24
+
+
+def decode_page(body: bytes):
+    """晋江页面固定按 GB18030 解码（GBK 的超集），不再对每个响应跑编码探测"""
+    return body.decode(PAGE_ENCODING, errors="replace")
+
+
+def _norm(s):
+    if _CR in s:
+        s = s.replace(_CR, "\r")
+    if not s.strip(_ASCII_SPACES):
+        return "\n" if "\n" in s else " "
+    return s
+
+
+def _get_text(el, separator="", strip=False):
+    """等价于 BeautifulSoup 的 Tag.get_text(separator, strip)"""
+    strings = (_norm(s) for s in _desc_text(el))
+    if strip:
+        strings = (s.strip() for s in strings)
+        strings = (s for s in strings if s)
+    return separator.join(strings)
+
+
+def _subtree_text(el):
+    """el 子树内的文本（含 el.tail），文档顺序"""
+    if not isinstance(el.tag, str):
+        # 注释、处理指令：本身的内容不算文本（iterwalk 也不接受它们），只有 tail 是
+        if el.tail:
+            yield el.tail
+        return
+    for event, sub in etree.iterwalk(el, events=("start", "end")):
+        if event == "start":
+            if isinstance(sub.tag, str) and sub.tag not in _SKIP_TAGS and sub.text:
+                yield sub.text
+        elif sub.tail:
+            yield sub.tail
+
+
+def _following(node):
+    """文档顺序上排在文本节点 node 之后的文本，按需逐个产出（不会一次展开整页）"""
+    el = node.getparent()
+    if node.is_text:
+        # node 是 el 的首个文本：先是 el 子树内其余文本，再是 el.tail
+        for child in el:
+            yield from _subtree_text(child)
+        if el.tail:
+            yield el.tail
+    # node 是 el.tail 时从 el 的后续兄弟开始
+    cur = el
+    while cur is not None:
+        for sib in cur.itersiblings():
+            yield from _subtree_text(sib)
+        cur = cur.getparent()
+        if cur is not None and cur.tail:
+            yield cur.tail
+
+
+def _text_from(node, start, n):
+    """从文本节点 node 的第 start 个字符起，沿文档顺序往后取至少 n 个字符"""
+    out = [_norm(node)[start:]]
+    size = len(out[0])
+    if size < n:
+        for s in _following(node):
+            s = _norm(s)
+            out.append(s)
+            size += len(s)
+            if size >= n:
+                break
+    return "".join(out)
+
+
+_nodes_containing = etree.XPath(f"//{_TEXT}[contains(., $needle)]")
+
+
+def parse_novel_detail(html: str):
+    """
+    解析单本小说的详情页，返回 (字段字典, 第一章免费章节的 href 或 None)。
+    字段字典与 NovelMindScrawl.parse_novel_detail 的结果相同。
+    """
+    data = {}
+    if "\r" in html:
+        html = html.replace("\r", _CR)
+    # etree.HTML 用线程内默认解析器，生成普通 _Element（不走 lxml.html 的逐节点类查找）
+    doc = etree.HTML(html) if html.strip() else None
+    if doc is None:
+        # 空页面：与 BeautifulSoup 一样当作没有任何内容
+        doc = etree.HTML("<html></html>")
+
+    # 1. 小说简介（文案）
+    intro = doc.xpath('//div[@id="novelintro"][@itemprop="description"]')
+    if intro:
+        data["intro"] = _get_text(intro[0], "\n", strip=True)
+
+    # 2. 主角/配角/其它信息：从第一次出现"主角："起往后 200 个字符
+    nodes = _nodes_containing(doc, needle="主角：")
+    if nodes:
+        node = nodes[0]
+        snippet = _text_from(node, _norm(node).find("主角："), 200)[:200]
+        data["main_chars"] = None
+        data["support_chars"] = None
+        data["other_info"] = None
+        for part in snippet.split("┃"):
+            part = part.strip()
+            if part.startswith("主角："):
+                data["main_chars"] = part.replace("主角：", "").strip()
+            elif part.startswith("配角："):
+                data["support_chars"] = part.replace("配角：", "").strip()
+            elif part.startswith("其它："):
+                data["other_info"] = part.replace("其它：", "").strip()
+
+    # 3. 基本信息列表（类型、视角、字数、出版、签约状态等）
+    info_ul = doc.xpath('//ul[@name="printright"]')
+    if info_ul:
+        for li in info_ul[0].iter("li"):
+            text = _get_text(li, strip=True)
+            if text.startswith("文章类型："):
+                data["category"] = text.replace("文章类型：", "")
+            elif text.startswith("作品视角："):
+                data["perspective"] = text.replace("作品视角：", "")
+            elif text.startswith("所属系列："):
+                data["series"] = text.replace("所属系列：", "")
+            elif text.startswith("文章进度："):
+                data["status"] = text.replace("文章进度：", "")
+            elif text.startswith("全文字数："):
+                num_str = "".join(filter(str.isdigit, text))
+                data["word_count"] = int(num_str) if num_str else None
+            elif text.startswith("版权转化："):
+                if "尚未出版" in text:
+                    data["publish_status"] = "尚未出版"
+                else:
+                    has_img = next(li.iter("img"), None) is not None
+                    data["publish_status"] = "已出版" if has_img else text.replace("版权转化：", "")
+            elif text.startswith("签约状态："):
+                font_tag = next(li.iter("font"), None)
+                if font_tag is not None:
+                    data["sign_status"] = _get_text(font_tag, strip=True)
+                else:
+                    data["sign_status"] = text.replace("签约状态：", "")
+
+    # 4. 底部统计数据（评论数、收藏数、营养液数、积分、非V点击等）
+    stats_div = doc.xpath('//div[@align="center"]')
+    if stats_div:
+        stats_text = _get_text(stats_div[0])
+        m = _STATS.search(stats_text)
+        if m:
+            data["review_count"] = int(m.group(1))
+            data["favorite_count"] = int(m.group(2))
+            data["nutrient_count"] = int(m.group(3))
+            score_str = m.group(4).replace(",", "")
+            data["score"] = int(score_str) if score_str.isdigit() else None
+        m2 = _CLICKS.search(stats_text)
+        if m2:
+            data["total_click_count"] = int(m2.group(1))
+
+    # 5. 最新更新时间：只看含"最新更新"的文本节点及其后少量文字
+    for node in _nodes_containing(doc, needle="最新更新"):
+        text = _norm(node)
+        start = text.find("最新更新")
+        m3 = None
+        while start != -1 and m3 is None:
+            m3 = _UPDATE_TIME.match(_text_from(node, start, _UPDATE_WINDOW))
+            start = text.find("最新更新", start + 1)
+        if m3:
+            data["last_update_time"] = m3.group(1)
+            break
+
+    # 章节数与第一章链接：只扫带 chapterid 的 href
+    hrefs = doc.xpath('//a[contains(@href, "chapterid=")]/@href')
+    data["chapter_count"] = sum(1 for h in hrefs if _CHAPTER_HREF.search(h))
+    first_chapter = next((h for h in hrefs if _FIRST_CHAPTER_HREF.search(h)), None)
+
+    return data, first_chapter
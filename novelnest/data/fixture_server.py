@@ -0,0 +1,63 @@
+import os
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, quote
+
+# 本地 fixture 服务器：把保存下来的晋江页面按原 URL 路径回放，用于离线测试爬虫
+# 页面文件名由 fixture_name(url) 决定，例如 onebook.php?novelid=1&chapterid=1
+#   -> onebook.php%3Fnovelid%3D1%26chapterid%3D1.html
+# 用法：python fixture_server.py --dir pages/ --port 8000
+#       python NovelMindScrawl.py --async --base-url http://127.0.0.1:8000/ --db /tmp/t.db
+
+
+def fixture_name(url: str):
+    """URL（或 path?query）对应的 fixture 文件名"""
+    parsed = urlparse(url)
+    name = parsed.path.lstrip("/")
+    if parsed.query:
+        name += "?" + parsed.query
+    return quote(name, safe="") + ".html"
+
+
+def make_handler(page_dir, latency=0.0):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            path = os.path.join(page_dir, fixture_name(self.path))
+            if not os.path.isfile(path):
+                body = b"not found"
+                self.send_response(404)
+                self.send_header("Content-Type", "text/plain")
+            else:
+                with open(path, "rb") as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=gb18030")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放已保存晋江页面的本地 HTTP 服务器")
+    parser.add_argument("--dir", required=True, help="fixture 页面目录")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求附加的延迟（秒），模拟网络往返")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.dir, args.latency))
+    print(f"Serving {args.dir} on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
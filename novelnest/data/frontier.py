@@ -0,0 +1,202 @@
+import json
+import hashlib
+from datetime import datetime, timedelta
+
+from NovelMindScrawl import BOOK_INSERT_SQL, STATS_INSERT_SQL, book_row, stats_row
+
+# 增量、可断点续抓：
+#   crawl_run      每次抓取一行，记录翻到第几页、已入队多少本；finished_at 为空表示上次中断
+#   crawl_frontier 每本书一行，记录抓取状态、上次抓取时间、内容哈希
+# 排行榜上的更新时间与库里一致的书不再抓详情页和第一章；内容哈希没变的书不重写 book 表
+# 读走 conn，写全部交给 writer.SQLiteWriter 的写库线程（按入队顺序分批提交）
+
+MAX_ATTEMPTS = 3
+
+
+def init_frontier(conn):
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crawl_run (
+            run_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at    TEXT,
+            finished_at   TEXT,
+            target_count  INTEGER,
+            last_page     INTEGER DEFAULT 0,
+            enqueued      INTEGER DEFAULT 0
+        )
+    """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crawl_frontier (
+            book_id           INTEGER PRIMARY KEY,
+            run_id            INTEGER,
+            state             TEXT,
+            rank_json         TEXT,
+            last_update_time  TEXT,
+            content_hash      TEXT,
+            last_fetched      TEXT,
+            attempts          INTEGER DEFAULT 0
+        )
+    """
+    )
+    conn.commit()
+
+
+def content_hash(row):
+    """book 表一行的内容哈希"""
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class CrawlRun:
+    def __init__(self, conn, writer, target_count, restart=False, force=False, max_age_days=None):
+        init_frontier(conn)
+        self.conn = conn
+        self.writer = writer
+        self.seen = set()
+        self.force = force
+        self.max_age_days = max_age_days
+        self.fetched = self.changed = self.skipped = self.failed = 0
+
+        cur = conn.cursor()
+        row = cur.execute(
+            "SELECT run_id, last_page, enqueued FROM crawl_run WHERE finished_at IS NULL "
+            "ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        if row and restart:
+            cur.execute("UPDATE crawl_run SET finished_at = ? WHERE finished_at IS NULL", (_now(),))
+            row = None
+        if row:
+            # 上次中断：沿用同一个 run，从断点页继续
+            self.run_id, self.last_page, self.enqueued = row
+            self.resumed = True
+        else:
+            cur.execute(
+                "INSERT INTO crawl_run (started_at, target_count) VALUES (?, ?)", (_now(), target_count)
+            )
+            self.run_id, self.last_page, self.enqueued = cur.lastrowid, 0, 0
+            self.resumed = False
+        conn.commit()
+
+    def _unchanged(self, novel, stored_time, last_fetched):
+        if self.force or not novel.get("last_update_time") or not stored_time:
+            return False
+        # 排行榜上的时间可能只到分钟
+        if not stored_time.startswith(novel["last_update_time"]):
+            return False
+        if self.max_age_days is not None:
+            if not last_fetched:
+                return False
+            age = datetime.now() - datetime.fromisoformat(last_fetched)
+            if age > timedelta(days=self.max_age_days):
+                return False
+        return True
+
+    def plan_page(self, page, novels):
+        """登记一页排行榜上的书，返回需要抓详情页的那些；同时推进断点"""
+        cur = self.conn.cursor()
+        to_fetch = []
+        for novel in novels:
+            book_id = novel["novel_id"]
+            known = cur.execute(
+                """
+                SELECT b.last_update_time, f.last_fetched, f.run_id
+                FROM book b LEFT JOIN crawl_frontier f ON f.book_id = b.book_id
+                WHERE b.book_id = ?
+                """,
+                (book_id,),
+            ).fetchone()
+            stored_time, last_fetched, run_id = known or (None, None, None)
+            if run_id == self.run_id or book_id in self.seen:
+                # 同一轮里排行榜翻页时重复出现的书
+                continue
+            self.seen.add(book_id)
+            state = "unchanged" if self._unchanged(novel, stored_time, last_fetched) else "pending"
+            self.writer.execute(
+                """
+                INSERT INTO crawl_frontier (book_id, run_id, state, rank_json, attempts)
+                VALUES (?, ?, ?, ?, 0)
+                ON CONFLICT(book_id) DO UPDATE SET
+                    run_id = excluded.run_id, state = excluded.state,
+                    rank_json = excluded.rank_json, attempts = 0
+                """,
+                (book_id, self.run_id, state, json.dumps(novel, ensure_ascii=False)),
+            )
+            if state == "pending":
+                to_fetch.append(novel)
+            else:
+                self.skipped += 1
+        self.last_page = page
+        self.enqueued += len(novels)
+        self.writer.execute(
+            "UPDATE crawl_run SET last_page = ?, enqueued = ? WHERE run_id = ?",
+            (self.last_page, self.enqueued, self.run_id),
+        )
+        return to_fetch
+
+    def pending(self):
+        """本轮已登记但还没抓完（或失败次数未满）的书，用于断点续抓"""
+        rows = self.conn.execute(
+            """
+            SELECT rank_json FROM crawl_frontier
+            WHERE run_id = ? AND (state = 'pending' OR (state = 'failed' AND attempts < ?))
+            ORDER BY book_id
+            """,
+            (self.run_id, MAX_ATTEMPTS),
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def cached_chapter(self, book_id, last_update_time):
+        """书没有更新时直接复用库里的第一章前 300 字"""
+        if self.force or not last_update_time:
+            return None
+        row = self.conn.execute(
+            "SELECT first_300_text FROM book WHERE book_id = ? AND last_update_time = ?",
+            (book_id, last_update_time),
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, novel, detail, crawl_date=None):
+        """写入一本书的抓取结果：内容有变化才重写 book，stats 每次都追加"""
+        row = book_row(novel, detail)
+        digest = content_hash(row)
+        stored = self.conn.execute(
+            "SELECT content_hash FROM crawl_frontier WHERE book_id = ?", (novel["novel_id"],)
+        ).fetchone()
+        changed = not stored or stored[0] != digest
+        if changed:
+            self.writer.execute(BOOK_INSERT_SQL, row)
+            self.changed += 1
+        self.writer.execute(STATS_INSERT_SQL, stats_row(novel, detail, crawl_date))
+        self.writer.execute(
+            """
+            UPDATE crawl_frontier
+            SET state = 'done', last_update_time = ?, content_hash = ?, last_fetched = ?, attempts = attempts + 1
+            WHERE book_id = ?
+            """,
+            (detail.get("last_update_time"), digest, _now(), novel["novel_id"]),
+        )
+        self.fetched += 1
+        return changed
+
+    def fail(self, book_id):
+        self.writer.execute(
+            "UPDATE crawl_frontier SET state = 'failed', attempts = attempts + 1 WHERE book_id = ?",
+            (book_id,),
+        )
+        self.failed += 1
+
+    def finish(self):
+        self.writer.execute("UPDATE crawl_run SET finished_at = ? WHERE run_id = ?", (_now(), self.run_id))
+        self.writer.flush()
+
+    def summary(self):
+        return (
+            f"排行榜登记{self.enqueued}本：抓取{self.fetched}本（内容有变化{self.changed}本），"
+            f"未更新跳过{self.skipped}本，失败{self.failed}本。"
+        )
@@ -0,0 +1,172 @@
+import os
+import zlib
+import sqlite3
+import hashlib
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # 未安装 zstandard 时退回 zlib（gzip 同款 DEFLATE）
+    zstandard = None
+
+# 原始页面归档：内容寻址 + 压缩分段
+#   segments/seg-000001.bin  追加写入的压缩块，每个页面独立压缩，可随机读取
+#   index.db  blobs(digest -> 段号、偏移、长度、编码)  fetches((url, 抓取日期) -> digest)
+# 同一内容只存一份（未更新的书每天抓到的详情页大多相同）；解析逻辑改了以后可离线重跑，不用再请求晋江
+
+SEGMENT_BYTES = 64 << 20
+COMMIT_EVERY = 200
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+
+
+def _compress(body):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return "zlib", zlib.compress(body, ZLIB_LEVEL)
+
+
+def _decompress(codec, blob):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("归档里有 zstd 压缩的页面，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+class PageStore:
+    def __init__(self, root, readonly=False):
+        self.root = root
+        self.readonly = readonly
+        self.seg_dir = os.path.join(root, "segments")
+        if not readonly:
+            os.makedirs(self.seg_dir, exist_ok=True)
+        path = os.path.join(root, "index.db")
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    digest    TEXT PRIMARY KEY,
+                    segment   INTEGER,
+                    offset    INTEGER,
+                    length    INTEGER,
+                    raw_size  INTEGER,
+                    codec     TEXT
+                )
+            """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fetches (
+                    url         TEXT,
+                    fetch_date  TEXT,
+                    fetched_at  TEXT,
+                    digest      TEXT,
+                    PRIMARY KEY (url, fetch_date)
+                )
+            """
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_fetches_date ON fetches(fetch_date)")
+            self.conn.commit()
+        self._pending = 0
+        self._segment = None
+        self._readers = {}
+
+    # ---------- 写 ----------
+
+    def _open_segment(self):
+        row = self.conn.execute("SELECT MAX(segment) FROM blobs").fetchone()
+        seg = row[0] or 1
+        self._segment = (seg, open(self._segment_path(seg), "ab"))
+
+    def _segment_path(self, seg):
+        return os.path.join(self.seg_dir, f"seg-{seg:06d}.bin")
+
+    def put(self, url, body: bytes, fetched_at=None):
+        """归档一次抓取，返回内容摘要；内容已存在时只记一条抓取记录"""
+        fetched_at = fetched_at or datetime.now()
+        digest = hashlib.sha256(body).hexdigest()
+        known = self.conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if not known:
+            if self._segment is None:
+                self._open_segment()
+            seg, f = self._segment
+            if f.tell() >= SEGMENT_BYTES:
+                f.close()
+                seg, f = seg + 1, open(self._segment_path(seg + 1), "ab")
+                self._segment = (seg, f)
+            codec, blob = _compress(body)
+            offset = f.tell()
+            f.write(blob)
+            f.flush()
+            self.conn.execute(
+                "INSERT INTO blobs (digest, segment, offset, length, raw_size, codec) VALUES (?,?,?,?,?,?)",
+                (digest, seg, offset, len(blob), len(body), codec),
+            )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fetches (url, fetch_date, fetched_at, digest) VALUES (?,?,?,?)",
+            (url, fetched_at.date().isoformat(), fetched_at.isoformat(timespec="seconds"), digest),
+        )
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.flush()
+        return digest
+
+    def flush(self):
+        if self._segment is not None:
+            os.fsync(self._segment[1].fileno())
+        self.conn.commit()
+        self._pending = 0
+
+    # ---------- 读 ----------
+
+    def get_blob(self, digest):
+        row = self.conn.execute(
+            "SELECT segment, offset, length, codec FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        seg, offset, length, codec = row
+        f = self._readers.get(seg)
+        if f is None:
+            f = self._readers[seg] = open(self._segment_path(seg), "rb")
+        f.seek(offset)
+        return _decompress(codec, f.read(length))
+
+    def get(self, url, fetch_date=None):
+        """某个 URL 在 fetch_date 当天或之前最近一次抓到的内容"""
+        row = self.conn.execute(
+            "SELECT digest FROM fetches WHERE url = ? AND fetch_date <= ? ORDER BY fetch_date DESC LIMIT 1",
+            (url, fetch_date or "9999-12-31"),
+        ).fetchone()
+        return self.get_blob(row[0]) if row else None
+
+    def fetches(self, fetch_dates=None):
+        """(url, 抓取日期, digest) 列表，按日期、URL 排序"""
+        sql = "SELECT url, fetch_date, digest FROM fetches"
+        params = ()
+        if fetch_dates:
+            sql += f" WHERE fetch_date IN ({','.join('?' * len(fetch_dates))})"
+            params = tuple(fetch_dates)
+        return self.conn.execute(sql + " ORDER BY fetch_date, url", params).fetchall()
+
+    def stats(self):
+        n_fetches = self.conn.execute("SELECT COUNT(*) FROM fetches").fetchone()[0]
+        n_blobs, raw, stored = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(length), 0) FROM blobs"
+        ).fetchone()
+        return {"fetches": n_fetches, "blobs": n_blobs, "raw_bytes": raw, "stored_bytes": stored}
+
+    def close(self):
+        if not self.readonly:
+            self.flush()
+        if self._segment is not None:
+            self._segment[1].close()
+        for f in self._readers.values():
+            f.close()
+        self.conn.close()
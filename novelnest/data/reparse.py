@@ -0,0 +1,143 @@
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+import fast_parser
+from fast_parser import decode_page
+from frontier import init_frontier
+from NovelMindScrawl import (
+    BOOK_INSERT_SQL,
+    STATS_INSERT_SQL,
+    book_row,
+    stats_row,
+    chapter_url_from_href,
+    init_db,
+    parse_chapter_text,
+    parse_rank_page,
+)
+from page_store import PageStore
+
+# 离线重解析：只读原始页面归档，多进程解析后重建 book / stats 表，不发任何网络请求
+#   - 同一内容（digest）只解析一次，未更新的书每天抓到的相同详情页不重复解析
+#   - 每个抓取日期按 排行页 -> 详情页 -> 第一章 还原当天的抓取结果
+#   - book 取每本书最近一次详情页；stats 每个 (书, 日期) 一行，覆盖库里同一天的旧记录
+# 归档没有覆盖到的书和日期保持不变
+
+_store = None
+
+
+def classify(url):
+    """按 URL 判断页面类型：rank / detail / chapter，其它返回 None"""
+    parsed = urlparse(url)
+    if parsed.path.endswith("bookbase.php"):
+        return "rank"
+    if "onebook" in parsed.path:
+        return "chapter" if "chapterid" in parse_qs(parsed.query) else "detail"
+    return None
+
+
+def _ids(url):
+    query = parse_qs(urlparse(url).query)
+    novel_id = int(query["novelid"][0]) if query.get("novelid") else None
+    chapter_id = int(query["chapterid"][0]) if query.get("chapterid") else None
+    return novel_id, chapter_id
+
+
+def _init_worker(store_dir):
+    global _store
+    _store = PageStore(store_dir, readonly=True)
+
+
+def _parse(task):
+    kind, digest, base_url = task
+    html = decode_page(_store.get_blob(digest))
+    if kind == "rank":
+        return parse_rank_page(html, base_url)
+    if kind == "detail":
+        return fast_parser.parse_novel_detail(html)
+    return parse_chapter_text(html)
+
+
+def _fallback_novels(conn):
+    """归档里缺排行页时，用 crawl_frontier 登记的排行榜概要或已有 book 行补上书名/作者/标签"""
+    novels = {}
+    for book_id, title, author, intro, tags in conn.execute(
+        "SELECT book_id, title, author, intro, tags FROM book"
+    ):
+        novels[book_id] = {"novel_id": book_id, "novel_name": title, "author": author, "intro": intro, "tags": tags}
+    for (rank_json,) in conn.execute("SELECT rank_json FROM crawl_frontier WHERE rank_json IS NOT NULL"):
+        novel = json.loads(rank_json)
+        novels[novel["novel_id"]] = novel
+    return novels
+
+
+def reparse(db_path, store_dir, workers=4, fetch_dates=None):
+    t0 = time.perf_counter()
+    store = PageStore(store_dir, readonly=True)
+    fetches = store.fetches(fetch_dates)
+    store.close()
+
+    # 1. 去重后并行解析
+    tasks = {}
+    for url, _, digest in fetches:
+        kind = classify(url)
+        if kind and (kind, digest) not in tasks:
+            parsed = urlparse(url)
+            tasks[(kind, digest)] = (kind, digest, f"{parsed.scheme}://{parsed.netloc}/")
+    keys = list(tasks)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(store_dir,)) as pool:
+        results = dict(zip(keys, pool.map(_parse, [tasks[k] for k in keys], chunksize=32)))
+    t_parse = time.perf_counter() - t0
+
+    # 2. 按日期还原每天的抓取结果
+    by_date = defaultdict(lambda: {"rank": [], "detail": [], "chapter": []})
+    for url, fetch_date, digest in fetches:
+        kind = classify(url)
+        if kind:
+            by_date[fetch_date][kind].append((url, results[(kind, digest)]))
+
+    conn = init_db(db_path)
+    init_frontier(conn)
+    novels = _fallback_novels(conn)
+    chapters = {}
+    latest = {}
+    stats_rows = []
+    for fetch_date in sorted(by_date):
+        day = by_date[fetch_date]
+        for _, page_novels in day["rank"]:
+            for novel in page_novels:
+                novels[novel["novel_id"]] = novel
+        for url, text in day["chapter"]:
+            chapters[_ids(url)] = text
+        for url, (data, href) in day["detail"]:
+            novel_id = _ids(url)[0]
+            if novel_id is None:
+                continue
+            novel = novels.get(novel_id) or {"novel_id": novel_id, "novel_name": None, "author": None}
+            detail = dict(data)
+            chapter_url = chapter_url_from_href(href)
+            if chapter_url is None:
+                detail["first_300_text"] = None
+            elif _ids(chapter_url) in chapters:
+                detail["first_300_text"] = chapters[_ids(chapter_url)]
+            else:
+                # 当天没抓章节页（书没更新时复用了库里的），沿用库里的值
+                row = conn.execute("SELECT first_300_text FROM book WHERE book_id = ?", (novel_id,)).fetchone()
+                detail["first_300_text"] = row[0] if row else None
+            latest[novel_id] = book_row(novel, detail)
+            stats_rows.append(stats_row(novel, detail, fetch_date))
+
+    # 3. 单事务写回
+    with conn:
+        conn.executemany("DELETE FROM stats WHERE book_id = ? AND date = ?", [(r[0], r[1]) for r in stats_rows])
+        conn.executemany(STATS_INSERT_SQL, stats_rows)
+        conn.executemany(BOOK_INSERT_SQL, list(latest.values()))
+    conn.close()
+
+    elapsed = time.perf_counter() - t0
+    print(
+        f"重解析 {len(fetches)} 次抓取（去重后 {len(tasks)} 个页面，解析 {t_parse:.1f}s，{len(tasks) / max(t_parse, 1e-9):.0f} 页/秒）："
+        f"book {len(latest)} 行，stats {len(stats_rows)} 行，共 {elapsed:.1f}s"
+    )
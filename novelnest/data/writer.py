@@ -0,0 +1,103 @@
+import time
+import queue
+import sqlite3
+import threading
+
+# 爬虫专用写库线程：抓取/解析线程只把 (sql, 参数) 放进队列，
+# 写线程攒够一批后在同一个事务里 executemany，连续相同的 SQL 合并成一次调用。
+# 队列先进先出、按批整体提交，崩溃时库里总是某个前缀的完整状态，断点续抓不受影响。
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+
+def connect(db_path, check_same_thread=True):
+    """WAL 模式连接：写事务进行中读者（API、notebook）照常读取，不会被锁住"""
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL 下 NORMAL 只在检查点时 fsync，掉电最多丢最后几个事务，不会损坏数据库
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    def __init__(self, db_path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, bounded=True):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # 有界队列让抓取线程在写库跟不上时等一等；事件循环线程里入队不能阻塞，用无界队列（bounded=False）
+        self.queue = queue.Queue(maxsize=batch_size * 4 if bounded else 0)
+        self.error = None
+        self.batches = self.rows = 0
+        self.thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self.thread.start()
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError("写库线程出错") from self.error
+
+    def execute(self, sql, params=()):
+        self._check()
+        self.queue.put((sql, params), block=self.queue.maxsize > 0)
+
+    def flush(self):
+        """阻塞到此前放入队列的写操作全部提交"""
+        self._check()
+        marker = _Flush()
+        self.queue.put(marker)
+        marker.done.wait()
+        self._check()
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+        self._check()
+
+    def _write(self, conn, batch):
+        # 连续相同的 SQL 合并为一次 executemany，整批一个事务
+        with conn:
+            start = 0
+            for i in range(1, len(batch) + 1):
+                if i == len(batch) or batch[i][0] != batch[start][0]:
+                    conn.executemany(batch[start][0], [params for _, params in batch[start:i]])
+                    start = i
+        self.batches += 1
+        self.rows += len(batch)
+
+    def _run(self):
+        conn = connect(self.db_path)
+        batch, waiters, stop = [], [], False
+        try:
+            while not stop:
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    if isinstance(item, _Flush):
+                        waiters.append(item)
+                        break
+                    batch.append(item)
+                if batch and self.error is None:
+                    try:
+                        self._write(conn, batch)
+                    except sqlite3.Error as e:
+                        self.error = e
+                batch = []
+                for w in waiters:
+                    w.done.set()
+                waiters = []
+        finally:
+            conn.close()
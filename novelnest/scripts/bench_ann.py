@@ -0,0 +1,56 @@
+import sys, time, argparse
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+INDEX_DIR = ROOT / 'models' / 'index'
+sys.path.insert(0, str(ROOT / 'app'))
+from retrieval import search
+from ann import IVFIndex
+from store import load_index
+from bench_topk import synth_matrix
+
+# ANN 召回率与延迟报告：对比精确检索，扫描不同 nprobe
+# 用法：python scripts/bench_ann.py                 # 使用 models/index 下的索引
+#       python scripts/bench_ann.py --synthetic 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--synthetic', type=int, default=None, help='用合成矩阵代替 models/，指定行数')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        X = synth_matrix(args.synthetic, 20000, 60)
+        t0 = time.perf_counter()
+        index = IVFIndex.build(X)
+        print(f'build: {time.perf_counter() - t0:.1f}s')
+    else:
+        loaded = load_index(INDEX_DIR)
+        X, index = loaded.tfidf_matrix, loaded.ann
+        if index is None:
+            sys.exit('models/index 下没有 ANN 索引，请先运行 scripts/build_index.py')
+
+    rng = np.random.default_rng(0)
+    qids = rng.choice(X.shape[0], size=min(args.queries, X.shape[0]), replace=False)
+    queries = [X[i] for i in qids]
+
+    t0 = time.perf_counter()
+    truth = [set(search(q, X, args.k, exclude=i)[0]) for q, i in zip(queries, qids)]
+    exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+    print(f'rows={X.shape[0]} k={args.k} exact={exact_ms:.2f}ms/query')
+    print(f"{'nprobe':>6} {'recall@k':>9} {'ms/query':>9}")
+    for nprobe in args.nprobe:
+        t0 = time.perf_counter()
+        found = [index.search(q, X, args.k, exclude=i, nprobe=nprobe)[0] for q, i in zip(queries, qids)]
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        recall = np.mean([len(truth[j] & set(f)) / max(1, len(truth[j])) for j, f in enumerate(found)])
+        print(f'{nprobe:>6} {recall:>9.3f} {ms:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import sys, time, argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from flask import Flask, jsonify
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'app'))
+from columns import StringColumn
+from store import BookTable
+from serialize import results_json
+
+# 响应组装微基准：逐行 books.iloc + jsonify  vs  列式 gather + 批量序列化
+# 用法：python scripts/bench_assembly.py --rows 100000 --k 10 50 200
+
+
+def synth_books(n, seed=0):
+    rng = np.random.default_rng(seed)
+    chars = np.array(list('天涯客镇魂六爻杀破狼长安风月京华故梦霜刃未曾试星河入梦明月照归途'))
+    title = [''.join(rng.choice(chars, rng.integers(2, 12))) for _ in range(n)]
+    author = [''.join(rng.choice(chars, rng.integers(2, 5))) for _ in range(n)]
+    return pd.DataFrame({'id': rng.integers(1, 10_000_000, n), 'title': title, 'author': author})
+
+
+def old_assembly(books, top_idx, scores, whys):
+    results = []
+    for i, score, why in zip(top_idx, scores, whys):
+        results.append({
+            'book_id': int(books.iloc[i]['id']),
+            'title': books.iloc[i]['title'],
+            'author': books.iloc[i]['author'],
+            'score': float(score),
+            'why': why,
+        })
+    return jsonify(results).get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--k', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    df = synth_books(args.rows)
+    table = BookTable(
+        df['id'].to_numpy(dtype=np.int64),
+        StringColumn.from_strings(df['title']),
+        StringColumn.from_strings(df['author']),
+        StringColumn.from_json_strings(df['title']),
+        StringColumn.from_json_strings(df['author']),
+    )
+    rng = np.random.default_rng(1)
+    app = Flask(__name__)
+
+    print(f"{'k':>5} {'old(ms)':>9} {'new(ms)':>9} {'speedup':>8}")
+    with app.app_context():
+        for k in args.k:
+            top_idx = rng.choice(args.rows, size=k, replace=False)
+            scores = rng.random(k)
+            whys = [['江湖', '强强']] * k
+            timings = []
+            for fn, books in ((old_assembly, df), (results_json, table)):
+                t0 = time.perf_counter()
+                for _ in range(args.repeat):
+                    fn(books, top_idx, scores, whys)
+                timings.append((time.perf_counter() - t0) * 1000 / args.repeat)
+            print(f'{k:>5} {timings[0]:>9.3f} {timings[1]:>9.3f} {timings[0] / timings[1]:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
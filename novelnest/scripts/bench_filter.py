@@ -0,0 +1,68 @@
+import sys, time, argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'app'))
+from filters import FilterIndex
+from retrieval import search
+from bench_topk import synth_matrix
+
+# 过滤检索的延迟：不过滤 vs 不同选择度的过滤条件（位图求掩码 + Top-K 前置过滤）
+# 同时与“先取 Top-K 再后过滤”对比返回条数，后者在条件严格时拿不满 K 条
+# 用法：python scripts/bench_filter.py --rows 1000000
+
+
+def synth_books(n, seed=0):
+    rng = np.random.default_rng(seed)
+    cats = [f'原创-{a}-{b}-{c}' for a in ('纯爱', '言情') for b in ('古色古香', '架空历史', '近代现代', '幻想未来')
+            for c in ('爱情', '剧情', '仙侠', '悬疑')]
+    return pd.DataFrame({
+        'category': rng.choice(cats, n),
+        'status': rng.choice(['完结', '连载'], n, p=[0.7, 0.3]),
+        'perspective': rng.choice(['女主', '主受', '主攻', '互攻', '不明'], n),
+        'sign_status': rng.choice(['已签约', '未签约'], n, p=[0.9, 0.1]),
+        'word_count': rng.lognormal(12.5, 0.8, n).astype(np.int64),
+    })
+
+
+FILTERS = [
+    ('none', None),
+    ('完结', {'status': '完结'}),
+    ('古色古香 <50万字', {'category': '古色古香', 'word_count': {'max': 500000}}),
+    ('仙侠+连载+女主+未签约', {'category': ['仙侠'], 'status': '连载', 'perspective': '女主', 'sign_status': '未签约'}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--dims', type=int, default=20000)
+    parser.add_argument('--nnz', type=int, default=60)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    X = synth_matrix(args.rows, args.dims, args.nnz)
+    index = FilterIndex.build(synth_books(args.rows))
+    queries = [X[i] for i in range(0, args.rows, max(1, args.rows // args.repeat))][: args.repeat]
+    print(f"{'filter':<22} {'selectivity':>11} {'mask(ms)':>9} {'search(ms)':>10} {'pre-filter k':>12} {'post-filter k':>13}")
+    for name, cond in FILTERS:
+        t0 = time.perf_counter()
+        mask = index.mask(cond) if cond else None
+        t_mask = (time.perf_counter() - t0) * 1000
+        times, pre, post = [], [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            top_idx, _ = search(q, X, args.k, mask=mask)
+            times.append((time.perf_counter() - t0) * 1000)
+            pre.append(len(top_idx))
+            plain, _ = search(q, X, args.k)
+            post.append(len(plain) if mask is None else int(mask[plain].sum()))
+        sel = 1.0 if mask is None else mask.mean()
+        print(f'{name:<22} {sel:>11.3f} {t_mask:>9.2f} {np.median(times):>10.2f} {np.mean(pre):>12.1f} {np.mean(post):>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
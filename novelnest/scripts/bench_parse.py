@@ -0,0 +1,75 @@
+import os, re, sys, time, argparse
+from pathlib import Path
+from urllib.parse import unquote
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'data'))
+from NovelMindScrawl import parse_novel_detail
+from fast_parser import decode_page, parse_novel_detail as fast_parse_novel_detail
+
+# 详情页解析对比：html.parser 原版 vs lxml 快速版
+# 先逐页核对两者结果完全一致（字段字典 + 第一章链接），再分别测吞吐（页/秒）
+# 页面目录用 data/fixture_server.py 的文件命名规则，只取详情页 onebook.php?novelid=N
+# 用法：python scripts/bench_parse.py --pages /path/to/pages --repeat 3
+
+DETAIL_PAGE = re.compile(r'^onebook\.php\?novelid=\d+\.html$')
+
+
+def load_pages(page_dir):
+    pages = []
+    for name in sorted(os.listdir(page_dir)):
+        if DETAIL_PAGE.match(unquote(name)):
+            with open(os.path.join(page_dir, name), 'rb') as f:
+                pages.append((name, decode_page(f.read())))
+    return pages
+
+
+def slow(html):
+    data, soup = parse_novel_detail(html)
+    link = soup.find('a', href=re.compile(r'onebook\.php\?novelid=\d+&chapterid=\d+'))
+    return data, link.get('href') if link else None
+
+
+def check(pages):
+    mismatches = 0
+    for name, html in pages:
+        expected, got = slow(html), fast_parse_novel_detail(html)
+        if expected != got:
+            mismatches += 1
+            keys = sorted(k for k in set(expected[0]) | set(got[0]) if expected[0].get(k) != got[0].get(k))
+            print(f'MISMATCH {unquote(name)}: fields={keys} href={expected[1]!r} vs {got[1]!r}')
+    return mismatches
+
+
+def throughput(fn, pages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, html in pages:
+            fn(html)
+        best = min(best, time.perf_counter() - t0)
+    return len(pages) / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', required=True, help='保存的页面目录（fixture 命名）')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        sys.exit(f'{args.pages} 下没有详情页')
+    mismatches = check(pages)
+    print(f'{len(pages)} pages checked, {mismatches} mismatches')
+
+    slow_pps = throughput(parse_novel_detail, pages, args.repeat)
+    fast_pps = throughput(fast_parse_novel_detail, pages, args.repeat)
+    print(f"{'parser':<14} {'pages/sec':>10}")
+    print(f"{'html.parser':<14} {slow_pps:>10.1f}")
+    print(f"{'lxml+xpath':<14} {fast_pps:>10.1f}   ({fast_pps / slow_pps:.1f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
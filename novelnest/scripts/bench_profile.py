@@ -0,0 +1,72 @@
+import sys, time, argparse, tempfile
+import numpy as np
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'app'))
+from profiles import ACTIONS, ProfileStore
+from retrieval import search
+from bench_topk import synth_matrix
+
+# 用户画像的在线更新吞吐与推荐延迟：
+#   feedback   每条事件只累加书向量的非零项，报告 事件/秒（按 --batch 条一批调用）
+#   flush      脏画像批量写回 SQLite 的耗时
+#   recommend  画像查询向量 + 已读位图 + Top-K 的单次延迟
+# 用法：python scripts/bench_profile.py --rows 100000 --users 1000 --events 50000
+
+
+def synth_index(rows, dims, nnz):
+    X = synth_matrix(rows, dims, nnz)
+    names = np.array([f't{i}' for i in range(dims)])
+    return SimpleNamespace(
+        meta={'version': 'bench'}, tfidf_matrix=X, feature_names=names,
+        vectorizer=SimpleNamespace(vocabulary={t: i for i, t in enumerate(names.tolist())}),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--dims', type=int, default=20000)
+    parser.add_argument('--nnz', type=int, default=60)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=50_000)
+    parser.add_argument('--batch', type=int, default=20)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    index = synth_index(args.rows, args.dims, args.nnz)
+    rng = np.random.default_rng(0)
+    users = rng.integers(0, args.users, args.events)
+    books = rng.integers(0, args.rows, args.events)
+    actions = rng.choice(list(a for a in ACTIONS if a != 'questionnaire'), args.events)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProfileStore(str(Path(tmp) / 'profiles.db'), flush_interval=0)
+        t0 = time.perf_counter()
+        for start in range(0, args.events, args.batch):
+            for u in np.unique(users[start:start + args.batch]):
+                sel = np.flatnonzero(users[start:start + args.batch] == u) + start
+                store.feedback(f'user{u}', [(actions[i], int(books[i]), index.tfidf_matrix[int(books[i])]) for i in sel],
+                               index)
+        t_feedback = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        flushed = store.flush()
+        t_flush = time.perf_counter() - t0
+
+        times = []
+        for u in range(min(args.users, 200)):
+            t0 = time.perf_counter()
+            q_vec, read_ids, _ = store.query(f'user{u}', index, 8)
+            mask = np.ones(args.rows, dtype=bool)
+            mask[read_ids] = False
+            search(q_vec, index.tfidf_matrix, args.k, mask=mask)
+            times.append((time.perf_counter() - t0) * 1000)
+
+    print(f'feedback   {args.events} events / {args.users} users: {args.events / t_feedback:,.0f} events/s')
+    print(f'flush      {flushed} profiles: {t_flush * 1000:.1f} ms')
+    print(f'recommend  p50 {np.percentile(times, 50):.2f} ms  p99 {np.percentile(times, 99):.2f} ms ({args.rows} rows)')
+
+
+if __name__ == '__main__':
+    main()
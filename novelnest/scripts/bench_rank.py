@@ -0,0 +1,48 @@
+import sys, time, argparse
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'app'))
+from ranking import FEATURES, OVERSAMPLE, WEIGHTS, blend
+
+# 融合重排的额外开销：在 OVERSAMPLE*K 个候选上做一次向量化打分 + 局部 Top-K
+# 特征数组为 mmap 同款的 float32 (rows, len(FEATURES))，候选行号随机分布（最坏的访存情况）
+# 用法：python scripts/bench_rank.py --rows 1000000 --k 10 50 200
+
+
+def synth_features(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    out = np.empty((n_rows, len(FEATURES)), dtype=np.float32)
+    out[:, 0] = rng.random(n_rows)
+    out[:, 1] = rng.random(n_rows)
+    out[:, 2] = 20000 - rng.exponential(60, n_rows)
+    out[:, 3] = rng.random(n_rows) < 0.6
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--k', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    features = synth_features(args.rows)
+    print(f"{'k':>5} {'candidates':>11} {'p50(us)':>9} {'p99(us)':>9}")
+    for k in args.k:
+        n = k * OVERSAMPLE
+        times = []
+        for _ in range(args.repeat):
+            cand = rng.choice(args.rows, n, replace=False)
+            sims = np.sort(rng.random(n))[::-1]
+            t0 = time.perf_counter()
+            blend(cand, sims, features, WEIGHTS, k, 20000.0)
+            times.append((time.perf_counter() - t0) * 1e6)
+        p50, p99 = np.percentile(times, [50, 99])
+        print(f'{k:>5} {n:>11} {p50:>9.1f} {p99:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
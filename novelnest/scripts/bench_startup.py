@@ -0,0 +1,43 @@
+import os, sys, json, argparse, subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# 启动到首条查询的延迟：在全新进程中导入 api（加载索引 + jieba 词典），
+# 然后通过 Flask 测试客户端依次发出首条与第二条 similar_by_text 查询
+# 用法：python scripts/bench_startup.py --runs 5
+
+PROBE = r'''
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+import api
+t1 = time.perf_counter()
+client = api.app.test_client()
+client.post('/api/similar_by_text', json={{'text': {text!r}, 'k': 10}})
+t2 = time.perf_counter()
+client.post('/api/similar_by_text', json={{'text': {text!r} + '，群像', 'k': 10}})
+t3 = time.perf_counter()
+print(json.dumps({{'startup_ms': (t1 - t0) * 1000, 'first_query_ms': (t2 - t1) * 1000, 'second_query_ms': (t3 - t2) * 1000}}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--text', default='古言权谋，女主成长，群像，文风细腻')
+    args = parser.parse_args()
+
+    code = PROBE.format(app_dir=str(ROOT / 'app'), text=args.text)
+    rows = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                             env=dict(os.environ, CACHE_DB=''))
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(f"{'run':>4} {'startup(ms)':>12} {'1st query(ms)':>14} {'2nd query(ms)':>14}")
+    for i, r in enumerate(rows, 1):
+        print(f"{i:>4} {r['startup_ms']:>12.1f} {r['first_query_ms']:>14.1f} {r['second_query_ms']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
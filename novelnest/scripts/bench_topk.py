@@ -0,0 +1,63 @@
+import sys, time, argparse
+import numpy as np
+import scipy.sparse as sp
+from pathlib import Path
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'app'))
+from retrieval import search
+
+# 对比旧实现（cosine_similarity + 全量 argsort）与局部 Top-K 的查询延迟
+# 用法：python scripts/bench_topk.py --rows 10000 100000 1000000
+
+
+def synth_matrix(n_rows, n_dims, nnz_per_row, seed=0):
+    rng = np.random.default_rng(seed)
+    indptr = np.arange(n_rows + 1, dtype=np.int64) * nnz_per_row
+    # Zipf 分布的词频更接近真实语料
+    indices = (rng.zipf(1.3, n_rows * nnz_per_row) - 1) % n_dims
+    data = rng.random(n_rows * nnz_per_row).astype(np.float64)
+    X = sp.csr_matrix((data, indices.astype(np.int32), indptr), shape=(n_rows, n_dims))
+    X.sum_duplicates()
+    return normalize(X)
+
+
+def old_search(q_vec, X, k):
+    sims = cosine_similarity(q_vec, X).ravel()
+    return sims.argsort()[::-1][:k], sims
+
+
+def elapsed_ms(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--dims', type=int, default=20000)
+    parser.add_argument('--nnz', type=int, default=60, help='每行非零词数')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'old(ms)':>10} {'new(ms)':>10} {'speedup':>8}  same_rank")
+    for n in args.rows:
+        X = synth_matrix(n, args.dims, args.nnz)
+        queries = [X[i] for i in range(0, n, max(1, n // args.repeat))][: args.repeat]
+        same = True
+        for q in queries:
+            old_idx, old_sims = old_search(q, X, args.k)
+            new_idx, _ = search(q, X, args.k)
+            # 旧实现的同分次序不稳定，按分数比较排名
+            same &= np.allclose(old_sims[old_idx], old_sims[new_idx])
+        old_ms = elapsed_ms(lambda: [old_search(q, X, args.k) for q in queries]) / len(queries)
+        new_ms = elapsed_ms(lambda: [search(q, X, args.k) for q in queries]) / len(queries)
+        print(f'{n:>10} {old_ms:>10.2f} {new_ms:>10.2f} {old_ms / new_ms:>7.1f}x  {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,414 @@
-import os, pickle, jieba, pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+import os, sys, time, pickle, shutil, sqlite3, argparse, tempfile, numpy as np, pandas as pd, scipy.sparse as sp
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.preprocessing import normalize
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'app'))
+from explain import doc_top_terms
+from ranking import GROWTH_DAYS, GROWTH_METRICS, compute_features
+from ann import IVFIndex
+from embedding import (BATCH_SIZE as EMBEDDING_BATCH, DTYPES as EMBEDDING_DTYPES, FIELDS as EMBEDDING_FIELDS, LSA_DIM,
+                       EmbeddingCache, LSAEncoder, SentenceEncoder, VectorStore, encode_books, load_encoder, quantize, take)
+from segments import SegmentedVectors
+from store import load_delta, load_index, write_delta, write_index
+from timeseries import latest_snapshot, load_series
+from tokenizer import tokenize_corpus
+
 DATA_PATH = ROOT / 'data' / 'books_sample.csv'
+DB_PATH = ROOT / 'data' / 'jinjiang_novels.db'
 MODELS_DIR = ROOT / 'models'
+INDEX_DIR = MODELS_DIR / 'index'
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
+MAX_FEATURES = 20000
+# 增量段行数达到主段的这个比例时自动压缩
+COMPACT_RATIO = 0.1
+# SQLite 单条语句的参数个数上限以内
+ID_BATCH = 900
+
+# 流式构建：按块读取 -> 进程池分词并统计词频 -> 合并词频选出词表 -> 进程池按固定词表计数 -> TF-IDF
+# 分词结果按块落到临时目录，主进程只保留词频表和最终的稀疏矩阵，内存与语料规模无关
+# 两遍计数的结果与 TfidfVectorizer(max_features=20000).fit_transform 一致
+#
+# 增量更新（--incremental，仅 db 来源）：按 (book_id, last_update_time) 找出上次构建后变化的书，
+# 用主段冻结的词表和 IDF 变换后写入增量段 models/index/delta/，查询时主段与增量段合并；
+# 增量段超过主段的 COMPACT_RATIO 或指定 --compact 时合并回主段，并按当前文档频率刷新 IDF
+#
+# 句向量（--embedding，见 app/embedding.py）：TF-IDF 之后按块读出 intro/tags/first_300_text 编码、量化，随索引一起写入；
+# 增量构建沿用主段的编码器，压缩时两段向量直接合并，不重新编码
+
+_vocab = None
+
+
+BOOK_COLUMNS = 'book_id AS id, title, author, intro, tags, last_update_time'
+# 过滤属性（app/filters.py），随书目一起写入索引
+ATTR_COLUMNS = 'category, status, perspective, sign_status, word_count'
+
+
+def read_chunks(source, chunk_size, db_path=DB_PATH):
+    """逐块产出 DataFrame，列为 id/title/author/intro/tags（db 来源另有 last_update_time 与过滤属性）"""
+    if source == 'db':
+        conn = sqlite3.connect(db_path)
+        try:
+            yield from pd.read_sql(
+                f'SELECT {BOOK_COLUMNS}, {ATTR_COLUMNS} FROM book ORDER BY book_id',
+                conn, chunksize=chunk_size,
+            )
+        finally:
+            conn.close()
+    else:
+        yield from pd.read_csv(DATA_PATH, chunksize=chunk_size)
+
+
+def _tokenize_chunk(task):
+    # 第一遍：分词、落盘，并统计该块的词频与文档频率
+    i, texts, spill_dir = task
+    docs = tokenize_corpus(texts)
+    analyzer = CountVectorizer().build_analyzer()
+    tf, df = Counter(), Counter()
+    for doc in docs:
+        terms = analyzer(doc)
+        tf.update(terms)
+        df.update(set(terms))
+    path = os.path.join(spill_dir, f'chunk_{i:06d}.pkl')
+    with open(path, 'wb') as f:
+        pickle.dump(docs, f)
+    return path, len(docs), tf, df
+
+
+def _init_count_worker(vocab):
+    global _vocab
+    _vocab = CountVectorizer(vocabulary=vocab)
+
+
+def _count_chunk(path):
+    # 第二遍：按固定词表计数
+    with open(path, 'rb') as f:
+        docs = pickle.load(f)
+    return _vocab.transform(docs)
+
+
+def _imap(pool, fn, tasks, workers):
+    """按顺序产出结果；同时在途的任务数有上限，避免一次性把整个语料读进内存"""
+    if pool is None:
+        yield from map(fn, tasks)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(fn, task))
+        if len(pending) >= workers * 2:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def select_vocabulary(tf, df, max_features):
+    """与 CountVectorizer 的 max_features 规则一致：按词频取前 max_features 个，词表按字典序排列"""
+    terms = sorted(tf)
+    if len(terms) > max_features:
+        counts = np.array([tf[t] for t in terms])
+        keep = np.sort((-counts).argsort(kind='stable')[:max_features])
+        terms = [terms[i] for i in keep]
+    return {t: i for i, t in enumerate(terms)}, np.array([df[t] for t in terms], dtype=np.float64)
+
+
+def rank_features(db_path, book_ids):
+    """由 stats 时间序列与 book 表算出与 book_ids 对齐的排序特征"""
+    conn = sqlite3.connect(db_path)
+    try:
+        latest = latest_snapshot(conn, book_ids)
+        series = load_series(conn, GROWTH_METRICS, days=GROWTH_DAYS, book_ids=book_ids, fill=False)
+        books = pd.read_sql('SELECT book_id, status, last_update_time FROM book', conn)
+    finally:
+        conn.close()
+    return compute_features(book_ids, latest, series, books)
+
+
+def with_attributes(db_path, books):
+    """按 id 从 book 表补上过滤属性列，行序不变"""
+    conn = sqlite3.connect(db_path)
+    try:
+        attrs = pd.read_sql(f'SELECT book_id AS id, {ATTR_COLUMNS} FROM book', conn)
+    finally:
+        conn.close()
+    return books.merge(attrs, on='id', how='left')
+
+
+def _texts(df):
+    # 与线上查询使用同一个分词器（app/tokenizer.py）
+    return (df['intro'].fillna('') + ' ' + df['tags'].fillna('')).tolist()
+
+
+def _stamps(books):
+    """book_id -> 构建时的 last_update_time"""
+    return dict(zip(np.asarray(books.ids).tolist(), books.updated.tolist()))
+
+
+def _delta_frame(books, rows):
+    rows = np.asarray(rows, dtype=np.int64)
+    return pd.DataFrame({
+        'id': np.asarray(books.ids)[rows], 'title': books.title.take(rows),
+        'author': books.author.take(rows), 'last_update_time': books.updated.take(rows),
+    })
+
+
+def changed_books(db_path, stamps):
+    """库里 last_update_time 与上次构建不同（或新出现）的书，返回完整行"""
+    conn = sqlite3.connect(db_path)
+    try:
+        current = conn.execute('SELECT book_id, COALESCE(last_update_time, \'\') FROM book').fetchall()
+        ids = [book_id for book_id, stamp in current if stamps.get(book_id) != stamp]
+        chunks = [pd.read_sql(f"SELECT {BOOK_COLUMNS} FROM book WHERE book_id IN ({','.join('?' * len(batch))})",
+                              conn, params=batch)
+                  for batch in (ids[i:i + ID_BATCH] for i in range(0, len(ids), ID_BATCH))]
+    finally:
+        conn.close()
+    if not chunks:
+        return None
+    df = pd.concat(chunks, ignore_index=True)
+    df['last_update_time'] = df['last_update_time'].fillna('')
+    return df
+
+
+def read_fields(source, db_path, ids):
+    """按 ids 顺序取句向量字段（csv 来源只有 intro/tags）"""
+    ids = [int(i) for i in ids]
+    if source == 'db':
+        conn = sqlite3.connect(db_path)
+        try:
+            chunks = [pd.read_sql(f"SELECT book_id AS id, {', '.join(EMBEDDING_FIELDS)} FROM book "
+                                  f"WHERE book_id IN ({','.join('?' * len(batch))})", conn, params=batch)
+                      for batch in (ids[i:i + ID_BATCH] for i in range(0, len(ids), ID_BATCH))]
+        finally:
+            conn.close()
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['id', *EMBEDDING_FIELDS])
+    else:
+        df = pd.read_csv(DATA_PATH)
+    cols = [c for c in EMBEDDING_FIELDS if c in df]
+    return df.drop_duplicates('id').set_index('id')[cols].reindex(ids).reset_index(drop=True)
+
+
+def make_encoder(args, X, vectorizer):
+    """--embedding lsa 用 <index_dir>/encoders/lsa/ 里已拟合的模型（没有、词表或 IDF 对不上、或 --embedding-refit 时在 X 上拟合），
+    其它名字按 sentence-transformers 模型加载"""
+    if args.embedding != 'lsa':
+        try:
+            return SentenceEncoder(args.embedding)
+        except RuntimeError as e:
+            sys.exit(str(e))
+    # 每个索引目录一份，拟合一次后在该索引的各版本间复用，保证书向量在同一空间
+    model_dir = Path(args.index_dir).resolve() / 'encoders' / 'lsa'
+    encoder = None if args.embedding_refit else load_encoder(str(model_dir))
+    if encoder is not None and not encoder.matches(vectorizer):
+        print(f'LSA encoder in {model_dir} was fitted on a different vocabulary, refitting')
+        encoder = None
+    if encoder is None:
+        encoder = LSAEncoder.fit(X, vectorizer, args.embedding_dim)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        encoder.save(str(model_dir))
+    return encoder
+
+
+def embed_books(args, encoder, ids, dtype):
+    """按 ids 顺序分块编码并量化，内容没变的字段从缓存取"""
+    t0 = time.perf_counter()
+    cache = EmbeddingCache(args.embedding_cache or str(Path(args.index_dir).resolve() / 'embedding_cache.db'))
+    parts, stats = [], Counter()
+    try:
+        for start in range(0, max(len(ids), 1), args.chunk_size):
+            frame = read_fields(args.source, args.db, ids[start:start + args.chunk_size])
+            E, chunk_stats = encode_books(encoder, frame, cache, args.embedding_batch)
+            parts.append(quantize(E, dtype))
+            stats.update(chunk_stats)
+            done = start + len(frame)
+            print(f'\rEmbedded: {done} docs  {done / (time.perf_counter() - t0):.0f} docs/sec', end='', flush=True)
+        print()
+    finally:
+        cache.close()
+    store = VectorStore.concat(parts)
+    print(f"Embedding: {encoder.model_id} {dtype} dim={encoder.dim}  {stats['encoded']} encoded / "
+          f"{stats['cached']} cached texts  {store.nbytes / 2**20:.1f} MiB")
+    return store
+
+
+def refresh_idf(X, vectorizer):
+    """按当前各词的文档频率重算平滑 IDF，并把已有 TF-IDF 行换成新权重（词表不变）"""
+    n_docs = X.shape[0]
+    dfs = np.bincount(X.indices, minlength=X.shape[1])
+    idf = np.log((1 + n_docs) / (1 + dfs)) + 1
+    # 行内各项同乘 新IDF/旧IDF 后重新归一化，等价于用新 IDF 重新变换原始词频
+    X = X @ sp.diags(idf / vectorizer.idf_)
+    norm = vectorizer.get_params()['norm']
+    if norm:
+        X = normalize(X, norm=norm)
+    vectorizer.idf_ = idf
+    return X.tocsr()
+
+
+def compact(index, delta, args):
+    """主段存活行与增量段合并成新主段，按 book_id 排序，刷新 IDF 并重建 ANN"""
+    live = np.ones(index.tfidf_matrix.shape[0], dtype=bool)
+    live[delta.dead] = False
+    rows = np.flatnonzero(live)
+    X = sp.vstack([index.tfidf_matrix[rows], delta.tfidf_matrix], format='csr')
+    books = pd.concat([_delta_frame(index.books, rows), _delta_frame(delta.books, np.arange(delta.meta['rows']))],
+                      ignore_index=True)
+    order = np.argsort(books['id'].to_numpy(), kind='stable')
+    X, books = X[order], books.iloc[order].reset_index(drop=True)
+    if index.filters is not None:
+        books = with_attributes(args.db, books)
+    vectorizer = index.vectorizer
+    X = refresh_idf(X, vectorizer)
+    use_ann = index.ann is not None and not args.no_ann
+    ann = IVFIndex.build(X, dim=args.ann_dim, n_lists=args.ann_lists) if use_ann else None
+    # 压缩时按最新的 stats 重算全部书的排序特征
+    ranks = rank_features(args.db, books['id']) if index.rank_features is not None else None
+    embedding = None
+    if index.embedding is not None and delta.embedding is not None and index.encoder is not None:
+        # 两段的书向量同一编码器产出，按新行序合并后重新量化
+        merged = SegmentedVectors(index.embedding, delta.embedding, np.empty(0, dtype=np.int64))
+        src = np.concatenate([rows, index.tfidf_matrix.shape[0] + np.arange(delta.meta['rows'])])[order]
+        embedding = take(merged, src, str(index.embedding.dtype))
+    return write_index(args.index_dir, vectorizer, X, books, doc_top_terms(X), ann, ranks,
+                       embedding, index.encoder if embedding is not None else None)
+
+
+def incremental(args):
+    t_start = time.perf_counter()
+    index = load_index(args.index_dir, mmap_mode=None, merge_delta=False)
+    if index.books.updated is None:
+        sys.exit('主索引没有 last_update_time 列，请先用 --source db 全量构建')
+    delta = load_delta(index.path, index.meta, mmap_mode=None)
+    stamps = _stamps(index.books)
+    if delta is not None:
+        stamps.update(_stamps(delta.books))
+
+    changed = changed_books(args.db, stamps)
+    n_changed = 0 if changed is None else len(changed)
+    if n_changed:
+        # 旧增量段里这次没再变化的行原样保留
+        parts, frames = [], []
+        if delta is not None:
+            keep = np.flatnonzero(~np.isin(np.asarray(delta.books.ids), changed['id'].to_numpy()))
+            parts.append(delta.tfidf_matrix[keep])
+            frames.append(_delta_frame(delta.books, keep))
+        parts.append(index.vectorizer.transform(tokenize_corpus(_texts(changed))))
+        frames.append(changed[['id', 'title', 'author', 'last_update_time']])
+        X = sp.vstack(parts, format='csr')
+        books = pd.concat(frames, ignore_index=True)
+        if index.filters is not None:
+            books = with_attributes(args.db, books)
+        dead = index.books.rows_for_ids(books['id'].to_numpy())
+        ranks = rank_features(args.db, books['id']) if index.rank_features is not None else None
+        embedding = None
+        if index.embedding is not None:
+            if index.encoder is None:
+                print('Warning: 主段的编码器不可用，增量段不带书向量（查询只能用 repr=tfidf）')
+            else:
+                dtype = str(index.embedding.dtype)
+                new = embed_books(args, index.encoder, changed['id'].tolist(), dtype)
+                old = [take(delta.embedding, keep, dtype)] if delta is not None and delta.embedding is not None else []
+                embedding = VectorStore.concat(old + [new])
+        delta_meta = write_delta(index.path, index.meta, X, books, doc_top_terms(X), np.sort(dead[dead >= 0]), ranks,
+                                 embedding)
+        delta = load_delta(index.path, index.meta, mmap_mode=None)
+        print(f'Delta: {n_changed} changed, {delta_meta["rows"]} delta rows, {delta_meta["dead"]} replaced')
+    else:
+        print('Delta: no changed books')
+
+    if delta is not None and (args.compact or delta.meta['rows'] >= COMPACT_RATIO * index.tfidf_matrix.shape[0]):
+        meta = compact(index, delta, args)
+        print('Compacted:', args.index_dir, 'Version:', meta['version'], 'Rows:', meta['rows'])
+    print(f'Total: {time.perf_counter() - t_start:.1f}s')
 
-def preprocess(text: str) -> str:
-    # 简单中文分词 + 去空白
-    if not isinstance(text, str): return ''
-    tokens = jieba.lcut(text.replace('\n', ' '))
-    tokens = [t.strip() for t in tokens if t.strip()]
-    return ' '.join(tokens)
 
 def main():
-    df = pd.read_csv(DATA_PATH)
-    corpus = (df['intro'].fillna('') + ' ' + df['tags'].fillna('')).apply(preprocess).tolist()
-    vectorizer = TfidfVectorizer(max_features=20000)
-    X = vectorizer.fit_transform(corpus)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', choices=('csv', 'db'), default='csv',
+                        help='csv: data/books_sample.csv；db: data/jinjiang_novels.db 的 book 表')
+    parser.add_argument('--db', default=str(DB_PATH), help='db 来源的 SQLite 路径')
+    parser.add_argument('--index-dir', default=str(INDEX_DIR), help='索引目录（CURRENT 与 versions/ 所在目录）')
+    parser.add_argument('--workers', type=int, default=1, help='分词/计数进程数')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='每块读取的书目数')
+    parser.add_argument('--no-ann', action='store_true', help='跳过 ANN 索引构建')
+    parser.add_argument('--ann-dim', type=int, default=128, help='SVD 降维维度')
+    parser.add_argument('--ann-lists', type=int, default=None, help='IVF 桶数，默认 sqrt(行数)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='只把上次构建后更新过的书写入增量段（仅 db 来源），必要时自动压缩')
+    parser.add_argument('--compact', action='store_true', help='配合 --incremental：立即把增量段合并回主段并刷新 IDF')
+    parser.add_argument('--embedding', default=None,
+                        help='同时构建句向量：lsa（内置，无额外依赖）或 sentence-transformers 模型名（如 BAAI/bge-small-zh-v1.5）')
+    parser.add_argument('--embedding-dtype', choices=EMBEDDING_DTYPES, default='int8', help='书向量的量化类型')
+    parser.add_argument('--embedding-dim', type=int, default=LSA_DIM, help='lsa 编码器的维度')
+    parser.add_argument('--embedding-refit', action='store_true', help='重新拟合 lsa 编码器（旧缓存随模型一起失效）')
+    parser.add_argument('--embedding-batch', type=int, default=EMBEDDING_BATCH, help='编码批大小')
+    parser.add_argument('--embedding-cache', default=None, help='编码缓存的 SQLite 路径，默认索引目录下的 embedding_cache.db')
+    args = parser.parse_args()
+
+    if args.incremental:
+        if args.source != 'db':
+            sys.exit('--incremental 只支持 --source db')
+        return incremental(args)
+    if args.compact:
+        sys.exit('--compact 需要与 --incremental 一起使用')
+
+    t_start = time.perf_counter()
+    pool = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+    spill_dir = tempfile.mkdtemp(prefix='novelnest_build_')
+    books, paths, tf, df, n_docs = [], [], Counter(), Counter(), 0
+    try:
+        def tasks():
+            for i, chunk in enumerate(read_chunks(args.source, args.chunk_size, args.db)):
+                books.append(chunk.drop(columns=['intro', 'tags']))
+                yield i, _texts(chunk), spill_dir
+
+        for path, n, chunk_tf, chunk_df in _imap(pool, _tokenize_chunk, tasks(), args.workers):
+            paths.append(path)
+            tf.update(chunk_tf)
+            df.update(chunk_df)
+            n_docs += n
+            elapsed = time.perf_counter() - t_start
+            print(f'\rTokenized: {n_docs} docs  {n_docs / elapsed:.0f} docs/sec', end='', flush=True)
+        print()
+
+        vocab, dfs = select_vocabulary(tf, df, MAX_FEATURES)
+        del tf, df
+        t_count = time.perf_counter()
+        if pool is not None:
+            pool.shutdown()
+            pool = ProcessPoolExecutor(args.workers, initializer=_init_count_worker, initargs=(vocab,))
+        else:
+            _init_count_worker(vocab)
+        counts = sp.vstack(list(_imap(pool, _count_chunk, paths, args.workers)), format='csr')
+        print(f'Counted: {n_docs} docs  {n_docs / (time.perf_counter() - t_count):.0f} docs/sec')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        # 出错时可能还有已写盘、尚未返回的分块，整个目录一起删
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    # 平滑 IDF，与 TfidfVectorizer 默认参数一致
+    vectorizer = TfidfVectorizer(max_features=MAX_FEATURES, vocabulary=vocab)
+    vectorizer.idf_ = np.log((1 + n_docs) / (1 + dfs)) + 1
+    transformer = TfidfTransformer()
+    transformer.idf_ = vectorizer.idf_
+    X = transformer.transform(counts.astype(np.float64))
+    books = pd.concat(books, ignore_index=True)
 
-    with open(MODELS_DIR / 'vectorizer.pkl', 'wb') as f:
-        pickle.dump(vectorizer, f)
-    with open(MODELS_DIR / 'tfidf_matrix.pkl', 'wb') as f:
-        pickle.dump(X, f)
+    # 推荐理由索引（每本书的 Top-12 词 id）、ANN 索引与排序特征（db 来源）一并写入
+    ann = None if args.no_ann else IVFIndex.build(X, dim=args.ann_dim, n_lists=args.ann_lists)
+    ranks = rank_features(args.db, books['id']) if args.source == 'db' else None
+    embedding = encoder = None
+    if args.embedding:
+        encoder = make_encoder(args, X, vectorizer)
+        embedding = embed_books(args, encoder, books['id'].tolist(), args.embedding_dtype)
+    meta = write_index(args.index_dir, vectorizer, X, books, doc_top_terms(X), ann, ranks, embedding, encoder)
 
-    print('Saved:', MODELS_DIR / 'vectorizer.pkl', MODELS_DIR / 'tfidf_matrix.pkl')
-    print('Rows:', X.shape[0], 'Dims:', X.shape[1])
+    elapsed = time.perf_counter() - t_start
+    print('Saved:', args.index_dir, 'Version:', meta['version'])
+    print('Rows:', X.shape[0], 'Dims:', X.shape[1], f'Total: {elapsed:.1f}s ({n_docs / elapsed:.0f} docs/sec)')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
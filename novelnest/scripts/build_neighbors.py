@@ -0,0 +1,84 @@
+import os, sys, time, argparse
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'app'))
+from retrieval import search_batch
+from store import load_index
+
+# 全量相似书表：为目录中每本书离线计算 Top-K 相似书（夜间“更多类似”书架）
+# 各进程以 mmap 方式加载同一份索引，按行区间并行计算
+# 用法：python scripts/build_neighbors.py --k 20 --workers 8
+# 输出：neighbors.book_id.npy / neighbors.ids.npy / neighbors.scores.npy
+#       ids[i] 为第 i 本书的 K 个相似书 book_id（不足补 -1），scores 与之对齐
+# 主段 + 增量段合并的索引里，被增量段替换掉的主段行既不输出也不作为候选，每本书只出现一次
+
+INDEX_DIR = ROOT / 'models' / 'index'
+OUT_DIR = ROOT / 'models' / 'neighbors'
+
+_index = None
+_live = None
+
+
+def live_mask(index):
+    """未被增量段替换的行"""
+    live = np.ones(index.tfidf_matrix.shape[0], dtype=bool)
+    dead = getattr(index.tfidf_matrix, 'dead', None)
+    if dead is not None:
+        live[dead] = False
+    return live
+
+
+def _init_worker(index_dir):
+    global _index, _live
+    _index = load_index(index_dir)
+    _live = live_mask(_index)
+
+
+def _neighbors(task):
+    start, rows, k = task
+    X = _index.tfidf_matrix
+    ids = np.full((len(rows), k), -1, dtype=np.int64)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+    hits = search_batch(X[rows], X, k, exclude=rows, mask=_live)
+    for j, (top_idx, top_scores) in enumerate(hits):
+        ids[j, :len(top_idx)] = _index.books.ids[top_idx]
+        scores[j, :len(top_idx)] = top_scores
+    return start, ids, scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--block', type=int, default=2048, help='每个任务处理的行数')
+    parser.add_argument('--index-dir', default=str(INDEX_DIR))
+    parser.add_argument('--out', default=str(OUT_DIR))
+    args = parser.parse_args()
+
+    index = load_index(args.index_dir)
+    rows = np.flatnonzero(live_mask(index))
+    n = len(rows)
+    ids = np.full((n, args.k), -1, dtype=np.int64)
+    scores = np.zeros((n, args.k), dtype=np.float32)
+    tasks = [(start, rows[start:start + args.block], args.k) for start in range(0, n, args.block)]
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.index_dir,)) as pool:
+        for done, (start, block_ids, block_scores) in enumerate(pool.map(_neighbors, tasks), 1):
+            ids[start:start + len(block_ids)] = block_ids
+            scores[start:start + len(block_ids)] = block_scores
+            print(f'\r{done}/{len(tasks)} blocks', end='', flush=True)
+    elapsed = time.perf_counter() - t0
+
+    os.makedirs(args.out, exist_ok=True)
+    np.save(os.path.join(args.out, 'neighbors.book_id.npy'), np.asarray(index.books.ids)[rows])
+    np.save(os.path.join(args.out, 'neighbors.ids.npy'), ids)
+    np.save(os.path.join(args.out, 'neighbors.scores.npy'), scores)
+    print(f'\nSaved: {args.out}  rows={n} k={args.k}  {elapsed:.1f}s ({n / max(elapsed, 1e-9):.0f} books/sec)')
+
+
+if __name__ == '__main__':
+    main()